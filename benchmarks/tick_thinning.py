@@ -0,0 +1,49 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmark of tick thinning (remove_from_list_half and
+remove_from_list_in_four) on a spiral scale with and without a shared
+Tick_Layout.
+"""
+import sys
+sys.path.insert(0, "..")
+import math
+import time
+from pynomo.nomo_axis import find_linear_ticks, Tick_Layout, \
+    remove_from_list_half, remove_from_list_in_four
+
+def f_bench(u):
+    return math.sin(u/100.0)*(5+u/200.0)
+
+def g_bench(u):
+    return math.cos(u/100.0)*(5+u/200.0)
+
+tick_0,tick_1,tick_2,tick_3,tick_4,start_ax,stop_ax=find_linear_ticks(0.0,1000.0,scale_max_0=100.0)
+for distance_limit in [0.05,0.2,0.5]:
+    tic=time.time()
+    lists=[remove_from_list_half(tick_3,tick_0+tick_1+tick_2,f_bench,g_bench,distance_limit),
+           remove_from_list_in_four(tick_4,tick_0+tick_1+tick_2+tick_3,f_bench,g_bench,distance_limit)]
+    toc_functions=time.time()-tic
+    tic=time.time()
+    layout=Tick_Layout(f_bench,g_bench,0.0,1000.0,tick_0+tick_1+tick_2+tick_3+tick_4)
+    layout_lists=[remove_from_list_half(tick_3,tick_0+tick_1+tick_2,f_bench,g_bench,distance_limit,layout=layout),
+                  remove_from_list_in_four(tick_4,tick_0+tick_1+tick_2+tick_3,f_bench,g_bench,distance_limit,layout=layout)]
+    toc_layout=time.time()-tic
+    print("distance_limit %g: functions %f s, layout %f s, same results %s"
+          %(distance_limit,toc_functions,toc_layout,lists==layout_lists))
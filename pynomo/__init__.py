@@ -23,4 +23,5 @@ solution to an equation.
 
 __all__ = ["nomograph", "nomo_axis", "nomograph3","nomo_axis_func",
            "nomo_grid_box","nomo_grid","nomo_wrapper","nomographer",
-           "isopleth"]
+           "isopleth","nomo_sampler","nomo_text_cache",
+           "nomo_draft_text","nomo_geometry","nomo_build_cache"]
@@ -21,6 +21,7 @@ from pyx import *
 import copy, re
 from scipy.optimize import *
 from scipy import arange
+from .nomo_sampler import Section_Index
 
 class Isopleth_Wrapper(object):
     """
@@ -146,23 +147,64 @@ class Isopleth_Wrapper(object):
 
     def _solve_(self):
         """
-        solves unknown values
-        """
-        solutions_updated=True
-        while solutions_updated:
-            for idx,isopleth in enumerate(self.isopleth_list):
-                isopleth.solve(self.solutions)
-                # take initial values (they are most correct)
-                isopleth.find_initial_solutions(self.solutions)
-            # updates solutions
-            solutions_updated=False
-            for idx,isopleth in enumerate(self.isopleth_list):
-                update=isopleth.update_solutions(self.solutions)
-                if update==True:
-                    solutions_updated=True
-        # check for error
-        for idx,isopleth in enumerate(self.isopleth_list):
-            isopleth.check_if_all_solutions_found(self.solutions)
+        solves unknown values. Blocks sharing tags (or dtags) depend on
+        each other. Each isopleth is solved in rounds: blocks are solved in
+        order, then values found are given to blocks waiting for them,
+        found via index of tags. Next round solves only blocks that got
+        values. Isopleths that can't be solved are reported and saved to
+        self.unsolved as (block index,isopleth index).
+        """
+        key_index=self._give_key_index_()
+        row_number=max([len(isopleth.isopleth_values) for isopleth in self.isopleth_list]+[0])
+        self.unsolved=[]
+        for idx in range(row_number):
+            if len(self.solutions)<(idx+1):
+                self.solutions.append({})
+            solution=self.solutions[idx]
+            solved=set()
+            to_solve=range(len(self.isopleth_list))
+            while len(to_solve)>0:
+                found={} # values of keys found in this round
+                for iso_idx in to_solve:
+                    isopleth=self.isopleth_list[iso_idx]
+                    if idx>=len(isopleth.isopleth_values):
+                        continue
+                    before=dict(solution)
+                    if isopleth.solve_row(self.solutions,idx):
+                        solved.add(iso_idx)
+                    # take initial values (they are most correct)
+                    isopleth.find_initial_solutions_row(self.solutions,idx)
+                    for key,value in solution.items():
+                        if key not in before or not before[key]==value:
+                            found[key]=value
+                # give found values to blocks waiting for them
+                updated=set()
+                for key in found:
+                    for iso_idx,atom_idx in key_index.get(key,[]):
+                        if idx>=len(self.isopleth_list[iso_idx].isopleth_values):
+                            continue
+                        values=self.isopleth_list[iso_idx].isopleth_values[idx]
+                        if isinstance(values[atom_idx],str):
+                            values[atom_idx]=solution[key]
+                            updated.add(iso_idx)
+                to_solve=sorted(updated)
+            for iso_idx,isopleth in enumerate(self.isopleth_list):
+                if idx<len(isopleth.isopleth_values) and iso_idx not in solved:
+                    print("Isopleth %i of block %i can't be solved, values: %s"\
+                          %(idx,iso_idx,isopleth.isopleth_values[idx]))
+                    self.unsolved.append((iso_idx,idx))
+
+    def _give_key_index_(self):
+        """
+        returns dict tag (or dtag) -> list of (block index,atom index)
+        """
+        index={}
+        for iso_idx,isopleth in enumerate(self.isopleth_list):
+            for atom_idx,atom in enumerate(isopleth.atom_stack):
+                for key in (atom.params['tag'],atom.params['dtag']):
+                    if not key=='none':
+                        index.setdefault(key,[]).append((iso_idx,atom_idx))
+        return index
 
 
 class Isopleth_Block(object):
@@ -258,22 +300,43 @@ class Isopleth_Block(object):
                                                         x1,y1,x2,y2)
         return middle_x,middle_y
 
+    def _give_section_index_(self,sections):
+        """
+        Section_Index of sections given as Polyline (e.g. atom.polyline),
+        Section_Index or list of sections (x,y,prev_x,prev_y)
+        """
+        if isinstance(sections,Section_Index):
+            return sections
+        if hasattr(sections,'give_section_index'):
+            return sections.give_section_index()
+        return Section_Index(sections)
+
+    def _find_crossings_(self,sections,x1,y1,x2,y2):
+        """
+        finds all points where line (x1,y1)-(x2,y2) crosses axis (scale)
+        sections. Returns (first point,list of other points), first point
+        is (-10,-10) if none found.
+        """
+        indices,x,y=self._give_section_index_(sections).give_line_crossings(x1,y1,x2,y2)
+        if len(indices)<1:
+            return (-10,-10),[] # dummy point
+        return (x[0],y[0]),list(zip(x[1:],y[1:]))
+
     def _find_closest_point_(self,sections,x1,y1,x2,y2):
         """
         finds closest point(S) of isopleth and axis (scale)
         """
-        f1=1.0-1e-12
-        f2=1.0+1e-12
-        interps=[]
-        for idx,(x1s,y1s,x2s,y2s) in enumerate(sections):
-            x_inter,y_inter=self._two_line_intersection_(x1s,y1s,x2s,y2s,x1,y1,x2,y2)
-            # check if instersection
-            #if (f1*min(x1s,x2s)<=x_inter<=f2*max(x1s,x2s)) and (f1*min(y1s,y2s)<=y_inter<=f2*max(y1s,y2s)):
-            if self._between_(x1s,y1s,x2s,y2s,x_inter,y_inter):
-                interps.append((x_inter,y_inter))
-        if len(interps)<1:
-            interps.append((-10,-10)) # dummy point
-        return interps[0][0],interps[0][1]
+        return self._find_crossings_(sections,x1,y1,x2,y2)[0]
+
+    def _find_closest_other_points_(self,sections,x1,y1,x2,y2,x_found,y_found):
+        """
+        finds closest point(S) of isopleth and axis (scale)
+        x_found, y_found are found already before
+        """
+        indices,x,y=self._give_section_index_(sections).give_line_crossings(x1,y1,x2,y2)
+        tolerance=1e-9*(1.0+math.sqrt(x_found**2+y_found**2))
+        return [(x_inter,y_inter) for x_inter,y_inter in zip(x,y)
+                if self._calc_distance_points_(x_inter,y_inter,x_found,y_found)>tolerance]
 
     def _between_(self,x1s,y1s,x2s,y2s,x,y):
         """
@@ -316,22 +379,6 @@ class Isopleth_Block(object):
         else:
             return False
 
-    def _find_closest_other_points_(self,sections,x1,y1,x2,y2,x_found,y_found):
-        """
-        finds closest point(S) of isopleth and axis (scale)
-        x_found, y_found are found already before
-        """
-        f=1-1e-12 # factor to reduce double hits
-        interps=[]
-        for idx,(x1s,y1s,x2s,y2s) in enumerate(sections):
-            x_inter,y_inter=self._two_line_intersection_(x1s,y1s,x2s*f,y2s*f,x1,y1,x2,y2)
-            # check if instersection
-            if (min(x1s,x2s*f)<=x_inter<=max(x1s,x2*f)) and (min(y1s,y2s*f)<=y_inter<=max(y1s,y2s*f)):
-                if not x_found==x_inter and not y_found==y_inter:
-                    interps.append((x_inter,y_inter))
-        return interps
-
-
     def collinear(self,x1,y1,x2,y2,x3,y3):
         determinant=x1*(y2-y3)+x2*(y3-y1)+x3*(y1-y2)
         if abs(determinant)<1e-3:
@@ -368,7 +415,10 @@ class Isopleth_Block(object):
         """
         draws the isopleth
         """
-        for idx,(x1,y1,x2,y2,x3,y3) in enumerate(self.draw_coordinates):
+        for idx,coordinates in enumerate(self.draw_coordinates):
+            if len(coordinates)==0:
+                continue # isopleth not solved
+            x1,y1,x2,y2,x3,y3=coordinates
             xx1,yy1,xx2,yy2=self.find_farthest_pair_extra(x1,y1,x2,y2,x3,y3,idx)
             #print xx1,yy1,xx2,yy2
             # check for collinearity
@@ -388,6 +438,8 @@ class Isopleth_Block(object):
             self._draw_circle_(canvas,x1,y1,circle_radius,color_param)
             self._draw_circle_(canvas,x2,y2,circle_radius,color_param)
             self._draw_circle_(canvas,x3,y3,circle_radius,color_param)
+            self._add_isopleth_(canvas,idx,[(xx1,yy1,xx2,yy2)],
+                                [(x1,y1),(x2,y2),(x3,y3)])
         for idx,line_points in enumerate(self.other_points):
             if len(draw_params)>idx:
                 p=draw_params[idx]
@@ -407,12 +459,38 @@ class Isopleth_Block(object):
         canvas.fill(path.circle(x, y, r), [color.rgb.white])
         canvas.stroke(path.circle(x,y,r),[circle_color])
 
+    def _add_isopleth_(self,canvas,idx,segments,points):
+        """
+        gives isopleth idx as segments (x1,y1,x2,y2) and solution points
+        (x,y) to geometry model if canvas records one
+        """
+        if hasattr(canvas,'add_isopleth'):
+            canvas.add_isopleth(idx,self.isopleth_values[idx],segments,points)
+
     def solve(self,solutions):
         """
         parent class to be overriden, solves coordinates
         """
         pass
 
+    def solve_row(self,solutions,idx):
+        """
+        parent class to be overriden, solves coordinates of isopleth idx.
+        Returns True if solved.
+        """
+        return False
+
+    def _expand_lists_(self,solutions,idx):
+        """
+        expands lists of solutions and coordinates to hold isopleth idx
+        """
+        while len(self.draw_coordinates)<(idx+1):
+            self.draw_coordinates.append([]) # dummy expansion of matrix
+        while len(solutions)<(idx+1):
+            solutions.append({})
+        while len(self.other_points)<(idx+1):
+            self.other_points.append([])
+
     def check_if_all_solutions_found(self,solutions):
         """
         this has right now no function
@@ -431,29 +509,28 @@ class Isopleth_Block(object):
         """
         Finds initial solutions
         """
+        for idx,dummy in enumerate(solutions):
+            self.find_initial_solutions_row(solutions,idx)
+
+    def find_initial_solutions_row(self,solutions,idx):
+        """
+        Finds initial solutions of isopleth idx
+        """
         for atom_idx,atom in enumerate(self.atom_stack):
             if not atom.params['tag']=='none':
-                for idx,dummy in enumerate(solutions):
-                    # store only true (x,y) tuples
-                    if isinstance(self.isopleth_values[idx][atom_idx],(tuple)):
-                        solutions[idx][atom.params['tag']]=self.isopleth_values[idx][atom_idx]
-                    if isinstance(self.isopleth_values[idx][atom_idx],(int,float)):
-                        value=self.isopleth_values[idx][atom_idx]
-                        x=atom.give_x(value)-atom.params['align_x_offset']
-                        y=atom.give_y(value)-atom.params['align_y_offset']
-                        solutions[idx][atom.params['tag']]=(x,y)
+                key=atom.params['tag']
+            elif not atom.params['dtag']=='none':
+                key=atom.params['dtag']
             else:
-                if not atom.params['dtag']=='none':
-                    for idx,dummy in enumerate(solutions):
-                        # store only true (x,y) tuples
-                        if isinstance(self.isopleth_values[idx][atom_idx],(tuple)):
-                            solutions[idx][atom.params['dtag']]=self.isopleth_values[idx][atom_idx]
-                        if isinstance(self.isopleth_values[idx][atom_idx],(int,float)):
-                            value=self.isopleth_values[idx][atom_idx]
-                            x=atom.give_x(value)-atom.params['align_x_offset']
-                            y=atom.give_y(value)-atom.params['align_y_offset']
-                            solutions[idx][atom.params['dtag']]=(x,y)
-
+                continue
+            # store only true (x,y) tuples
+            if isinstance(self.isopleth_values[idx][atom_idx],(tuple)):
+                solutions[idx][key]=self.isopleth_values[idx][atom_idx]
+            if isinstance(self.isopleth_values[idx][atom_idx],(int,float)):
+                value=self.isopleth_values[idx][atom_idx]
+                x=atom.give_x(value)-atom.params['align_x_offset']
+                y=atom.give_y(value)-atom.params['align_y_offset']
+                solutions[idx][key]=(x,y)
 
     def update_solutions(self,solutions):
         """
@@ -492,28 +569,11 @@ class Isopleth_Block(object):
 
     def interp_xy(self,x,y,atom):
         """
-        given a point in u-axis, corresponding value is interpolated
+        given a point in u-axis, corresponding value is interpolated.
+        Point is projected to the nearest place of the axis line.
+        x and y can be arrays of points.
         """
-        f=1.0
-        interps=[]
-        min_distance=None
-        for idx,(x1s,y1s,x2s,y2s) in enumerate(atom.sections):
-            distance_1=self._calc_distance_points_(x1s,y1s,x,y)
-            distance_2=self._calc_distance_points_(x2s,y2s,x,y)
-            distance=min(distance_1,distance_2)
-            if min_distance==None:
-                min_distance=distance
-                closest_value=atom.section_values[idx][0]
-            else:
-                if distance<min_distance:
-                    min_distance=distance
-                    value_0=atom.section_values[idx][0]
-                    value_1=atom.section_values[idx][1]
-                    closest_value=self.interpolate(x1s,y1s,x2s,y2s,x,y,value_0,value_1)
-                    closest_value_0=value_0
-                    closest_value_1=value_1
-        #print closest_value,closest_value_0,closest_value_1
-        return closest_value
+        return atom.polyline.give_projection().give_values(x,y)
 
     def interpolate(self,x1,y1,x2,y2,x3,y3,value_1,value_2):
         """
@@ -803,17 +863,21 @@ class Isopleth_Block_Type_1(Isopleth_Block):
         solves coordinates
         solutions is list of dicts of found solutions
         """
-        for idx,isopleth_values_single in enumerate(self.isopleth_values):
-            if len(self.draw_coordinates)<(idx+1):
-                self.draw_coordinates.append([]) # dummy expansion of matrix
-            if len(solutions)<(idx+1):
-                solutions.append({})
-            if len(self.other_points)<(idx+1):
-                self.other_points.append([])
-            if self._check_if_enough_params_(idx):
-                x0,y0,x1,y1,x2,y2=self.solve_single(solutions[idx],
-                                                    isopleth_values_single,idx)
-                self.draw_coordinates[idx]=[x0,y0,x1,y1,x2,y2]
+        for idx in range(len(self.isopleth_values)):
+            self.solve_row(solutions,idx)
+
+    def solve_row(self,solutions,idx):
+        """
+        solves coordinates of isopleth idx if enough values are known.
+        Returns True if solved.
+        """
+        self._expand_lists_(solutions,idx)
+        if not self._check_if_enough_params_(idx):
+            return False
+        x0,y0,x1,y1,x2,y2=self.solve_single(solutions[idx],
+                                            self.isopleth_values[idx],idx)
+        self.draw_coordinates[idx]=[x0,y0,x1,y1,x2,y2]
+        return True
 
 
     def solve_single(self,solution,isopleth_values,idx):
@@ -868,8 +932,7 @@ class Isopleth_Block_Type_1(Isopleth_Block):
             f3_known=True
         if not f1_known:
             #line=self.atom_stack[0].line
-            x0,y0=self._find_closest_point_(self.atom_stack[0].sections,x1,y1,x2,y2)
-            other_points=self._find_closest_other_points_(self.atom_stack[0].sections,x1,y1,x2,y2,x0,y0)
+            (x0,y0),other_points=self._find_crossings_(self.atom_stack[0].polyline,x1,y1,x2,y2)
             #solution[isopleth_values[0]]=(x0,y0)
             if not self.atom_stack[0].params['tag']=='none':
                 solution[self.atom_stack[0].params['tag']]=(x0,y0)
@@ -877,8 +940,7 @@ class Isopleth_Block_Type_1(Isopleth_Block):
             self.other_points[idx].append(other_points)
         if not f2_known:
             #line=self.atom_stack[1].line
-            x1,y1=self._find_closest_point_(self.atom_stack[1].sections,x0,y0,x2,y2)
-            other_points=self._find_closest_other_points_(self.atom_stack[1].sections,x0,y0,x2,y2,x1,y1)
+            (x1,y1),other_points=self._find_crossings_(self.atom_stack[1].polyline,x0,y0,x2,y2)
             #solution[isopleth_values[1]]=(x1,y1)
             if not self.atom_stack[1].params['tag']=='none':
                 solution[self.atom_stack[1].params['tag']]=(x1,y1)
@@ -886,8 +948,7 @@ class Isopleth_Block_Type_1(Isopleth_Block):
             self.other_points[idx].append(other_points)
         if not f3_known:
             #line=self.atom_stack[2].line
-            x2,y2=self._find_closest_point_(self.atom_stack[2].sections,x0,y0,x1,y1)
-            other_points=self._find_closest_other_points_(self.atom_stack[2].sections,x0,y0,x1,y1,x2,y2)
+            (x2,y2),other_points=self._find_crossings_(self.atom_stack[2].polyline,x0,y0,x1,y1)
             #solution[isopleth_values[2]]=(x2,y2)
             if not self.atom_stack[2].params['tag']=='none':
                 solution[self.atom_stack[2].params['tag']]=(x2,y2)
@@ -930,7 +991,10 @@ class Isopleth_Block_Type_5(Isopleth_Block):
         """
         draws the isopleth
         """
-        for idx,(x1,y1,x2,y2,x3,y3) in enumerate(self.draw_coordinates):
+        for idx,coordinates in enumerate(self.draw_coordinates):
+            if len(coordinates)==0:
+                continue # isopleth not solved
+            x1,y1,x2,y2,x3,y3=coordinates
             if len(draw_params)>idx:
                 p=draw_params[idx]
             else:
@@ -943,6 +1007,8 @@ class Isopleth_Block_Type_5(Isopleth_Block):
             self._draw_circle_(canvas,x1,y1,circle_radius,color_param)
             self._draw_circle_(canvas,x2,y2,circle_radius,color_param)
             self._draw_circle_(canvas,x3,y3,circle_radius,color_param)
+            self._add_isopleth_(canvas,idx,[(x1,y1,x2,y2),(x2,y2,x3,y3)],
+                                [(x1,y1),(x2,y2),(x3,y3)])
         for idx,line_points in enumerate(self.other_points):
             if len(draw_params)>idx:
                 p=draw_params[idx]
@@ -960,17 +1026,21 @@ class Isopleth_Block_Type_5(Isopleth_Block):
         solves coordinates
         solutions is list of dicts of found solutions
         """
-        for idx,isopleth_values_single in enumerate(self.isopleth_values):
-            if len(self.draw_coordinates)<(idx+1):
-                self.draw_coordinates.append([]) # dummy expansion of matrix
-            if len(solutions)<(idx+1):
-                solutions.append({})
-            if len(self.other_points)<(idx+1):
-                self.other_points.append([])
-            if self._check_if_enough_params_(idx):
-                x_u,y_u,x_v,y_v,x_wd,y_wd=self.solve_single(solutions[idx],
-                                                    isopleth_values_single,idx)
-                self.draw_coordinates[idx]=[x_u,y_u,x_v,y_v,x_wd,y_wd]
+        for idx in range(len(self.isopleth_values)):
+            self.solve_row(solutions,idx)
+
+    def solve_row(self,solutions,idx):
+        """
+        solves coordinates of isopleth idx if enough values are known.
+        Returns True if solved.
+        """
+        self._expand_lists_(solutions,idx)
+        if not self._check_if_enough_params_(idx):
+            return False
+        x_u,y_u,x_v,y_v,x_wd,y_wd=self.solve_single(solutions[idx],
+                                                    self.isopleth_values[idx],idx)
+        self.draw_coordinates[idx]=[x_u,y_u,x_v,y_v,x_wd,y_wd]
+        return True
 
     def solve_single(self,solution,isopleth_values,idx):
         """
@@ -1165,51 +1235,13 @@ class Isopleth_Block_Type_5(Isopleth_Block):
         """
         given a point in wd-axis, corresponding value is interpolated
         """
-        f=1.0
-        interps=[]
-        min_distance=None
-        for idx,(x1s,y1s,x2s,y2s) in enumerate(self.nomo_block.atom_wd.sections):
-            distance_1=self._calc_distance_points_(x1s,y1s,x,y)
-            distance_2=self._calc_distance_points_(x2s,y2s,x,y)
-            distance=min(distance_1,distance_2)
-            if min_distance==None:
-                min_distance=distance
-                closest_value=self.nomo_block.atom_wd.section_values[idx][0]
-            else:
-                if distance<min_distance:
-                    min_distance=distance
-                    value_0=self.nomo_block.atom_wd.section_values[idx][0]
-                    value_1=self.nomo_block.atom_wd.section_values[idx][1]
-                    closest_value=self.interpolate(x1s,y1s,x2s,y2s,x,y,value_0,value_1)
-                    closest_value_0=value_0
-                    closest_value_1=value_1
-        #print closest_value,closest_value_0,closest_value_1
-        return closest_value
+        return self.interp_xy(x,y,self.nomo_block.atom_wd)
 
     def u_x_y_interp(self,x,y):
         """
         given a point in u-axis, corresponding value is interpolated
         """
-        f=1.0
-        interps=[]
-        min_distance=None
-        for idx,(x1s,y1s,x2s,y2s) in enumerate(self.nomo_block.atom_u.sections):
-            distance_1=self._calc_distance_points_(x1s,y1s,x,y)
-            distance_2=self._calc_distance_points_(x2s,y2s,x,y)
-            distance=min(distance_1,distance_2)
-            if min_distance==None:
-                min_distance=distance
-                closest_value=self.nomo_block.atom_u.section_values[idx][0]
-            else:
-                if distance<min_distance:
-                    min_distance=distance
-                    value_0=self.nomo_block.atom_u.section_values[idx][0]
-                    value_1=self.nomo_block.atom_u.section_values[idx][1]
-                    closest_value=self.interpolate(x1s,y1s,x2s,y2s,x,y,value_0,value_1)
-                    closest_value_0=value_0
-                    closest_value_1=value_1
-        #print closest_value,closest_value_0,closest_value_1
-        return closest_value
+        return self.interp_xy(x,y,self.nomo_block.atom_u)
 
 class Isopleth_Block_Type_6(Isopleth_Block):
     """
@@ -1239,16 +1271,20 @@ class Isopleth_Block_Type_6(Isopleth_Block):
         solves coordinates
         solutions is list of dicts of found solutions
         """
-        for idx,isopleth_values_single in enumerate(self.isopleth_values):
-            if len(self.draw_coordinates)<(idx+1):
-                self.draw_coordinates.append([]) # dummy expansion of matrix
-            if len(solutions)<(idx+1):
-                solutions.append({})
-            if len(self.other_points)<(idx+1):
-                self.other_points.append([])
-            if self._check_if_enough_params_(idx):
-                x1,y1,x2,y2=self.solve_single(solutions[idx],isopleth_values_single,idx)
-                self.draw_coordinates[idx]=[x1,y1,x2,y2]
+        for idx in range(len(self.isopleth_values)):
+            self.solve_row(solutions,idx)
+
+    def solve_row(self,solutions,idx):
+        """
+        solves coordinates of isopleth idx if enough values are known.
+        Returns True if solved.
+        """
+        self._expand_lists_(solutions,idx)
+        if not self._check_if_enough_params_(idx):
+            return False
+        x1,y1,x2,y2=self.solve_single(solutions[idx],self.isopleth_values[idx],idx)
+        self.draw_coordinates[idx]=[x1,y1,x2,y2]
+        return True
 
 
     def solve_single(self,solution,isopleth_values,idx):
@@ -1302,7 +1338,10 @@ class Isopleth_Block_Type_6(Isopleth_Block):
         """
         draws the isopleth
         """
-        for idx,(x1,y1,x2,y2) in enumerate(self.draw_coordinates):
+        for idx,coordinates in enumerate(self.draw_coordinates):
+            if len(coordinates)==0:
+                continue # isopleth not solved
+            x1,y1,x2,y2=coordinates
             if len(draw_params)>idx:
                 p=draw_params[idx]
             else:
@@ -1318,6 +1357,9 @@ class Isopleth_Block_Type_6(Isopleth_Block):
                           draw_params_list)
             self._draw_circle_(canvas,x1,y1,circle_radius,color_param)
             self._draw_circle_(canvas,x2,y2,circle_radius,color_param)
+            self._add_isopleth_(canvas,idx,
+                                [(x1-x_offset1,y1-y_offset1,x2-x_offset2,y2-y_offset2)],
+                                [(x1,y1),(x2,y2)])
         for idx,line_points in enumerate(self.other_points):
             if len(draw_params)>idx:
                 p=draw_params[idx]
@@ -1368,16 +1410,20 @@ class Isopleth_Block_Type_8(Isopleth_Block):
         solves coordinates
         solutions is list of dicts of found solutions
         """
-        for idx,isopleth_values_single in enumerate(self.isopleth_values):
-            if len(self.draw_coordinates)<(idx+1):
-                self.draw_coordinates.append([]) # dummy expansion of matrix
-            if len(solutions)<(idx+1):
-                solutions.append({})
-            if len(self.other_points)<(idx+1):
-                self.other_points.append([])
-            if self._check_if_enough_params_(idx):
-                x0,y0=self.solve_single(solutions[idx],isopleth_values_single,idx)
-                self.draw_coordinates[idx]=[x0,y0]
+        for idx in range(len(self.isopleth_values)):
+            self.solve_row(solutions,idx)
+
+    def solve_row(self,solutions,idx):
+        """
+        solves coordinates of isopleth idx if enough values are known.
+        Returns True if solved.
+        """
+        self._expand_lists_(solutions,idx)
+        if not self._check_if_enough_params_(idx):
+            return False
+        x0,y0=self.solve_single(solutions[idx],self.isopleth_values[idx],idx)
+        self.draw_coordinates[idx]=[x0,y0]
+        return True
 
 
     def solve_single(self,solution,isopleth_values,idx):
@@ -1403,7 +1449,10 @@ class Isopleth_Block_Type_8(Isopleth_Block):
         """
         draws the isopleth
         """
-        for idx,(x1,y1) in enumerate(self.draw_coordinates):
+        for idx,coordinates in enumerate(self.draw_coordinates):
+            if len(coordinates)==0:
+                continue # isopleth not solved
+            x1,y1=coordinates
             if len(draw_params)>idx:
                 p=draw_params[idx]
             else:
@@ -1413,9 +1462,12 @@ class Isopleth_Block_Type_8(Isopleth_Block):
             circle_radius=self.parse_circle_size(p)
             x_offset=self.atom_stack[0].params['align_x_offset']
             y_offset=self.atom_stack[0].params['align_y_offset']
+            segments=[]
             if x_offset!=0 or y_offset!=0:
                 canvas.stroke(path.line(x1,y1,x1-x_offset,y1-y_offset),draw_params_list)
+                segments.append((x1,y1,x1-x_offset,y1-y_offset))
             self._draw_circle_(canvas,x1,y1,circle_radius,color_param)
+            self._add_isopleth_(canvas,idx,segments,[(x1,y1)])
         for idx,line_points in enumerate(self.other_points):
             if len(draw_params)>idx:
                 p=draw_params[idx]
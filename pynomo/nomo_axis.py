@@ -20,8 +20,9 @@
 from pyx import *
 import math
 import scipy
-import random
-import copy, re, pprint
+import re, pprint, heapq, warnings
+import numpy
+from .nomo_sampler import *
 
 class Nomo_Axis:
     """
@@ -32,10 +33,14 @@ class Nomo_Axis:
                  tick_levels=4,tick_text_levels=3,
                  text_color=color.rgb.black, axis_color=color.rgb.black,
                  manual_axis_data={},axis_appear={},side='left',
-                 base_start=None, base_stop=None):
+                 base_start=None, base_stop=None, geometry=None,
+                 sampling_tolerance=None):
         self.titles=[] # holder for titles
         self.func_f=func_f
         self.func_g=func_g
+        self.geometry=geometry # sampled Curve_Geometry of func_f,func_g or None
+        # max error (cm) of adaptive main line, None = fixed number of sections
+        self.sampling_tolerance=sampling_tolerance
         self.start=start
         self.stop=stop
         self.side=side
@@ -96,6 +101,8 @@ class Nomo_Axis:
         self.axis_appear.update(axis_appear)
 
         self.arrows=None  # only if axis is arrow axis
+        self.tick_rows=[] # (level,u,x0,y0,x1,y1) of ticks for geometry model
+        self.text_rows=[] # (level,u,text,x,y) of texts for geometry model
         # set axes ticks
         if self.axis_appear['base_start'] is not None:
             base_start_1=self.axis_appear['base_start']
@@ -277,48 +284,48 @@ class Nomo_Axis:
         # tick level 0
         if self.tick_levels>0:
             self._make_tick_lines_(tick_0_list,line,f,g,dx_units_0,dy_units_0,
-                              self.axis_appear['grid_length_0'])
+                              self.axis_appear['grid_length_0'],level=0)
         # text level 0
         if self.tick_text_levels>0:
             self._make_texts_(tick_0_list,texts,f,g,dx_units_0,dy_units_0,angles_0,
                      self.axis_appear['text_distance_0'],
-                     self.axis_appear['text_size_0'])
+                     self.axis_appear['text_size_0'],level=0)
         # tick level 1
         if self.tick_levels>1:
             self._make_tick_lines_(tick_1_list,line,f,g,dx_units_1,dy_units_1,
-                              self.axis_appear['grid_length_1'])
+                              self.axis_appear['grid_length_1'],level=1)
         # text level 1
         if self.tick_text_levels>1:
             self._make_texts_(tick_1_list,texts,f,g,dx_units_1,dy_units_1,angles_1,
                      self.axis_appear['text_distance_1'],
-                     self.axis_appear['text_size_1'])
+                     self.axis_appear['text_size_1'],level=1)
         # tick level 2
         if self.tick_levels>2:
             self._make_tick_lines_(tick_2_list,line,f,g,dx_units_2,dy_units_2,
-                              self.axis_appear['grid_length_2'])
+                              self.axis_appear['grid_length_2'],level=2)
         # text level 2
         if self.tick_text_levels>2:
             self._make_texts_(tick_2_list,texts,f,g,dx_units_2,dy_units_2,angles_2,
                      self.axis_appear['text_distance_2'],
-                     self.axis_appear['text_size_2'])
+                     self.axis_appear['text_size_2'],level=2)
         # tick level 3
         if self.tick_levels>3:
             self._make_tick_lines_(tick_3_list,thin_line,f,g,dx_units_3,dy_units_3,
-                              self.axis_appear['grid_length_3'])
+                              self.axis_appear['grid_length_3'],level=3)
         # text level 3
         if self.tick_text_levels>3:
             self._make_texts_(tick_3_list,texts,f,g,dx_units_3,dy_units_3,angles_3,
                      self.axis_appear['text_distance_3'],
-                     self.axis_appear['text_size_3'])
+                     self.axis_appear['text_size_3'],level=3)
         # tick level 4
         if self.tick_levels>4:
             self._make_tick_lines_(tick_4_list,thin_line,f,g,dx_units_4,dy_units_4,
-                              self.axis_appear['grid_length_4'])
+                              self.axis_appear['grid_length_4'],level=4)
         # text level 4
         if self.tick_text_levels>4:
             self._make_texts_(tick_4_list,texts,f,g,dx_units_4,dy_units_4,angles_4,
                      self.axis_appear['text_distance_4'],
-                     self.axis_appear['text_size_4'])
+                     self.axis_appear['text_size_4'],level=4)
         # make main line
         self._make_main_line_(start,stop,main_line,f,g)
 
@@ -349,17 +356,19 @@ class Nomo_Axis:
         main_line = path.path(path.moveto(f(start), g(start)))
         # text list
         texts=[]
+        # positions and directions are evaluated once for all levels
+        layout=Tick_Layout(f,g,start,stop)
         # let's find tick positions
 #        tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list,start_ax,stop_ax=\
 #        find_linear_ticks(start,stop,base_start,base_stop,self.axis_appear['scale_max'])
         tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list=\
         find_linear_ticks_smart(start,stop,f,g,turn=1,base_start=base_start,
                                 base_stop=base_stop,scale_max_0=self.axis_appear['scale_max'],
-                                distance_limit=self.axis_appear['tick_distance_smart'])
+                                distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
         text_0_list,text_1_list,text_2_list,text_3_list,text_4_list=\
         find_linear_ticks_smart(start,stop,f,g,turn=1,base_start=base_start,
                                 base_stop=base_stop,scale_max_0=self.axis_appear['scale_max'],
-                                distance_limit=self.axis_appear['text_distance_smart'])
+                                distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
         remove_text_if_not_tick(tick_0_list,text_0_list)
         remove_text_if_not_tick(tick_1_list,text_1_list)
         remove_text_if_not_tick(tick_2_list,text_2_list)
@@ -369,63 +378,63 @@ class Nomo_Axis:
 #        pprint.pprint("text_list %s"%text_0_list)
 #        pprint.pprint("tick_list %s"%tick_0_list)
         # let's find tick angles
-        dx_units_0,dy_units_0,angles_0=find_tick_directions(tick_0_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_1,dy_units_1,angles_1=find_tick_directions(tick_1_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_2,dy_units_2,angles_2=find_tick_directions(tick_2_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_3,dy_units_3,angles_3=find_tick_directions(tick_3_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_4,dy_units_4,angles_4=find_tick_directions(tick_4_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_0,dy_units_0,angles_0=layout.give_directions(tick_0_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_1,dy_units_1,angles_1=layout.give_directions(tick_1_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_2,dy_units_2,angles_2=layout.give_directions(tick_2_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_3,dy_units_3,angles_3=layout.give_directions(tick_3_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_4,dy_units_4,angles_4=layout.give_directions(tick_4_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
         # let's find text angles
-        dx_units_0_text,dy_units_0_text,angles_0_text=find_tick_directions(text_0_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_1_text,dy_units_1_text,angles_1_text=find_tick_directions(text_1_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_2_text,dy_units_2_text,angles_2_text=find_tick_directions(text_2_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_3_text,dy_units_3_text,angles_3_text=find_tick_directions(text_3_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_4_text,dy_units_4_text,angles_4_text=find_tick_directions(text_4_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_0_text,dy_units_0_text,angles_0_text=layout.give_directions(text_0_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_1_text,dy_units_1_text,angles_1_text=layout.give_directions(text_1_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_2_text,dy_units_2_text,angles_2_text=layout.give_directions(text_2_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_3_text,dy_units_3_text,angles_3_text=layout.give_directions(text_3_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_4_text,dy_units_4_text,angles_4_text=layout.give_directions(text_4_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
 
         # tick level 0
         if self.tick_levels>0:
-            self._make_tick_lines_(tick_0_list,line,f,g,dx_units_0,dy_units_0,
-                              self.axis_appear['grid_length_0'])
+            self._make_tick_lines_(tick_0_list,line,layout.give_x,layout.give_y,dx_units_0,dy_units_0,
+                              self.axis_appear['grid_length_0'],level=0)
         # text level 0
         if self.tick_text_levels>0:
-            self._make_texts_(text_0_list,texts,f,g,dx_units_0_text,dy_units_0_text,angles_0_text,
+            self._make_texts_(text_0_list,texts,layout.give_x,layout.give_y,dx_units_0_text,dy_units_0_text,angles_0_text,
                      self.axis_appear['text_distance_0'],
-                     self.axis_appear['text_size_0'])
+                     self.axis_appear['text_size_0'],level=0)
         # tick level 1
         if self.tick_levels>1:
-            self._make_tick_lines_(tick_1_list,line,f,g,dx_units_1,dy_units_1,
-                              self.axis_appear['grid_length_1'])
+            self._make_tick_lines_(tick_1_list,line,layout.give_x,layout.give_y,dx_units_1,dy_units_1,
+                              self.axis_appear['grid_length_1'],level=1)
         # text level 1
         if self.tick_text_levels>1:
-            self._make_texts_(text_1_list,texts,f,g,dx_units_1_text,dy_units_1_text,angles_1_text,
+            self._make_texts_(text_1_list,texts,layout.give_x,layout.give_y,dx_units_1_text,dy_units_1_text,angles_1_text,
                      self.axis_appear['text_distance_1'],
-                     self.axis_appear['text_size_1'])
+                     self.axis_appear['text_size_1'],level=1)
         # tick level 2
         if self.tick_levels>2:
-            self._make_tick_lines_(tick_2_list,line,f,g,dx_units_2,dy_units_2,
-                              self.axis_appear['grid_length_2'])
+            self._make_tick_lines_(tick_2_list,line,layout.give_x,layout.give_y,dx_units_2,dy_units_2,
+                              self.axis_appear['grid_length_2'],level=2)
         # text level 2
         if self.tick_text_levels>2:
-            self._make_texts_(text_2_list,texts,f,g,dx_units_2_text,dy_units_2_text,angles_2_text,
+            self._make_texts_(text_2_list,texts,layout.give_x,layout.give_y,dx_units_2_text,dy_units_2_text,angles_2_text,
                      self.axis_appear['text_distance_2'],
-                     self.axis_appear['text_size_2'])
+                     self.axis_appear['text_size_2'],level=2)
         # tick level 3
         if self.tick_levels>3:
-            self._make_tick_lines_(tick_3_list,thin_line,f,g,dx_units_3,dy_units_3,
-                              self.axis_appear['grid_length_3'])
+            self._make_tick_lines_(tick_3_list,thin_line,layout.give_x,layout.give_y,dx_units_3,dy_units_3,
+                              self.axis_appear['grid_length_3'],level=3)
         # text level 3
         if self.tick_text_levels>3:
-            self._make_texts_(text_3_list,texts,f,g,dx_units_3_text,dy_units_3_text,angles_3_text,
+            self._make_texts_(text_3_list,texts,layout.give_x,layout.give_y,dx_units_3_text,dy_units_3_text,angles_3_text,
                      self.axis_appear['text_distance_3'],
-                     self.axis_appear['text_size_3'])
+                     self.axis_appear['text_size_3'],level=3)
         # tick level 4
         if self.tick_levels>4:
-            self._make_tick_lines_(tick_4_list,thin_line,f,g,dx_units_4,dy_units_4,
-                              self.axis_appear['grid_length_4'])
+            self._make_tick_lines_(tick_4_list,thin_line,layout.give_x,layout.give_y,dx_units_4,dy_units_4,
+                              self.axis_appear['grid_length_4'],level=4)
         # text level 4
         if self.tick_text_levels>4:
-            self._make_texts_(text_4_list,texts,f,g,dx_units_4_text,dy_units_4_text,angles_4_text,
+            self._make_texts_(text_4_list,texts,layout.give_x,layout.give_y,dx_units_4_text,dy_units_4_text,angles_4_text,
                      self.axis_appear['text_distance_4'],
-                     self.axis_appear['text_size_4'])
+                     self.axis_appear['text_size_4'],level=4)
         # make main line
         self._make_main_line_(start,stop,main_line,f,g)
 
@@ -433,6 +442,7 @@ class Nomo_Axis:
         self.thin_line=thin_line
         self.main_line=main_line
         self.texts=texts
+        self.tick_layout=layout
         self.tick_0_list=tick_0_list
         self.tick_1_list=tick_1_list
         self.tick_2_list=tick_2_list
@@ -461,24 +471,26 @@ class Nomo_Axis:
 #        find_linear_ticks(start,stop,base_start,base_stop,self.axis_appear['scale_max'])
         if start>stop:
             start,stop=stop,start
+        # positions and directions are evaluated once for all levels
+        layout=Tick_Layout(f,g,start,stop)
         if start>0 and stop>0:
             tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list=\
             find_log_ticks_smart(start,stop,f,g,turn=1,base_start=base_start,
                                     base_stop=base_stop,
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list,text_1_list,text_2_list,text_3_list,text_4_list=\
             find_log_ticks_smart(start,stop,f,g,turn=1,base_start=base_start,
                                     base_stop=base_stop,
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
         if start<0 and stop<0:
             tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list=\
             find_log_ticks_negative_smart(start,stop,f,g,turn=1,base_start=base_start,
                                     base_stop=base_stop,
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list,text_1_list,text_2_list,text_3_list,text_4_list=\
             find_log_ticks_negative_smart(start,stop,f,g,turn=1,base_start=base_start,
                                     base_stop=base_stop,
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
 
         if start<0 and stop>0:
             # negative side
@@ -489,7 +501,7 @@ class Nomo_Axis:
             distance=2*self.axis_appear['text_distance_smart']
             while distance>self.axis_appear['text_distance_smart']:
                 start_decade=start_decade-1
-                distance=calc_distance(f,g,-10**(start_decade),-10**(start_decade-1))
+                distance=layout.distance(-10**(start_decade),-10**(start_decade-1))
 
             # positive side
             stop_decade=math.floor(math.log10(stop))
@@ -499,7 +511,7 @@ class Nomo_Axis:
             distance=2*self.axis_appear['text_distance_smart']
             while distance>self.axis_appear['text_distance_smart']:
                 stop_decade=stop_decade-1
-                distance=calc_distance(f,g,10**(stop_decade),10**(stop_decade-1))
+                distance=layout.distance(10**(stop_decade),10**(stop_decade-1))
             # make the ticks
             start_decade=start_decade+1
             stop_decade=stop_decade+1
@@ -508,37 +520,37 @@ class Nomo_Axis:
             tick_0_list_n,tick_1_list_n,tick_2_list_n,tick_3_list_n,tick_4_list_n=\
             find_log_ticks_negative_smart(start,-10**(start_decade)*1.0001,f,g,turn=1,base_start=None,
                                     base_stop=None,
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list_n,text_1_list_n,text_2_list_n,text_3_list_n,text_4_list_n=\
             find_log_ticks_negative_smart(start,-10**(start_decade)*1.0001,f,g,turn=1,base_start=None,
                                     base_stop=None,
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
 
             tick_0_list_p,tick_1_list_p,tick_2_list_p,tick_3_list_p,tick_4_list_p=\
             find_log_ticks_smart(10**(stop_decade)*1.0001,stop,f,g,turn=1,base_start=None,
                                     base_stop=None,
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list_p,text_1_list_p,text_2_list_p,text_3_list_p,text_4_list_p=\
             find_log_ticks_smart(10**(stop_decade)*1.0001,stop,f,g,turn=1,base_start=None,
                                     base_stop=None,
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
             # middle
             tick_0_list_mn,tick_1_list_mn,tick_2_list_mn,tick_3_list_mn,tick_4_list_mn=\
             find_linear_ticks_smart(-10**(start_decade),0,f,g,turn=1,base_start=None,
                                     base_stop=None,scale_max_0=10*10**(start_decade),
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list_mn,text_1_list_mn,text_2_list_mn,text_3_list_mn,text_4_list_mn=\
             find_linear_ticks_smart(-10**(start_decade),0,f,g,turn=1,base_start=None,
                                     base_stop=None,scale_max_0=10*10**(start_decade),
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
             tick_0_list_mp,tick_1_list_mp,tick_2_list_mp,tick_3_list_mp,tick_4_list_mp=\
             find_linear_ticks_smart(0,10**(stop_decade),f,g,turn=1,base_start=None,
                                     base_stop=None,scale_max_0=10*10**(stop_decade),
-                                    distance_limit=self.axis_appear['tick_distance_smart'])
+                                    distance_limit=self.axis_appear['tick_distance_smart'],layout=layout)
             text_0_list_mp,text_1_list_mp,text_2_list_mp,text_3_list_mp,text_4_list_mp=\
             find_linear_ticks_smart(0,10**(stop_decade),f,g,turn=1,base_start=None,
                                     base_stop=None,scale_max_0=10*10**(stop_decade),
-                                    distance_limit=self.axis_appear['text_distance_smart'])
+                                    distance_limit=self.axis_appear['text_distance_smart'],layout=layout)
 
             tick_0_list=tick_0_list_n+tick_0_list_p+tick_0_list_mn+tick_0_list_mp
             tick_1_list=tick_1_list_n+tick_1_list_p+tick_1_list_mn+tick_1_list_mp
@@ -572,17 +584,17 @@ class Nomo_Axis:
         ##pprint.pprint("text_list %s"%text_0_list)
         ##pprint.pprint("tick_list %s"%tick_0_list)
         # let's find tick angles
-        dx_units_0,dy_units_0,angles_0=find_tick_directions(tick_0_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_1,dy_units_1,angles_1=find_tick_directions(tick_1_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_2,dy_units_2,angles_2=find_tick_directions(tick_2_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_3,dy_units_3,angles_3=find_tick_directions(tick_3_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_4,dy_units_4,angles_4=find_tick_directions(tick_4_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_0,dy_units_0,angles_0=layout.give_directions(tick_0_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_1,dy_units_1,angles_1=layout.give_directions(tick_1_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_2,dy_units_2,angles_2=layout.give_directions(tick_2_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_3,dy_units_3,angles_3=layout.give_directions(tick_3_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_4,dy_units_4,angles_4=layout.give_directions(tick_4_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
         # let's find text angles
-        dx_units_0_text,dy_units_0_text,angles_0_text=find_tick_directions(text_0_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_1_text,dy_units_1_text,angles_1_text=find_tick_directions(text_1_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_2_text,dy_units_2_text,angles_2_text=find_tick_directions(text_2_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_3_text,dy_units_3_text,angles_3_text=find_tick_directions(text_3_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
-        dx_units_4_text,dy_units_4_text,angles_4_text=find_tick_directions(text_4_list,f,g,self.side,start,stop,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_0_text,dy_units_0_text,angles_0_text=layout.give_directions(text_0_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_1_text,dy_units_1_text,angles_1_text=layout.give_directions(text_1_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_2_text,dy_units_2_text,angles_2_text=layout.give_directions(text_2_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_3_text,dy_units_3_text,angles_3_text=layout.give_directions(text_3_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
+        dx_units_4_text,dy_units_4_text,angles_4_text=layout.give_directions(text_4_list,self.side,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
 
         # let's save them
         self.dx_units_0=dx_units_0
@@ -605,49 +617,49 @@ class Nomo_Axis:
 
         # tick level 0
         if self.tick_levels>0:
-            self._make_tick_lines_(tick_0_list,line,f,g,dx_units_0,dy_units_0,
-                              self.axis_appear['grid_length_0'])
+            self._make_tick_lines_(tick_0_list,line,layout.give_x,layout.give_y,dx_units_0,dy_units_0,
+                              self.axis_appear['grid_length_0'],level=0)
         # text level 0
         if self.tick_text_levels>0:
-            self._make_texts_(text_0_list,texts,f,g,dx_units_0_text,dy_units_0_text,angles_0_text,
+            self._make_texts_(text_0_list,texts,layout.give_x,layout.give_y,dx_units_0_text,dy_units_0_text,angles_0_text,
                      self.axis_appear['text_distance_0'],
-                     self.axis_appear['text_size_0'])
+                     self.axis_appear['text_size_0'],level=0)
         # tick level 1
         if self.tick_levels>1:
-            self._make_tick_lines_(tick_1_list,line,f,g,dx_units_1,dy_units_1,
-                              self.axis_appear['grid_length_1'])
+            self._make_tick_lines_(tick_1_list,line,layout.give_x,layout.give_y,dx_units_1,dy_units_1,
+                              self.axis_appear['grid_length_1'],level=1)
         # text level 1
         if self.tick_text_levels>1:
-            self._make_texts_(text_1_list,texts,f,g,dx_units_1_text,dy_units_1_text,angles_1_text,
+            self._make_texts_(text_1_list,texts,layout.give_x,layout.give_y,dx_units_1_text,dy_units_1_text,angles_1_text,
                      self.axis_appear['text_distance_1'],
-                     self.axis_appear['text_size_1'])
+                     self.axis_appear['text_size_1'],level=1)
         # tick level 2
         if self.tick_levels>2:
-            self._make_tick_lines_(tick_2_list,line,f,g,dx_units_2,dy_units_2,
-                              self.axis_appear['grid_length_2'])
+            self._make_tick_lines_(tick_2_list,line,layout.give_x,layout.give_y,dx_units_2,dy_units_2,
+                              self.axis_appear['grid_length_2'],level=2)
         # text level 2
         if self.tick_text_levels>2:
-            self._make_texts_(text_2_list,texts,f,g,dx_units_2_text,dy_units_2_text,angles_2_text,
+            self._make_texts_(text_2_list,texts,layout.give_x,layout.give_y,dx_units_2_text,dy_units_2_text,angles_2_text,
                      self.axis_appear['text_distance_2'],
-                     self.axis_appear['text_size_2'])
+                     self.axis_appear['text_size_2'],level=2)
         # tick level 3
         if self.tick_levels>3:
-            self._make_tick_lines_(tick_3_list,thin_line,f,g,dx_units_3,dy_units_3,
-                              self.axis_appear['grid_length_3'])
+            self._make_tick_lines_(tick_3_list,thin_line,layout.give_x,layout.give_y,dx_units_3,dy_units_3,
+                              self.axis_appear['grid_length_3'],level=3)
         # text level 3
         if self.tick_text_levels>3:
-            self._make_texts_(text_3_list,texts,f,g,dx_units_3_text,dy_units_3_text,angles_3_text,
+            self._make_texts_(text_3_list,texts,layout.give_x,layout.give_y,dx_units_3_text,dy_units_3_text,angles_3_text,
                      self.axis_appear['text_distance_3'],
-                     self.axis_appear['text_size_3'])
+                     self.axis_appear['text_size_3'],level=3)
         # tick level 4
         if self.tick_levels>4:
-            self._make_tick_lines_(tick_4_list,thin_line,f,g,dx_units_4,dy_units_4,
-                              self.axis_appear['grid_length_4'])
+            self._make_tick_lines_(tick_4_list,thin_line,layout.give_x,layout.give_y,dx_units_4,dy_units_4,
+                              self.axis_appear['grid_length_4'],level=4)
         # text level 4
         if self.tick_text_levels>4:
-            self._make_texts_(text_4_list,texts,f,g,dx_units_4_text,dy_units_4_text,angles_4_text,
+            self._make_texts_(text_4_list,texts,layout.give_x,layout.give_y,dx_units_4_text,dy_units_4_text,angles_4_text,
                      self.axis_appear['text_distance_4'],
-                     self.axis_appear['text_size_4'])
+                     self.axis_appear['text_size_4'],level=4)
         # make main line
         self._make_main_line_(start,stop,main_line,f,g)
 
@@ -655,6 +667,7 @@ class Nomo_Axis:
         self.thin_line=thin_line
         self.main_line=main_line
         self.texts=texts
+        self.tick_layout=layout
 
 
 
@@ -679,30 +692,30 @@ class Nomo_Axis:
         # tick level 0
         if self.tick_levels>0:
             self._make_tick_lines_(tick_0_list,line,f,g,dx_units_0,dy_units_0,
-                              self.axis_appear['grid_length_0'])
+                              self.axis_appear['grid_length_0'],level=0)
         # text level 0
         if self.tick_text_levels>0:
             self._make_texts_(tick_0_list,texts,f,g,dx_units_0,dy_units_0,angles_0,
                      self.axis_appear['text_distance_0'],
-                     self.axis_appear['text_size_log_0'])
+                     self.axis_appear['text_size_log_0'],level=0)
         # tick level 1
         if self.tick_levels>1:
             self._make_tick_lines_(tick_1_list,line,f,g,dx_units_1,dy_units_1,
-                              self.axis_appear['grid_length_1'])
+                              self.axis_appear['grid_length_1'],level=1)
         # text level 1
         if self.tick_text_levels>1:
             self._make_texts_(tick_1_list,texts,f,g,dx_units_1,dy_units_1,angles_1,
                      self.axis_appear['text_distance_1'],
-                     self.axis_appear['text_size_log_1']) # smaller with log axis
+                     self.axis_appear['text_size_log_1'],level=1) # smaller with log axis
         # tick level 2
         if self.tick_levels>2:
             self._make_tick_lines_(tick_2_list,line,f,g,dx_units_2,dy_units_2,
-                              self.axis_appear['grid_length_2'])
+                              self.axis_appear['grid_length_2'],level=2)
         # text level 2
         if self.tick_text_levels>2:
             self._make_texts_(tick_2_list,texts,f,g,dx_units_2,dy_units_2,angles_2,
                      self.axis_appear['text_distance_2'],
-                     self.axis_appear['text_size_log_2'])
+                     self.axis_appear['text_size_log_2'],level=2)
 
         # make main line
         self._make_main_line_(start,stop,main_line,f,g)
@@ -724,9 +737,10 @@ class Nomo_Axis:
         #self.text_4_list=tick_4_list
 
     def _make_texts_(self,tick_list,text_list,f,g,dx_units,dy_units,angles,
-                     text_distance,text_size,manual_texts=[]):
+                     text_distance,text_size,manual_texts=[],level=None):
         """
-        makes list of text definitions
+        makes list of text definitions, texts of tick level are recorded
+        to self.text_rows
         """
         for idx,u in enumerate(tick_list):
             if dy_units[idx]<0:
@@ -746,27 +760,34 @@ class Nomo_Axis:
             else: # make a number
                 text_list.append((self._put_text_(u),f(u)+text_distance*dy_units[idx],
                                   g(u)-text_distance*dx_units[idx],text_attr))
+            if level is not None:
+                self.text_rows.append((level,u)+text_list[-1][:3])
 
     def _make_tick_lines_(self,tick_list,tick_lines,f,g,dx_units,dy_units,
-                          tick_length):
+                          tick_length,level=None):
         """
-        appends to list tick_list lines to be tick markers
+        appends to list tick_list lines to be tick markers, ticks of tick
+        level are recorded to self.tick_rows
         """
         for idx,u in enumerate(tick_list):
-            tick_lines.append(path.moveto(f(u), g(u)))
-            tick_lines.append(path.lineto(f(u)+tick_length*dy_units[idx],
-                                          g(u)-tick_length*dx_units[idx]))
+            x0,y0=f(u),g(u)
+            x1,y1=x0+tick_length*dy_units[idx],y0-tick_length*dx_units[idx]
+            tick_lines.append(path.moveto(x0, y0))
+            tick_lines.append(path.lineto(x1, y1))
+            if level is not None:
+                self.tick_rows.append((level,u,x0,y0,x1,y1))
 
     def _make_arrows_(self,tick_list,tick_lines,f,g,dx_units,dy_units,
-                          arrow_length):
+                          arrow_length,level=None):
         """
         appends to list tick_list lines to be tick markers
         """
         for idx,u in enumerate(tick_list):
-            tick_lines.append(path.line(f(u)+arrow_length*dy_units[idx],
-                                        g(u)-arrow_length*dx_units[idx],
-                                        f(u)+0.02*dy_units[idx],
-                                        g(u)-0.02*dx_units[idx]))
+            x0,y0=f(u)+arrow_length*dy_units[idx],g(u)-arrow_length*dx_units[idx]
+            x1,y1=f(u)+0.02*dy_units[idx],g(u)-0.02*dx_units[idx]
+            tick_lines.append(path.line(x0,y0,x1,y1))
+            if level is not None:
+                self.tick_rows.append((level,u,x0,y0,x1,y1))
 
     def _make_main_line_(self,start,stop,main_line,f,g,sections=350.0):
         """
@@ -774,40 +795,16 @@ class Nomo_Axis:
         """
         if start>stop:
             start,stop=stop,start
-        du=math.fabs(stop-start)*1e-12
-        # approximate line length is found
-        line_length_straigth=math.sqrt((f(start)-f(stop))**2+(g(start)-g(stop))**2)
-        random.seed(0.0) # so that mistakes always the same
-        for dummy in range(100): # for case if start = stop
-            first=random.uniform(start,stop)
-            second=random.uniform(start,stop)
-            temp=math.sqrt((f(first)-f(second))**2+(g(first)-g(second))**2)
-            if temp>line_length_straigth:
-                line_length_straigth=temp
-                #print "length: %f"%line_length_straigth
-        #sections=350.0 # about number of sections
-        section_length=line_length_straigth/sections
-        u=start
-        laskuri=1
-        main_line.append(path.moveto(f(start), g(start)))
-        while True:
-            if u<stop:
-                main_line.append(path.lineto(f(u), g(u)))
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=math.sqrt(dx**2+dy**2)
-                if dl>0:
-                    delta_u=du*section_length/dl
-                else:
-                    delta_u=du
-                # in order to avoid too slow derivatives
-                if math.fabs(stop-start)<(delta_u*100.0):
-                    delta_u=math.fabs(stop-start)/500.0
-                u+=delta_u
-
-            else:
-                main_line.append(path.lineto(f(stop), g(stop)))
-                break
+        tolerance=self.sampling_tolerance
+        if self._geometry_is_for_(start,stop,f,g):
+            u_values,x_values,y_values=self.geometry.give_polyline(sections=sections,
+                                                                   tolerance=tolerance)
+        else:
+            u_values,x_values,y_values=sample_curve(f,g,start,stop,sections=sections,
+                                                    tolerance=tolerance)
+        main_line.append(path.moveto(x_values[0], y_values[0]))
+        for x,y in zip(x_values.tolist(),y_values.tolist()):
+            main_line.append(path.lineto(x, y))
 
     def _find_center_value_(self,start,stop,f,g):
         """
@@ -815,60 +812,16 @@ class Nomo_Axis:
         """
         if start>stop:
             start,stop=stop,start
-        du=math.fabs(stop-start)*1e-12
-        # approximate line length is found
-        line_length_straigth=math.sqrt((f(start)-f(stop))**2+(g(start)-g(stop))**2)
-        random.seed(0.0) # so that mistakes always the same
-        for dummy in range(100): # for case if start = stop
-            first=random.uniform(start,stop)
-            second=random.uniform(start,stop)
-            temp=math.sqrt((f(first)-f(second))**2+(g(first)-g(second))**2)
-            if temp>line_length_straigth:
-                line_length_straigth=temp
-                #print "length: %f"%line_length_straigth
-        sections=350.0 # about number of sections
-        section_length=line_length_straigth/sections
-        # let's start length
-        u=start
-        length=0.0
-        counter=0
-        while True:
-            if u<stop:
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=math.sqrt(dx**2+dy**2)
-                if dl>0:
-                    delta_u=du*section_length/dl
-                else:
-                    delta_u=du
-                length+=section_length
-                u+=delta_u
-            else:
-                break
-            #counter+=1
-            #print counter
-        #print "length %g" % length
-        # let's find middlepoint
-        u=start
-        length_0=0.0
-        counter=0
-        while True:
-            if length_0<(length/2.0):
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=math.sqrt(dx**2+dy**2)
-                if dl>0:
-                    delta_u=du*section_length/dl
-                else:
-                    delta_u=du
-                length_0+=section_length
-                u+=delta_u
-            else:
-                break
-            counter+=1
-            #print counter
-            #print length_0
-        return u
+        if self._geometry_is_for_(start,stop,f,g):
+            return self.geometry.give_center_value(sections=350.0)
+        return find_center_value(f,g,start,stop,sections=350.0)
+
+    def _geometry_is_for_(self,start,stop,f,g):
+        """
+        checks if sampled geometry can be used for the line f,g in [start,stop]
+        """
+        return self.geometry is not None and f==self.func_f and g==self.func_g \
+               and self.geometry.covers(start,stop)
 
 
     def _make_log_axis_old(self,start,stop,f,g,turn=1):
@@ -972,6 +925,7 @@ class Nomo_Axis:
                 text_attr=[text.valign.middle,text.halign.left,text_size]
                 texts.append((label_string,f(number)+text_distance,
                           g(number),text_attr))
+            self.text_rows.append((0,number)+texts[-1][:3])
             self.canvas.fill(path.circle(f(number), g(number), 0.02))
         self.line=line
         self.thin_line=thin_line
@@ -1014,13 +968,13 @@ class Nomo_Axis:
         # ticks = arrows
         if self.tick_levels>0:
             self._make_arrows_(tick_list,arrows,f,g,dx_units,dy_units,
-                              self.axis_appear['arrow_length'])
+                              self.axis_appear['arrow_length'],level=0)
         # texts
         if self.tick_text_levels>0:
             self._make_texts_(tick_list,texts,f,g,dx_units,dy_units,angles,
                      self.axis_appear['arrow_length']+0.15,
                      self.axis_appear['text_size_0'],
-                     manual_texts=text_strings)
+                     manual_texts=text_strings,level=0)
         # make main line
         self._make_main_line_(start,stop,line,f,g)
 
@@ -1133,6 +1087,8 @@ class Nomo_Axis:
                 texts.append((label_string,f(number)-text_distance*dy_unit+x_corr,g(number)+text_distance*dx_unit+y_corr,text_attr))
                 line.append(path.moveto(f(number), g(number)))
                 line.append(path.lineto(f(number)-grid_length*dy_unit, g(number)+grid_length*dx_unit))
+                self.tick_rows.append((0,number,f(number),g(number),
+                                       f(number)-grid_length*dy_unit,g(number)+grid_length*dx_unit))
             else: # range_tick == True
                 tick_list=[number,range_end]
                 dx_units,dy_units,angles=find_tick_directions(tick_list,f,g,self.side,number,range_end,full_angle=self.axis_appear['full_angle'],extra_angle=self.axis_appear['extra_angle'],turn_relative=self.axis_appear['turn_relative'])
@@ -1152,6 +1108,11 @@ class Nomo_Axis:
                 dy_unit = (dy_units[0]+dy_units[1])/2.0
                 texts.append((label_string,x0-text_distance*dy_unit+x_corr,y0+text_distance*dx_unit+y_corr,text_attr))
                 self._make_main_line_(number,range_end,main_line,f,g,sections=35.0)
+                self.tick_rows.append((0,number,f(number),g(number),
+                                       f(number)-grid_length*dy_units[0],g(number)+grid_length*dx_units[0]))
+                self.tick_rows.append((0,range_end,f(range_end),g(range_end),
+                                       f(range_end)-grid_length*dy_units[1],g(range_end)+grid_length*dx_units[1]))
+            self.text_rows.append((0,number)+texts[-1][:3])
             if draw_extra_line:
                 line.append(path.lineto(f(number)-grid_length*dy_unit+x_corr, g(number)+grid_length*dx_unit+y_corr))
             #self.canvas.fill(path.circle(f(number), g(number), 0.02))
@@ -1181,22 +1142,14 @@ class Nomo_Axis:
                 deco.filled([arrow_color])], size=self.axis_appear['arrow_size'])])
         for ttext,x,y,attr in self.texts:
             c.text(x,y,ttext,attr+[text_color])
+        if hasattr(c,'add_scale'): # geometry model records scale entities
+            c.add_scale(self)
 
     def _draw_title_top_(self,c):
         """
          make title to top
         """
-        best_u=self.start
-        y_max=self.func_g(best_u)
-        if self.func_g(self.stop)>y_max:
-            y_max=self.func_g(self.stop)
-            best_u=self.stop
-        for dummy in range(500):
-            number=random.uniform(min(self.start,self.stop),max(self.start,self.stop))
-            y_value=self.func_g(number)
-            if y_value>y_max:
-                y_max=y_value
-                best_u=number
+        best_u=self._find_top_value_()
         c.text(self.func_f(best_u)+self.title_x_shift,
                 self.func_g(best_u)+self.title_y_shift,
                 self.title,[text.halign.center,self.axis_appear['title_color']])
@@ -1214,6 +1167,27 @@ class Nomo_Axis:
 #                    self.func_g(self.start)+self.title_y_shift, self.title,
 #                    [text.halign.center])
 
+    def _find_top_value_(self):
+        """
+        finds value of u with the highest point of axis
+        """
+        if self._geometry_is_for_(self.start,self.stop,self.func_f,self.func_g):
+            u_values,x_values,y_values=self.geometry.give_points()
+        else:
+            u_values=numpy.linspace(self.start,self.stop,501)
+            y_values=evaluate_array(self.func_g,u_values)
+        # start is preferred, then stop, as before
+        y_start=self.func_g(self.start)
+        y_stop=self.func_g(self.stop)
+        best_u,y_max=self.start,y_start
+        if y_stop>y_max:
+            best_u,y_max=self.stop,y_stop
+        if not numpy.isnan(y_values).all():
+            idx=numpy.nanargmax(y_values)
+            if y_values[idx]>y_max:
+                best_u=u_values[idx]
+        return best_u
+
     def _draw_title_center_(self,c):
         """
         draws axis title to the axis center
@@ -1263,17 +1237,7 @@ class Nomo_Axis:
         """
         draws extra titles to top
         """
-        best_u=self.start
-        y_max=self.func_g(best_u)
-        if self.func_g(self.stop)>y_max:
-            y_max=self.func_g(self.stop)
-            best_u=self.stop
-        for dummy in range(500):
-            number=random.uniform(min(self.start,self.stop),max(self.start,self.stop))
-            y_value=self.func_g(number)
-            if y_value>y_max:
-                y_max=y_value
-                best_u=number
+        best_u=self._find_top_value_()
 #        c.text(self.func_f(best_u)+self.title_x_shift,
 #                self.func_g(best_u)+self.title_y_shift,
 #                self.title,[text.halign.center,self.axis_appear['title_color']])
@@ -1371,7 +1335,19 @@ def _find_closest_tick_number_(number,tick_divisor):
 
 def find_linear_ticks(start,stop,base_start=None,base_stop=None,scale_max_0=None):
     """
-    finds tick values for linear axis
+    finds tick values for linear axis. Same as find_linear_ticks_array
+    but tick values are given in lists.
+    """
+    tick_0,tick_1,tick_2,tick_3,tick_4,start_ax,stop_ax=\
+    find_linear_ticks_array(start,stop,base_start,base_stop,scale_max_0)
+    return tick_0.tolist(),tick_1.tolist(),tick_2.tolist(),tick_3.tolist(),\
+            tick_4.tolist(),start_ax,stop_ax
+
+def find_linear_ticks_array(start,stop,base_start=None,base_stop=None,scale_max_0=None):
+    """
+    finds tick values for linear axis as arrays for five tick levels.
+    Tick values are k*scale_max/1000 with integer k and the level of a
+    tick is given by divisibility of k, so no rounding errors accumulate.
     """
     if start>stop:
         start,stop=stop,start
@@ -1381,50 +1357,23 @@ def find_linear_ticks(start,stop,base_start=None,base_stop=None,scale_max_0=None
         scale_max=10.0**math.ceil(math.log10(math.fabs(start-stop))-0.5)
     if scale_max_0 != None:
         scale_max=scale_max_0 # set range manually
-    tick_0=scale_max/10.0
-    tick_1=scale_max/20.0
-    tick_2=scale_max/100.0
-    tick_3=scale_max/500.0
-    tick_4=scale_max/1000.0
-
-    tick_0_list=[]
-    tick_1_list=[]
-    tick_2_list=[]
-    tick_3_list=[]
-    tick_4_list=[]
-    start_major=_find_closest_tick_number_(start,tick_0)-tick_0
-    stop_major=_find_closest_tick_number_(stop,tick_0)+tick_0
-    #print "scale_max %f"%scale_max
-    #print "start %f"%start
-    #print "start_major %f"%start_major
-    #print "stop_major %f"%stop_major
+    # values within 1e-6 of smallest tick from start and stop are included
+    k_start=int(math.ceil(start*1000.0/scale_max-1e-6))
+    k_stop=int(math.floor(stop*1000.0/scale_max+1e-6))
+    k=numpy.arange(k_start,k_stop+1)
+    numbers=k*scale_max/1000.0
+    level=numpy.full(len(k),4)
+    level[k%5==0]=3
+    level[k%10==0]=2
+    level[k%50==0]=1
+    level[k%100==0]=0
     start_ax=None
     stop_ax=None
-    steps=(stop-start_major)/tick_4+2
-    #print "steps %i"%steps
-    for step in range(0,int(steps)):  # used to be 9001
-        number=start_major+step*tick_4
-        if number>=start and number<=(stop*(1+1e-6)): # stupid numerical correction
-            if start_ax==None:
-                start_ax=number
-            stop_ax=number
-            if step%100==0:
-                tick_0_list.append(number)
-            if step%50==0 and step%100!=0:
-                tick_1_list.append(number)
-            if step%10==0 and step%50!=0 and step%100!=0:
-                tick_2_list.append(number)
-            if step%5==0 and step%10!=0 and step%50!=0 and step%100!=0:
-                tick_3_list.append(number)
-            if step%1==0 and step%5!=0 and step%10!=0 and step%50!=0 and step%100!=0:
-                tick_4_list.append(number)
-#    print tick_0_list
-#    print tick_1_list
-#    print tick_2_list
-#    print tick_3_list
-#    print tick_4_list
-    return tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list,\
-            start_ax,stop_ax
+    if len(numbers)>0:
+        start_ax=float(numbers[0])
+        stop_ax=float(numbers[-1])
+    return numbers[level==0],numbers[level==1],numbers[level==2],\
+            numbers[level==3],numbers[level==4],start_ax,stop_ax
 
 def find_log_ticks(start,stop):
     """
@@ -1462,7 +1411,7 @@ def find_log_ticks(start,stop):
     return tick_0_list,tick_1_list,tick_2_list,start_ax,stop_ax
 
 def find_log_ticks_smart(start,stop,f,g,turn=1,base_start=None,
-                         base_stop=None,distance_limit=0.5):
+                         base_stop=None,distance_limit=0.5,layout=None):
     """
     finds tick values for linear axis
     """
@@ -1470,6 +1419,8 @@ def find_log_ticks_smart(start,stop,f,g,turn=1,base_start=None,
         min_value,max_value=start,stop
     else:
         min_value,max_value=stop,start
+    if layout is None:
+        layout=Tick_Layout(f,g,min_value,max_value)
     max_decade=math.ceil(math.log10(max_value)-0.0001)
     min_decade=math.floor(math.log10(min_value)+0.0001)
     # resulting lists
@@ -1482,7 +1433,7 @@ def find_log_ticks_smart(start,stop,f,g,turn=1,base_start=None,
     tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list=\
     find_linear_ticks_smart(min_value,min(10**(min_decade+1),max_value),f,g,turn=1,base_start=None,\
                             base_stop=None,scale_max_0=10**(min_decade+1),\
-                            distance_limit=distance_limit)
+                            distance_limit=distance_limit,layout=layout)
     # added to include first min value if major decade
     if abs(10**min_decade-min_value)/min_value<1e-6:
         tick_0_list_final=tick_0_list_final+[10**(min_decade)]
@@ -1499,7 +1450,7 @@ def find_log_ticks_smart(start,stop,f,g,turn=1,base_start=None,
         tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list=\
         find_linear_ticks_smart(start,stop,f,g,turn=1,base_start=base_start,\
                                 base_stop=base_stop,scale_max_0=10**(decade+1),\
-                                distance_limit=distance_limit)
+                                distance_limit=distance_limit,layout=layout)
         if 10**(decade+1)<=max_value:
             tick_0_list_final=tick_0_list_final+[10**(decade+1)]
         tick_1_list_final=tick_1_list_final+tick_0_list
@@ -1524,13 +1475,16 @@ def make_negative(work_list):
     return work_list
 
 def find_log_ticks_negative_smart(start,stop,f,g,turn=1,base_start=None,
-                         base_stop=None,distance_limit=0.5):
+                         base_stop=None,distance_limit=0.5,layout=None):
     """
     finds tick values negative log
     """
+    if layout is None:
+        layout=Tick_Layout(f,g,start,stop)
+    mirror=layout.give_mirror()
     tick_0_list_final,tick_1_list_final,tick_2_list_final,\
-           tick_3_list_final,tick_4_list_final=find_log_ticks_smart(-stop,-start,lambda x:f(-x),lambda x:g(-x),turn=1,base_start=None,
-                         base_stop=None,distance_limit=distance_limit)
+           tick_3_list_final,tick_4_list_final=find_log_ticks_smart(-stop,-start,mirror.f,mirror.g,turn=1,base_start=None,
+                         base_stop=None,distance_limit=distance_limit,layout=mirror)
     tick_0_list_final=make_negative(tick_0_list_final)
     tick_0_list_final.sort()
     tick_1_list_final=make_negative(tick_1_list_final)
@@ -1546,264 +1500,504 @@ def find_log_ticks_negative_smart(start,stop,f,g,turn=1,base_start=None,
 
 def find_tick_directions(list,f,g,side,start,stop,full_angle=False,extra_angle=0,turn_relative=False):
     """
-    finds tick directions and angles
+    finds tick directions and angles, list version of
+    find_tick_directions_array
+    """
+    dx_units,dy_units,angles=\
+    find_tick_directions_array(list,f,g,side,start,stop,full_angle=full_angle,
+                               extra_angle=extra_angle,turn_relative=turn_relative)
+    return dx_units.tolist(),dy_units.tolist(),angles.tolist()
+
+def find_tick_directions_array(u_values,f,g,side,start,stop,full_angle=False,
+                               extra_angle=0,turn_relative=False,tangents=None):
     """
-    angles=[]
-    # following two values make unit vector
-    dx_units=[]
-    dy_units=[]
+    finds tick directions and angles for array u_values. Returns arrays
+    dx_units,dy_units (unit vector along line) and angles. Tangents are
+    from give_tangents_array if not given.
+    """
+    u=numpy.asarray(u_values,dtype=float)
+    if len(u)==0:
+        return numpy.zeros(0),numpy.zeros(0),numpy.zeros(0)
+    if tangents is None:
+        tangents=give_tangents_array(f,g,u,start,stop)
+    dx,dy=numpy.array(tangents[0],dtype=float),numpy.array(tangents[1],dtype=float)
+    flat=_give_flat_(dx,dy)
+    if flat.any():
+        # direction of travel from u as with forward differences
+        span=math.fabs(stop-start) or 1.0
+        h=_give_central_steps_(u,span)[flat]
+        with numpy.errstate(all='ignore'):
+            dx[flat]=evaluate_array(f,u[flat]+h)-evaluate_array(f,u[flat])
+            dy[flat]=evaluate_array(g,u[flat]+h)-evaluate_array(g,u[flat])
     turn=_determine_turn_(f=f,g=g,start=start,stop=stop,side=side,turn_relative=turn_relative)
-    for idx,u in enumerate(list):
-        if u!=list[-1]:
-            du=(list[idx+1]-list[idx])*1e-6
-        else:
-            if len(list)>1:
-                du=(list[-1]-list[-2])*1e-6
-            else: # only one element in list
-                du=abs(stop-start)*1e-6
-        #print u
-        dx=(f(u+du)-f(u))*turn
-        dy=(g(u+du)-g(u))*turn
-        dx_unit=dx/math.sqrt(dx**2+dy**2)
-        dy_unit=dy/math.sqrt(dx**2+dy**2)
-        if not full_angle:
-            if dy_unit!=0.0:
-                angle=-math.atan(dx_unit/dy_unit)*180.0/math.pi
-            else:
-                angle=0.0
-        if full_angle:
-            if dy_unit!=0.0:
-                angle=-math.atan(dx_unit/dy_unit)*180.0/math.pi
-            else:
-                angle=0.0
-            if scipy.sign(dx_unit)<0.0 and scipy.sign(dy_unit)<0.0:
-                angle=angle-180.0
-            if scipy.sign(dy_unit)<0.0 and scipy.sign(dx_unit)>=0.0:
-                angle=angle+180.0
-        angle=angle+extra_angle
-        dx_units.append(dx_unit)
-        dy_units.append(dy_unit)
-        angles.append(angle)
-    return dx_units,dy_units,angles
+    return _give_directions_(dx*turn,dy*turn,full_angle,extra_angle)
+
+def _give_flat_(dx,dy):
+    """
+    True where direction dx,dy is (numerically) along x-axis. Angle of
+    such tick is taken from direction of travel.
+    """
+    with numpy.errstate(all='ignore'):
+        return numpy.abs(dy)<=1e-9*numpy.hypot(dx,dy)
+
+def _give_directions_(dx,dy,full_angle=False,extra_angle=0):
+    """
+    unit vectors and angles of direction arrays dx,dy
+    """
+    with numpy.errstate(all='ignore'):
+        length=numpy.sqrt(dx**2+dy**2)
+        dx_units=dx/length
+        dy_units=dy/length
+        angles=numpy.where(dy_units!=0.0,-numpy.arctan(dx_units/dy_units)*180.0/math.pi,0.0)
+    if full_angle:
+        angles=angles-180.0*((numpy.sign(dx_units)<0.0)&(numpy.sign(dy_units)<0.0))
+        angles=angles+180.0*((numpy.sign(dy_units)<0.0)&(numpy.sign(dx_units)>=0.0))
+    return dx_units,dy_units,angles+extra_angle
+
+def give_tangents_array(f,g,u_values,start,stop):
+    """
+    tangents (df/du,dg/du) of line f,g at u_values. Complex step
+    differentiation is used if f and g accept complex arrays (checked
+    against central differences at a few values), vectorized central
+    differences otherwise.
+    """
+    u=numpy.asarray(u_values,dtype=float)
+    span=math.fabs(stop-start) or 1.0
+    h=_give_central_steps_(u,span)
+    tangents=_give_complex_step_tangents_(f,g,u,span,h)
+    if tangents is None:
+        tangents=_give_central_tangents_(f,g,u,h)
+    return tangents
+
+def _give_complex_step_tangents_(f,g,u,span,h_central):
+    """
+    tangents Im(f(u+ih))/h, None if f or g do not work with complex arrays
+    """
+    h=span*1e-20
+    tangents=[]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with numpy.errstate(all='ignore'):
+                for func in (f,g):
+                    values=numpy.asarray(func(u+1j*h),dtype=complex)
+                    if values.shape==():
+                        values=numpy.resize(values,u.shape)
+                    if values.shape!=u.shape:
+                        return None
+                    tangents.append(values.imag/h)
+    except Exception:
+        return None
+    # compare directions to central differences
+    check=sorted(set([0,len(u)//2,len(u)-1]))
+    dx,dy=_give_central_tangents_(f,g,u[check],h_central[check])
+    dx_complex,dy_complex=tangents[0][check],tangents[1][check]
+    with numpy.errstate(all='ignore'):
+        cross=numpy.abs(dx*dy_complex-dy*dx_complex)
+        dot=dx*dx_complex+dy*dy_complex
+        same=(cross<=1e-6*numpy.hypot(dx,dy)*numpy.hypot(dx_complex,dy_complex))&(dot>0)
+    if not same.all():
+        return None
+    return tangents[0],tangents[1]
+
+def _give_central_steps_(u,span):
+    """
+    steps for central differences, 1e-4 of spacing to closest other value
+    """
+    h=numpy.ones(len(u))*span*1e-6
+    if len(u)>1:
+        order=numpy.argsort(u)
+        gaps=numpy.diff(u[order])
+        closest=numpy.minimum(numpy.append(gaps,numpy.inf),numpy.append(numpy.inf,gaps))
+        h[order]=numpy.where(closest>0,closest*1e-4,h[order])
+    return h
+
+def _give_central_tangents_(f,g,u,h):
+    """
+    central differences with steps h, one-sided where central difference
+    is not finite (end of domain)
+    """
+    with numpy.errstate(all='ignore'):
+        x_plus,y_plus=evaluate_array(f,u+h),evaluate_array(g,u+h)
+        x_minus,y_minus=evaluate_array(f,u-h),evaluate_array(g,u-h)
+        dx=(x_plus-x_minus)/(2.0*h)
+        dy=(y_plus-y_minus)/(2.0*h)
+        one_sided=~(numpy.isfinite(dx)&numpy.isfinite(dy))
+        if one_sided.any():
+            u_0,h_0=u[one_sided],h[one_sided]
+            x,y=evaluate_array(f,u_0),evaluate_array(g,u_0)
+            dx_0=(x_plus[one_sided]-x)/h_0
+            dy_0=(y_plus[one_sided]-y)/h_0
+            backward=~(numpy.isfinite(dx_0)&numpy.isfinite(dy_0))
+            dx_0[backward]=(x-x_minus[one_sided][backward])/h_0[backward]
+            dy_0[backward]=(y-y_minus[one_sided][backward])/h_0[backward]
+            dx[one_sided]=dx_0
+            dy[one_sided]=dy_0
+    return dx,dy
+
+class Tick_Layout:
+    """
+    Positions and tangents of line f,g at tick values. Candidate values
+    are evaluated in one array pass and all tick and text levels are
+    derived from the cached values. Tangents are from give_tangents_array
+    and are calculated when directions are first asked.
+    """
+    def __init__(self,f,g,start,stop,values=[]):
+        self.f=f
+        self.g=g
+        self.start=start
+        self.stop=stop
+        self.index={}
+        self.u=numpy.zeros(0)
+        self.x=numpy.zeros(0)
+        self.y=numpy.zeros(0)
+        self.step_plus=(numpy.zeros(0),numpy.zeros(0))
+        self.step_minus=(numpy.zeros(0),numpy.zeros(0))
+        self.tangents=(numpy.zeros(0),numpy.zeros(0))
+        self.has_tangent=numpy.zeros(0,dtype=bool)
+        self.mirror=None
+        self.add(values)
+
+    def add(self,values,du=None):
+        """
+        evaluates values that are not in layout. Small steps du along the
+        line are by default 1e-6 of range.
+        """
+        new_values=sorted(set(value for value in values if value not in self.index))
+        if len(new_values)==0:
+            return
+        if du is None:
+            du=math.fabs(self.stop-self.start)*1e-6
+        if du==0.0:
+            du=1e-6
+        u=numpy.array(new_values,dtype=float)
+        x=evaluate_array(self.f,u)
+        y=evaluate_array(self.g,u)
+        with numpy.errstate(all='ignore'):
+            step_plus=(evaluate_array(self.f,u+du)-x,evaluate_array(self.g,u+du)-y)
+            step_minus=(evaluate_array(self.f,u-du)-x,evaluate_array(self.g,u-du)-y)
+        offset=len(self.x)
+        for idx,value in enumerate(new_values):
+            self.index[value]=offset+idx
+        self.u=numpy.concatenate((self.u,u))
+        self.x=numpy.concatenate((self.x,x))
+        self.y=numpy.concatenate((self.y,y))
+        self.step_plus=(numpy.concatenate((self.step_plus[0],step_plus[0])),
+                        numpy.concatenate((self.step_plus[1],step_plus[1])))
+        self.step_minus=(numpy.concatenate((self.step_minus[0],step_minus[0])),
+                         numpy.concatenate((self.step_minus[1],step_minus[1])))
+        self.tangents=(numpy.concatenate((self.tangents[0],numpy.zeros(len(u)))),
+                       numpy.concatenate((self.tangents[1],numpy.zeros(len(u)))))
+        self.has_tangent=numpy.concatenate((self.has_tangent,numpy.zeros(len(u),dtype=bool)))
+
+    def _give_indices_(self,values):
+        self.add(values)
+        return numpy.array([self.index[value] for value in values],dtype=int)
+
+    def give_x(self,u):
+        if u not in self.index:
+            self.add([u])
+        return float(self.x[self.index[u]])
+
+    def give_y(self,u):
+        if u not in self.index:
+            self.add([u])
+        return float(self.y[self.index[u]])
+
+    def distance(self,u1,u2):
+        """
+        distance between points u1 and u2
+        """
+        return math.hypot(self.give_x(u1)-self.give_x(u2),self.give_y(u1)-self.give_y(u2))
+
+    def give_positions(self,values):
+        """
+        positions x,y at values
+        """
+        idx=self._give_indices_(values)
+        return self.x[idx],self.y[idx]
+
+    def give_positions_and_steps(self,values):
+        """
+        positions x,y at values and small steps (dx,dy) from them
+        to u+du and u-du
+        """
+        idx=self._give_indices_(values)
+        return self.x[idx],self.y[idx],\
+               (self.step_plus[0][idx],self.step_plus[1][idx]),\
+               (self.step_minus[0][idx],self.step_minus[1][idx])
+
+    def give_tangents(self,values):
+        """
+        tangents (df/du,dg/du) at values, calculated once for each value
+        """
+        idx=self._give_indices_(values)
+        new_idx=numpy.unique(idx[~self.has_tangent[idx]])
+        if len(new_idx)>0:
+            dx,dy=give_tangents_array(self.f,self.g,self.u[new_idx],self.start,self.stop)
+            self.tangents[0][new_idx]=dx
+            self.tangents[1][new_idx]=dy
+            self.has_tangent[new_idx]=True
+        return self.tangents[0][idx],self.tangents[1][idx]
+
+    def give_directions(self,values,side,full_angle=False,extra_angle=0,turn_relative=False):
+        """
+        tick directions and angles of find_tick_directions_array with
+        cached tangents
+        """
+        if len(values)==0:
+            return [],[],[]
+        dx_units,dy_units,angles=\
+        find_tick_directions_array(values,self.f,self.g,side,self.start,self.stop,
+                                   full_angle=full_angle,extra_angle=extra_angle,
+                                   turn_relative=turn_relative,
+                                   tangents=self.give_tangents(values))
+        return dx_units.tolist(),dy_units.tolist(),angles.tolist()
+
+    def give_mirror(self):
+        """
+        layout of mirrored line f(-u),g(-u), used for negative log scales
+        """
+        if self.mirror is None:
+            f,g=self.f,self.g
+            self.mirror=Tick_Layout(lambda x:f(-x),lambda x:g(-x),-self.stop,-self.start)
+        return self.mirror
 
 def find_linear_ticks_smart(start,stop,f,g,turn=1,base_start=None,
-                            base_stop=None,scale_max_0=None,distance_limit=0.5):
+                            base_stop=None,scale_max_0=None,distance_limit=0.5,
+                            layout=None):
     """
-    finds smart ticks
+    finds smart ticks. Major ticks closer than distance_limit are thinned
+    with _thin_ticks_smart_. Positions are taken from Tick_Layout layout
+    that can be shared between tick and text levels.
     """
-    # first find tick scales
     if start>stop:
         start,stop=stop,start
-    if (base_start != None) and (base_stop != None):
-        scale_max=10.0**math.ceil(math.log10(math.fabs(base_start-base_stop))-0.5)
-    else:
-        scale_max=10.0**math.ceil(math.log10(math.fabs(start-stop))-0.5)
-    if scale_max_0 != None:
-        scale_max=scale_max_0 # set range manually
-    tick_0=scale_max/10.0
-    tick_1=scale_max/20.0
-    tick_2=scale_max/100.0
-    tick_3=scale_max/500.0
-    tick_4=scale_max/1000.0
+    if layout is None:
+        layout=Tick_Layout(f,g,start,stop)
     # let's find tick positions manually
-    tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list,\
-    start_ax,stop_ax=\
-    find_linear_ticks(start,stop,base_start,base_stop,scale_max_0)
-    # let's save original lists
     tick_0_list0,tick_1_list0,tick_2_list0,tick_3_list0,tick_4_list0,\
     start_ax0,stop_ax0=\
     find_linear_ticks(start,stop,base_start,base_stop,scale_max_0)
-    # let's find 0 level ticks
-    distance_0={}
-    # remove smaller distances
-    while True:
-        distances=[]
-        for idx in range(1,len(tick_0_list)-1):
-#            # for debugging
-#            number1=tick_0_list[idx-1]
-#            number2=tick_0_list[idx]
-#            number3=tick_0_list[idx+1]
-            distance1=calc_distance(f,g,tick_0_list[idx],tick_0_list[idx-1])
-            distance2=calc_distance(f,g,tick_0_list[idx],tick_0_list[idx+1])
-            # check if going round edge of scale
-            diff_1a=tick_0_list[idx]-tick_0_list[idx-1]
-            distance1a=calc_distance(f,g,tick_0_list[idx],tick_0_list[idx-1]+0.01*diff_1a)
-            diff_2a=tick_0_list[idx]-tick_0_list[idx+1]
-            distance2a=calc_distance(f,g,tick_0_list[idx],tick_0_list[idx+1]+0.01*diff_2a)
-            value1=0
-            value2=0
-            if distance1>distance1a:
-                value1=distance1
-            if distance2>distance2a:
-                value2=distance2
-            # let's make zeros better
-            if value1==0:
-                value1=value2
-            if value2==0:
-                value2=value1
-            distances.append([idx,value1,value2])
-        # find minimum distance
-        no_found=True
-        for [idx,value1,value2] in distances:
-            if value1<distance_limit or value2<distance_limit:
-                if value1>0 or value2>0:
-                    if no_found:
-                        minimum_idx=idx
-                        minimum_value=value1+value2
-                        no_found=False # first found
-                    else: # something is found before
-                        if minimum_value>(value1+value2):
-                            minimum_value=value1+value2
-                            minimum_idx=idx
-        if no_found:
-            break
-        else:
-            tick_0_list.pop(minimum_idx)
-    # add possible middle values
-    possible_values=[]
-    for value in tick_0_list0:
-        if tick_0_list.count(value)==0:
-            possible_values.append(value)
-    if len(tick_0_list)>0:
-        while True:
-            distance_0={}
-            distances=[]
-            tick_0_list.sort()
-            for value in possible_values:
-                no_distance=True
-                for idx in range(0,len(tick_0_list)):
-                    distance=calc_distance(f,g,value,tick_0_list[idx])
-                    # let's see if turned between
-                    diff=(value-tick_0_list[idx])*1e-3
-                    distance_bigger=calc_distance(f,g,value+diff,tick_0_list[idx]-diff)
-                    distance_smaller=calc_distance(f,g,value-diff,tick_0_list[idx]+diff)
-                    if distance_smaller<distance_bigger: # see if not turned
-                        if no_distance: # first round
-                            min_distance=distance
-                            no_distance=False
-                        else:
-                            if distance<min_distance:
-                                min_distance=distance
-                if min_distance>distance_limit:
-                    distances.append(min_distance)
-                    distance_0[min_distance]=value
-            if len(distances)==0:
-                break
-            else:
-                added_value=distance_0[max(distances)]
-                tick_0_list.append(added_value)
-                possible_values.remove(added_value)
-
-    tick_0_list.sort()
-
-    tick_1_list_worked=remove_from_list_half(tick_1_list0,tick_0_list0,f,g,distance_limit=distance_limit)
-    tick_2_list_worked=remove_from_list_in_four(tick_2_list0,tick_0_list0+tick_1_list0,f,g,distance_limit=distance_limit)
-    tick_3_list_worked=remove_from_list_half(tick_3_list0,tick_0_list0+tick_1_list0+tick_2_list0,f,g,distance_limit=distance_limit)
+    layout.add(tick_0_list0+tick_1_list0+tick_2_list0+tick_3_list0+tick_4_list0,
+               du=math.fabs(stop-start)*1e-6)
+    tick_0_list=_thin_ticks_smart_(tick_0_list0,layout,distance_limit)
+    f,g=layout.give_x,layout.give_y
+    tick_1_list_worked=remove_from_list_half(tick_1_list0,tick_0_list0,f,g,
+                                             distance_limit=distance_limit,layout=layout)
+    tick_2_list_worked=remove_from_list_in_four(tick_2_list0,tick_0_list0+tick_1_list0,f,g,
+                                                distance_limit=distance_limit,layout=layout)
+    tick_3_list_worked=remove_from_list_half(tick_3_list0,tick_0_list0+tick_1_list0+tick_2_list0,f,g,
+                                             distance_limit=distance_limit,layout=layout)
     tick_4_list_worked=remove_from_list_in_four(tick_4_list0,tick_0_list0+tick_1_list0+tick_2_list0+tick_3_list0,
-                                                f,g,distance_limit=distance_limit)
-
-#    pprint.pprint(tick_0_list)
-#    pprint.pprint(tick_1_list_worked)
-#    pprint.pprint(tick_2_list_worked)
-#    pprint.pprint(tick_3_list_worked)
-#    pprint.pprint(tick_4_list_worked)
+                                                f,g,distance_limit=distance_limit,layout=layout)
     return tick_0_list,tick_1_list_worked,tick_2_list_worked,tick_3_list_worked,tick_4_list_worked
 
-def remove_from_list_in_four(work_list,upper_list,f,g,distance_limit=0.5):
+def _thin_ticks_smart_(values,layout,distance_limit=0.5):
+    """
+    removes ticks of sorted list values that are closer than
+    distance_limit to their neighbours (closest first) and then adds back
+    removed ticks that are farther than distance_limit from their
+    kept neighbours (farthest first). Positions and steps along the
+    scale are taken from Tick_Layout layout, neighbours are kept in a
+    linked list and candidates in heaps. Returns the sorted list of kept
+    values. Equal candidates are taken as in the earlier loops: the
+    lowest value is removed first and the highest value is added first.
+    """
+    n=len(values)
+    if n<3:
+        return list(values)
+    u=numpy.array(values,dtype=float)
+    x,y,step_plus,step_minus=layout.give_positions_and_steps(values)
+
+    def distance(i,j):
+        # as in calc_distance, so that ties are broken the same way
+        return math.sqrt((x[j]-x[i])**2+(y[j]-y[i])**2)
+
+    def step(i,j):
+        # small step along the scale from i towards j
+        if u[j]>u[i]:
+            return step_plus[0][i],step_plus[1][i]
+        return step_minus[0][i],step_minus[1][i]
+
+    def toward(i,j):
+        # True if moving from j towards i gets closer to i
+        # (scale does not turn around between them)
+        dx,dy=step(j,i)
+        return (x[i]-x[j])*dx+(y[i]-y[j])*dy>0
+
+    # removal: linked list of kept ticks, heap of (v1+v2,idx,version)
+    before=list(range(-1,n-1))
+    after=list(range(1,n+1))
+    version=[0]*n
+    removed=[False]*n
+    heap=[]
+
+    def push_removal(idx):
+        version[idx]+=1
+        if before[idx]<0 or after[idx]>=n:
+            return # first and last are kept
+        value1=distance(idx,before[idx]) if toward(idx,before[idx]) else 0
+        value2=distance(idx,after[idx]) if toward(idx,after[idx]) else 0
+        # let's make zeros better
+        if value1==0:
+            value1=value2
+        if value2==0:
+            value2=value1
+        if (value1<distance_limit or value2<distance_limit) and (value1>0 or value2>0):
+            heapq.heappush(heap,(value1+value2,idx,version[idx]))
+
+    for idx in range(1,n-1):
+        push_removal(idx)
+    while heap:
+        dummy,idx,idx_version=heapq.heappop(heap)
+        if removed[idx] or idx_version!=version[idx]:
+            continue
+        removed[idx]=True
+        after[before[idx]]=after[idx]
+        before[after[idx]]=before[idx]
+        push_removal(before[idx])
+        push_removal(after[idx])
+
+    # add possible middle values, neighbours are the closest kept ticks
+    kept=[idx for idx in range(n) if not removed[idx]]
+    left=[-1]*n
+    right=[n]*n
+    heap=[]
+
+    def not_turned(i,j):
+        # moving i and j towards each other makes them closer
+        dx_i,dy_i=step(i,j)
+        dx_j,dy_j=step(j,i)
+        return (x[i]-x[j])*(dx_i-dx_j)+(y[i]-y[j])*(dy_i-dy_j)<0
+
+    def push_addition(idx):
+        version[idx]+=1
+        distances=[distance(idx,j) for j in (left[idx],right[idx])
+                   if 0<=j<n and not_turned(idx,j)]
+        if len(distances)>0 and min(distances)>distance_limit:
+            heapq.heappush(heap,(-min(distances),-idx,version[idx]))
+
+    def set_neighbours(first,last):
+        # removed ticks between kept ticks first and last
+        for idx in range(first+1,last):
+            left[idx]=first
+            right[idx]=last
+            push_addition(idx)
+
+    for first,last in zip([-1]+kept,kept+[n]):
+        set_neighbours(first,last)
+    while heap:
+        dummy,idx,idx_version=heapq.heappop(heap)
+        idx=-idx
+        if not removed[idx] or idx_version!=version[idx]:
+            continue
+        removed[idx]=False
+        first,last=left[idx],right[idx]
+        set_neighbours(first,idx)
+        set_neighbours(idx,last)
+    return [values[idx] for idx in range(n) if not removed[idx]]
+
+def remove_from_list_in_four(work_list,upper_list,f,g,distance_limit=0.5,layout=None):
     """
     Return a list where elements from work list are removed.
-    Assumes that ticks are in complex of four
+    Assumes that ticks are in complex of four. Works on sorted arrays
+    with a keep mask, work_list is sorted and repeated values are removed.
     """
     upper_list.sort()
-    worked_list=copy.deepcopy(work_list)
-    # let's check bottom
-    upper_level_minimum=min(upper_list)
-    numbers=[x for x in work_list if x<upper_level_minimum]
-    removed_numbers=[]
-    for y in numbers+[upper_level_minimum]:
-        for x in numbers:
-            distance=calc_distance(f,g,x,y)
-            if distance<distance_limit and x!=y:
-                if removed_numbers.count(x)==0:
-                    removed_numbers.append(x)
-    if len(removed_numbers)>0:
-        for number in numbers:
-            worked_list.remove(number) # remove all
-    # let's check top
-    upper_level_maximum=max(upper_list)
-    numbers=[x for x in work_list if x>upper_level_maximum]
-    removed_numbers=[]
-    for y in numbers+[upper_level_maximum]:
-        for x in numbers:
-            distance=calc_distance(f,g,x,y)
-            if distance<distance_limit and x!=y:
-                if removed_numbers.count(x)==0:
-                    removed_numbers.append(x)
-    if len(removed_numbers)>0:
-        for number in numbers:
-            worked_list.remove(number) # remove all
-    # let's check between
-    worked_list_0=copy.deepcopy(worked_list)
-    upper_idx=0
-    work_idx=0
-    while len(worked_list_0)>(work_idx+1):
-        # to start in correct position
-        while worked_list_0[work_idx]<min(upper_list):
-            work_idx=work_idx+1
-        d=[]
-        if len(worked_list_0)>(work_idx) and len(upper_list)>(upper_idx):
-            d.append(calc_distance(f,g,upper_list[upper_idx],worked_list_0[work_idx]))
-        if len(worked_list_0)>(work_idx+1):
-            d.append(calc_distance(f,g,worked_list_0[work_idx],worked_list_0[work_idx+1]))
-        if len(worked_list_0)>(work_idx+2):
-            d.append(calc_distance(f,g,worked_list_0[work_idx+1],worked_list_0[work_idx+2]))
-        if len(worked_list_0)>(work_idx+3):
-            d.append(calc_distance(f,g,worked_list_0[work_idx+2],worked_list_0[work_idx+3]))
-        if len(worked_list_0)>(work_idx+3) and len(upper_list)>(upper_idx+1):
-            d.append(calc_distance(f,g,worked_list_0[work_idx+3],upper_list[upper_idx+1]))
-        if len(d)>0:
-            if min(d)<distance_limit:
-                for idx in range(work_idx,work_idx+4):
-                    if len(worked_list_0)>idx:
-                        worked_list.remove(worked_list_0[idx])
-        upper_idx=upper_idx+1
-        work_idx=work_idx+4
-    return worked_list
-
-def remove_from_list_half(work_list,upper_list,f,g,distance_limit=0.5):
+    work_list=sorted(set(work_list))
+    work=numpy.array(work_list,dtype=float)
+    if len(work)==0 or len(upper_list)==0:
+        return work_list
+    x_work,y_work=_give_tick_positions_(work_list,f,g,layout)
+    x_upper,y_upper=_give_tick_positions_(upper_list,f,g,layout)
+    n_upper=len(upper_list)
+    keep=numpy.ones(len(work),dtype=bool)
+    # let's check bottom and top, all are removed if any two are close
+    for outside,upper_idx in ((work<upper_list[0],0),(work>upper_list[-1],n_upper-1)):
+        if not outside.any():
+            continue
+        x=numpy.append(x_work[outside],x_upper[upper_idx])
+        y=numpy.append(y_work[outside],y_upper[upper_idx])
+        distances=numpy.sqrt((x[:-1,None]-x[None,:])**2+(y[:-1,None]-y[None,:])**2)
+        numpy.fill_diagonal(distances[:,:-1],numpy.inf)
+        if (distances<distance_limit).any():
+            keep[outside]=False
+    # let's check between in complexes of four starting from first not below upper
+    kept=numpy.flatnonzero(keep)
+    n=len(kept)
+    if n<=1:
+        return [work_list[idx] for idx in kept]
+    first=int(numpy.searchsorted(work[kept],upper_list[0]))
+    if first>=n: # nothing between upper values
+        return [work_list[idx] for idx in kept]
+    x,y=x_work[kept],y_work[kept]
+    start=numpy.arange(first,max(n-1,first+1),4)
+    complex_idx=numpy.arange(len(start))
+    with numpy.errstate(invalid='ignore'):
+        steps=numpy.sqrt(numpy.diff(x)**2+numpy.diff(y)**2)
+        steps=numpy.append(steps,[numpy.nan]*3)
+        in_upper=complex_idx<n_upper
+        upper_idx=numpy.minimum(complex_idx,n_upper-1)
+        to_upper=numpy.sqrt((x[start]-x_upper[upper_idx])**2+(y[start]-y_upper[upper_idx])**2)
+        next_upper=numpy.minimum(complex_idx+1,n_upper-1)
+        last=numpy.minimum(start+3,n-1)
+        to_next_upper=numpy.sqrt((x[last]-x_upper[next_upper])**2+(y[last]-y_upper[next_upper])**2)
+        close=(in_upper&(to_upper<distance_limit))|(steps[start]<distance_limit)|\
+              ((start+2<n)&(steps[start+1]<distance_limit))|\
+              ((start+3<n)&(steps[start+2]<distance_limit))|\
+              ((start+3<n)&(complex_idx+1<n_upper)&(to_next_upper<distance_limit))
+        # min of list with nan first is nan
+        first_distance=numpy.where(in_upper,to_upper,steps[start])
+        close&=~numpy.isnan(first_distance)
+    removed=numpy.zeros(n,dtype=bool)
+    removed[first:first+4*len(close)]=numpy.repeat(close,4)[:n-first]
+    keep[kept[removed]]=False
+    return [work_list[idx] for idx in numpy.flatnonzero(keep)]
+
+def remove_from_list_half(work_list,upper_list,f,g,distance_limit=0.5,layout=None):
     """
-    removes from list half points
+    removes from list half points. Works on arrays with a keep mask,
+    work_list is sorted and repeated values are removed.
     """
-    worked_list=copy.deepcopy(work_list)
     upper_list.sort()
-    upper_idx=0
-    work_idx=0
-    if len(work_list)>0 and len(upper_list)>0:
-        if min(work_list)<min(upper_list):
-            while len(work_list)>(work_idx):
-                d=[]
-                if len(upper_list)>(upper_idx+1):
-                    d.append(calc_distance(f,g,upper_list[upper_idx+1],work_list[work_idx]))
-                if len(upper_list)>(upper_idx):
-                    d.append(calc_distance(f,g,upper_list[upper_idx],work_list[work_idx]))
-                if len(d)>0:
-                    if min(d)<distance_limit:
-                        worked_list.remove(work_list[work_idx])
-                upper_idx=upper_idx+1
-                work_idx=work_idx+1
-        if min(work_list)>min(upper_list):
-            while len(work_list)>(work_idx):
-                d=[]
-                if len(upper_list)>(upper_idx):
-                    d.append(calc_distance(f,g,upper_list[upper_idx],work_list[work_idx]))
-                if upper_idx>0:
-                    d.append(calc_distance(f,g,upper_list[upper_idx-1],work_list[work_idx]))
-                if len(d)>0:
-                    if min(d)<distance_limit:
-                        worked_list.remove(work_list[work_idx])
-                upper_idx=upper_idx+1
-                work_idx=work_idx+1
-    return worked_list
+    work_list=sorted(set(work_list))
+    if len(work_list)==0 or len(upper_list)==0:
+        return work_list
+    n=len(work_list)
+    n_upper=len(upper_list)
+    x_work,y_work=_give_tick_positions_(work_list,f,g,layout)
+    x_upper,y_upper=_give_tick_positions_(upper_list,f,g,layout)
+    work_idx=numpy.arange(n)
+    if min(work_list)<upper_list[0]:
+        # work_idx is between upper_idx and upper_idx+1
+        neighbours=((work_idx+1,work_idx+1<n_upper),(work_idx,work_idx<n_upper))
+    elif min(work_list)>upper_list[0]:
+        # work_idx is between upper_idx-1 and upper_idx
+        neighbours=((work_idx,work_idx<n_upper),
+                    (work_idx-1,(work_idx>0)&(work_idx-1<n_upper)))
+    else:
+        return work_list
+    distances=[]
+    for upper_idx,valid in neighbours:
+        upper_idx=numpy.clip(upper_idx,0,n_upper-1)
+        with numpy.errstate(invalid='ignore'):
+            distance=numpy.sqrt((x_upper[upper_idx]-x_work)**2+(y_upper[upper_idx]-y_work)**2)
+        distances.append(numpy.where(valid,distance,numpy.inf))
+    with numpy.errstate(invalid='ignore'):
+        close=(distances[0]<distance_limit)|(distances[1]<distance_limit)
+    # min of list with nan first is nan
+    close&=~numpy.isnan(numpy.where(neighbours[0][1],distances[0],distances[1]))
+    return [work_list[idx] for idx in work_idx[~close]]
+
+def _give_tick_positions_(values,f,g,layout=None):
+    """
+    positions of values, from layout if given
+    """
+    if layout is not None:
+        return layout.give_positions(values)
+    return numpy.array([f(value) for value in values],dtype=float),\
+           numpy.array([g(value) for value in values],dtype=float)
 
 def remove_text_if_not_tick(tick_values,text_values):
     """
@@ -25,21 +25,26 @@ optimize explicitely
 """
 from scipy.optimize import *
 from numpy import *
-import random
+from .nomo_sampler import *
+from .nomo_text_cache import *
 from pyx import *
-from copy import copy
+import scipy.optimize
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import time
 
 class Axis_Wrapper:
     """
     class to wrap axis functionalities. Grid_wrapper and other classes
     will be derived from this.
     """
-    def __init__(self,f,g,start,stop,sections=350):
-        self.sections=sections # how many sections are used for calculations
+    def __init__(self,f,g,start,stop,sections=350,geometry=None):
+        self.n_sections=sections # how many sections are used for calculations
         self.f=f
         self.g=g
         self.start=start
         self.stop=stop
+        self.geometry=geometry # Curve_Geometry of f,g if already calculated
         # initial transformation coeffs
         self.set_transformation()
         self._calculate_points_()
@@ -50,71 +55,18 @@ class Axis_Wrapper:
         """
         calculates points and segments of the line
         """
-        f=self.f
-        g=self.g
-        start=self.start
-        stop=self.stop
-        #du=fabs(start-stop)*1e-8
-        du=fabs(start-stop)*1e-12
-        # approximate line length is found
-        line_length_straigth=sqrt((f(start)-f(stop))**2+(g(start)-g(stop))**2)
-        random.seed(0.1) # so that mistakes always the same
-        for dummy in range(100):
-            first=random.uniform(start,stop)
-            second=random.uniform(start,stop)
-            temp=sqrt((f(first)-f(second))**2+(g(first)-g(second))**2)
-            if temp>line_length_straigth:
-                line_length_straigth=temp
-                #print "length: %f"%line_length_straigth
-        sections=self.sections # about number of sections
-        section_length=line_length_straigth/sections
-        line = [(f(start), g(start))]
-        line.append((f(start), g(start)))
-        u=start
-        count=1
-        while True:
-            if u<stop:
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=sqrt(dx**2+dy**2)
-                delta_u=du*section_length/dl
-                # let's calculate actual length
-                # and iterate until length is in factor 2 from target
-                """
-                while True:
-                    delta_x=f(u+delta_u)-f(u)
-                    delta_y=g(u+delta_u)-g(u)
-                    delta_l=sqrt(delta_x**2+delta_y**2)
-
-                    if delta_l>2.0*section_length:
-                        delta_u=delta_u*0.999
-                        #print "delta_u pienenee:%f"%delta_u
-                    else:
-                        if delta_l<section_length/2.0:
-                            delta_u=delta_u*1.001
-                            #print "delta_u kasvaa:%f"%delta_u
-                    if delta_l<=2*section_length and delta_l>=0.5*section_length:
-                        break
-                """
-                u+=delta_u
-                #print u,stop
-                count=count+1
-                if u<stop:
-                    line.append((f(u), g(u)))
-            else:
-                line.append((f(stop), g(stop)))
-                #print count
-                #print line
-                break
-        self.line=line
-        # calculate sections
-        sections=[]
-        for index,(x,y) in enumerate(line):
-            if index>1:
-                sections.append((x,y,prev_x,prev_y))
-            prev_x=x
-            prev_y=y
-        self.sections=sections
+        if self.geometry is None:
+            self.geometry=sample_geometry(self.f,self.g,self.start,self.stop,
+                                          sections=self.n_sections)
+        u_values,x_values,y_values=self.geometry.give_polyline(sections=self.n_sections)
+        # points as array, lists are made only if asked
+        self.polyline=Polyline(x_values,y_values,u_values)
+
+    # list views of the polyline
+    line=property(lambda self:self.polyline.give_line(),
+                  doc="list of points (x,y)")
+    sections=property(lambda self:self.polyline.give_sections(),
+                      doc="list of sections (x,y,prev_x,prev_y)")
 
     def give_trafo_x(self,x,y):
         """
@@ -147,19 +99,27 @@ class Axis_Wrapper:
         self.beta3=beta3
         self.gamma3=gamma3
 
+    def give_trafo_mat(self):
+        """
+        returns the transformation as 3x3 matrix
+        """
+        return array([[self.alpha1,self.beta1,self.gamma1],
+                      [self.alpha2,self.beta2,self.gamma2],
+                      [self.alpha3,self.beta3,self.gamma3]])
+
+    def give_trafo_points(self):
+        """
+        transformed points of the line as arrays x,y
+        """
+        points=self.polyline.points
+        return apply_trafo(self.give_trafo_mat(),points[:,0],points[:,1])
+
     def calc_length(self):
         """
         calculates length of the basic line
         """
-        length=0
-        for x1,y1,x2,y2 in self.sections:
-            x1t=self.give_trafo_x(x1, y1)
-            y1t=self.give_trafo_y(x1, y1)
-            x2t=self.give_trafo_x(x2, y2)
-            y2t=self.give_trafo_y(x2, y2)
-            section=sqrt((x1t-x2t)**2+(y1t-y2t)**2)
-            length=length+section
-        #print length
+        x_trafo,y_trafo=self.give_trafo_points()
+        length=float(sum(hypot(diff(x_trafo),diff(y_trafo))))
         self.length=length
         return length
 
@@ -183,24 +143,11 @@ class Axis_Wrapper:
         """
         calculates bounding box for axis
         """
-        line=self.line
-        (x_0,y_0)=line[0]
-        x_left=self.give_trafo_x(x_0, y_0)
-        y_top=self.give_trafo_y(x_0, y_0)
-        x_right=self.give_trafo_x(x_0, y_0)
-        y_bottom=self.give_trafo_y(x_0, y_0)
-        for x,y in line:
-            x_trafo=self.give_trafo_x(x, y)
-            y_trafo=self.give_trafo_y(x, y)
-            if x_trafo<x_left:
-                x_left=x_trafo
-            if x_trafo>x_right:
-                x_right=x_trafo
-            if y_trafo<y_bottom:
-                y_bottom=y_trafo
-            if y_trafo>y_top:
-                y_top=y_trafo
-        #print x_left,x_right,y_bottom,y_top
+        x_trafo,y_trafo=self.give_trafo_points()
+        x_left=float(nanmin(x_trafo))
+        x_right=float(nanmax(x_trafo))
+        y_bottom=float(nanmin(y_trafo))
+        y_top=float(nanmax(y_trafo))
         # in case there is no area inside box, let's make
         # small in order to avoid singularities. These are
         # specifically for dual-axis stationary scales
@@ -212,60 +159,37 @@ class Axis_Wrapper:
         self.x_right=x_right
         self.y_top=y_top
         self.y_bottom=y_bottom
-        #print x_left,x_right,y_bottom,y_top
         return x_left,x_right,y_bottom,y_top
 
     def calc_highest_point(self):
         """
         calculates point with heighest y_value
         """
-        line=self.line
-        (x_0,y_0)=line[0]
-        x_best=self.give_trafo_x(x_0, y_0)
-        y_best=self.give_trafo_y(x_0, y_0)
-        for x,y in line:
-            x_trafo=self.give_trafo_x(x, y)
-            y_trafo=self.give_trafo_y(x, y)
-            if y_trafo>y_best:
-                y_best=y_trafo
-                x_best=x_trafo
-        return x_best,y_best
+        x_trafo,y_trafo=self.give_trafo_points()
+        idx=nanargmax(y_trafo)
+        return float(x_trafo[idx]),float(y_trafo[idx])
 
     def calc_lowest_point(self):
         """
         calculates point with lowest y-value
         """
-        line=self.line
-        (x_0,y_0)=line[0]
-        x_best=self.give_trafo_x(x_0, y_0)
-        y_best=self.give_trafo_y(x_0, y_0)
-        for x,y in line:
-            x_trafo=self.give_trafo_x(x, y)
-            y_trafo=self.give_trafo_y(x, y)
-            if y_trafo<y_best:
-                y_best=y_trafo
-                x_best=x_trafo
-        return x_best,y_best
+        x_trafo,y_trafo=self.give_trafo_points()
+        idx=nanargmin(y_trafo)
+        return float(x_trafo[idx]),float(y_trafo[idx])
 
     def calc_min_slope(self,x_ref,y_ref):
         """
         calculates minimum absolute slope of any point in axis and
         given point (x_ref,y_ref)
         """
-        line=self.line
-        (x_0,y_0)=line[0]
-        x_best=self.give_trafo_x(x_0, y_0)
-        y_best=self.give_trafo_y(x_0, y_0)
-        slope_best=self._calc_slope_(x_best,y_best,x_ref,y_ref)
-        for x,y in line:
-            x_trafo=self.give_trafo_x(x, y)
-            y_trafo=self.give_trafo_y(x, y)
-            slope=self._calc_slope_(x_trafo,y_trafo,x_ref,y_ref)
-            if slope<slope_best:
-                y_best=y_trafo
-                x_best=x_trafo
-                slope_best=slope
-        return x_best,y_best,slope_best
+        x_trafo,y_trafo=self.give_trafo_points()
+        dx=abs(x_ref-x_trafo)
+        dy=abs(y_trafo-y_ref)
+        slopes=full(len(x_trafo),1e120) # = big number when dx close to zero
+        steep=dx>1e-9
+        slopes[steep]=dy[steep]/dx[steep]
+        idx=argmin(slopes)
+        return float(x_trafo[idx]),float(y_trafo[idx]),float(slopes[idx])
 
     def _calc_slope_(self,x1,y1,x2,y2):
         """
@@ -283,6 +207,250 @@ class Axis_Wrapper:
 
 
 
+class Trafo_Stack:
+    """
+    stack of 3x3 transformation matrices [M0,M1,...,Mk] with total
+    transformation M0*Mk*...*M1 (same order as before, M0 is the initial
+    matrix). Products Mi*...*M1 are cached, so changing the last matrix
+    only recomposes the tail. Total transformation is kept in array
+    self.matrix that is updated in place and can be shared.
+    """
+    def __init__(self):
+        self.matrices=[]
+        self.prefix=[] # prefix[i]=Mi*...*M1, prefix[0]=identity
+        self.matrix=identity(3)
+
+    def __len__(self):
+        return len(self.matrices)
+
+    def __getitem__(self,idx):
+        return self.matrices[idx]
+
+    def __iter__(self):
+        return iter(self.matrices)
+
+    def append(self,trafo_mat):
+        """
+        adds matrix to the end of stack
+        """
+        self.matrices.append(array(trafo_mat,dtype=float))
+        self._update_(len(self.matrices)-1)
+
+    def pop(self):
+        """
+        removes last matrix
+        """
+        trafo_mat=self.matrices.pop()
+        self.prefix.pop()
+        if len(self.matrices)>0:
+            self._update_total_()
+        return trafo_mat
+
+    def change_last(self,trafo_mat):
+        """
+        replaces last matrix
+        """
+        self.matrices[-1]=array(trafo_mat,dtype=float)
+        self._update_(len(self.matrices)-1)
+
+    def give_product(self,n=None):
+        """
+        returns product of n first matrices (all if None)
+        """
+        if n is None or n==len(self.matrices):
+            return self.matrix.copy()
+        if n==1:
+            return self.matrices[0].copy()
+        return dot(self.matrices[0],self.prefix[n-1])
+
+    def _update_(self,idx):
+        """
+        recomposes cached products from idx onwards
+        """
+        del self.prefix[idx:]
+        for i in range(idx,len(self.matrices)):
+            if i==0:
+                self.prefix.append(identity(3))
+            else:
+                self.prefix.append(dot(self.matrices[i],self.prefix[i-1]))
+        self._update_total_()
+
+    def _update_total_(self):
+        """
+        total matrix into self.matrix (in place)
+        """
+        self.matrix[:,:]=dot(self.matrices[0],self.prefix[-1])
+
+class _Optimization_Budget_Exceeded_(Exception):
+    """
+    raised to stop optimization when time limit is met
+    """
+    pass
+
+class Layout_Objective:
+    """
+    vectorized version of Axes_Wrapper._calc_min_func_: paper area / sum of
+    squared axis lengths as function of the last transformation matrix.
+    Holds only arrays, so it can be sent to worker processes.
+    """
+    def __init__(self,q,counts,paper_prop):
+        """
+        q: points of all axes as homogeneous coordinates (3 x N), counts:
+        number of points in each axis
+        """
+        self.q=q
+        self.paper_prop=paper_prop
+        self.starts=concatenate(([0],cumsum(counts)[:-1])) # first point of each axis
+        # segments do not connect different axes
+        self.segment=ones(q.shape[1]-1,dtype=bool)
+        self.segment[cumsum(counts)[:-1]-1]=False
+        self.axis_of_segment=repeat(arange(len(counts)),counts)[:-1]
+        self.reset()
+
+    def reset(self):
+        """
+        resets best found value and time limit
+        """
+        self.best=[inf,None]
+        self.deadline=None
+        self.evaluations=0
+
+    def give_points(self,params):
+        """
+        returns x and y arrays of points transformed by params
+        """
+        h=dot(reshape(array(params,dtype=float),(3,3)),self.q)
+        with errstate(all='ignore'):
+            return h[0]/h[2],h[1]/h[2]
+
+    def calc(self,params,gradient=True):
+        """
+        returns value and (if gradient) gradient with respect to params
+        """
+        if self.deadline is not None and time.time()>self.deadline:
+            raise _Optimization_Budget_Exceeded_()
+        self.evaluations+=1
+        P=reshape(array(params,dtype=float),(3,3))
+        q=self.q
+        h=dot(P,q)
+        with errstate(all='ignore'):
+            x=h[0]/h[2]
+            y=h[1]/h[2]
+            # bounding box of axes, widened as in Axis_Wrapper.calc_bound_box
+            starts=self.starts
+            x_left_axes=minimum.reduceat(x,starts)
+            x_right_axes=maximum.reduceat(x,starts)
+            y_bottom_axes=minimum.reduceat(y,starts)
+            y_top_axes=maximum.reduceat(y,starts)
+            vertical=x_left_axes==x_right_axes
+            x_left_axes[vertical]-=1e-2*abs(y_top_axes-y_bottom_axes)[vertical]
+            horizontal=y_top_axes==y_bottom_axes
+            y_top_axes[horizontal]+=1e-2*abs(x_left_axes-x_right_axes)[horizontal]
+            bb=array([x_left_axes.min(),x_right_axes.max(),
+                      y_bottom_axes.min(),y_top_axes.max()])
+            Wt=bb[1]-bb[0]
+            Ht=bb[3]-bb[2]
+            if Wt/Ht>=self.paper_prop:
+                area=Wt*Wt/self.paper_prop
+            else:
+                area=Ht*Ht*self.paper_prop
+            # axis lengths
+            dx=diff(x)
+            dy=diff(y)
+            seg_length=hypot(dx,dy)*self.segment
+            lengths=bincount(self.axis_of_segment,seg_length,len(starts))
+            length_sum_sq=sum(lengths**2)
+            opt_value=area/length_sum_sq
+        max_bb=max(abs(bb))
+        big=max_bb>1000.0
+        if big:
+            opt_value=max_bb
+        if not isfinite(opt_value):
+            opt_value=1e120
+        if opt_value<self.best[0]:
+            self.best=[opt_value,array(params,dtype=float)]
+        if not gradient:
+            return opt_value
+        if opt_value>=1e120:
+            return opt_value,zeros(9)
+        # gradient with respect to point coordinates
+        gx=zeros(len(x))
+        gy=zeros(len(y))
+        if big:
+            idx=argmax(abs(bb))
+            point=[argmin(x),argmax(x),argmin(y),argmax(y)][idx]
+            [gx,gx,gy,gy][idx][point]=sign(bb[idx])
+        else:
+            if Wt/Ht>=self.paper_prop:
+                d_area=2.0*Wt/self.paper_prop
+                gx[argmax(x)]+=d_area
+                gx[argmin(x)]-=d_area
+            else:
+                d_area=2.0*Ht*self.paper_prop
+                gy[argmax(y)]+=d_area
+                gy[argmin(y)]-=d_area
+            with errstate(all='ignore'):
+                ux=where(seg_length>0,dx/seg_length,0.0)
+                uy=where(seg_length>0,dy/seg_length,0.0)
+            weight=2.0*lengths[self.axis_of_segment]*self.segment
+            gx_length=zeros(len(x))
+            gy_length=zeros(len(y))
+            gx_length[1:]+=weight*ux
+            gx_length[:-1]-=weight*ux
+            gy_length[1:]+=weight*uy
+            gy_length[:-1]-=weight*uy
+            # quotient rule for area/length_sum_sq
+            gx=(gx*length_sum_sq-area*gx_length)/length_sum_sq**2
+            gy=(gy*length_sum_sq-area*gy_length)/length_sum_sq**2
+        # chain rule to matrix elements
+        with errstate(all='ignore'):
+            grad=array([dot(q,gx/h[2]),
+                        dot(q,gy/h[2]),
+                        -dot(q,(gx*h[0]+gy*h[1])/h[2]**2)]).reshape(9)
+        grad[~isfinite(grad)]=0.0
+        return opt_value,grad
+
+def optimize_layout(objective,x0,method='BFGS',maxiter=2000,max_time=None):
+    """
+    minimizes Layout_Objective starting from matrix params x0. Returns
+    best value and params found within maxiter and max_time (seconds).
+    """
+    x0=array(x0,dtype=float)
+    objective.reset()
+    objective.calc(x0,gradient=False)
+    if max_time is not None:
+        objective.deadline=time.time()+max_time
+    value_func=lambda p:objective.calc(p,gradient=False)
+    try:
+        if method=='Nelder-Mead':
+            scipy.optimize.minimize(value_func,x0,method='Nelder-Mead',
+                                    options={'maxiter':maxiter})
+        else:
+            # matrix is defined up to scale, keep gamma3 fixed
+            gamma3=x0[8]
+            def func_8(p8):
+                value,grad=objective.calc(append(p8,gamma3))
+                return value,grad[:8]
+            scipy.optimize.minimize(func_8,x0[:8],jac=True,
+                                    method=method,options={'maxiter':maxiter})
+            # objective has kinks (bounding box), polish without gradient
+            scipy.optimize.minimize(value_func,objective.best[1],method='Nelder-Mead',
+                                    options={'maxiter':maxiter})
+    except _Optimization_Budget_Exceeded_:
+        print("optimization time limit reached")
+    return objective.best[0],objective.best[1]
+
+def _optimize_layout_start_(job):
+    """
+    runs one start of multistart optimization, job is
+    (objective,x0,method,maxiter,max_time). Returns value, params and time.
+    """
+    objective,x0,method,maxiter,max_time=job
+    t_start=time.time()
+    opt_value,params=optimize_layout(objective,x0,method=method,
+                                     maxiter=maxiter,max_time=max_time)
+    return opt_value,params,time.time()-t_start
+
 class Axes_Wrapper:
     """
     class to wrap axes group functionalities. For optimization of
@@ -293,7 +461,7 @@ class Axes_Wrapper:
         self.paper_height=paper_height
         self.paper_prop=paper_width/paper_height
         self.set_transformation()
-        self.trafo_stack=[] # stack for transformation matrices
+        self.trafo_stack=Trafo_Stack() # stack for transformation matrices
         self._add_transformation_()
         self.axes_list=[]
 
@@ -456,14 +624,27 @@ class Axes_Wrapper:
             opt_value=max_bb
         return opt_value
 
-    def optimize_transformation(self):
+    def optimize_transformation(self,method='BFGS',maxiter=2000,max_time=None):
         """
-        returns optimal transformation
+        returns optimal transformation. Minimizes paper area / sum of squared
+        axis lengths by the last matrix of trafo stack.
+        method: 'BFGS' (quasi-Newton with gradient), 'Nelder-Mead' (as
+        before but with the vectorized objective) or 'original' (fmin with
+        _calc_min_func_). maxiter and max_time (seconds) limit the work,
+        best found transformation is used when limits are met.
         """
         x0=[1.0,0,0,0,1.0,0,0,0,1.0]
         self._add_params_trafo_stack_(x0)
         print("starts optimizing...")
-        fmin(self._calc_min_func_,x0,full_output=1,maxiter=2000)
+        if method=='original':
+            # numpy's fmin shadows the one of scipy.optimize
+            scipy.optimize.fmin(self._calc_min_func_,x0,full_output=1,maxiter=maxiter)
+        else:
+            objective=self._prepare_fast_min_func_()
+            opt_value,params=optimize_layout(objective,x0,method=method,
+                                             maxiter=maxiter,max_time=max_time)
+            print("optimized value: %g"%opt_value)
+            self._change_params_to_last_trafo_mat_(params)
         #self.alpha1=self.multiplier_x*self.alpha1
         #self.beta1=self.multiplier_x*self.beta1
         #self.gamma1=self.multiplier_x*self.gamma1
@@ -474,6 +655,81 @@ class Axes_Wrapper:
         #self._calc_bounding_box_()
         ##self._trafo_to_paper_()
 
+    def optimize_transformation_multistart(self,n_random=16,n_rotations=8,polygon=True,
+                                           processes=None,method='BFGS',maxiter=2000,
+                                           max_time=None,seed=0):
+        """
+        as optimize_transformation but starts from many initial matrices:
+        identity, n_rotations rotations, polygon transformation (if polygon)
+        and n_random random projective perturbations of identity. Starts
+        are run in a pool of processes (processes=1 runs them here).
+        max_time limits each start. Best result is applied, timing and
+        objective of each start are printed and kept in self.multistart_report.
+        """
+        x0=[1.0,0,0,0,1.0,0,0,0,1.0]
+        self._add_params_trafo_stack_(x0)
+        objective=self._prepare_fast_min_func_()
+        starts=self._give_multistart_seeds_(objective,n_random,n_rotations,polygon,seed)
+        print("starts optimizing from %i initial matrices..."%len(starts))
+        jobs=[(objective,start_params,method,maxiter,max_time) for name,start_params in starts]
+        t_start=time.time()
+        results=None
+        if processes!=1 and len(jobs)>1:
+            try:
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    results=list(executor.map(_optimize_layout_start_,jobs))
+            except (OSError,BrokenProcessPool) as e:
+                print("process pool not available (%s), optimizing serially"%e)
+        if results is None:
+            results=[_optimize_layout_start_(job) for job in jobs]
+        self.multistart_report=[]
+        for (name,start_params),(opt_value,params,elapsed) in zip(starts,results):
+            print("start %-12s value %-12g time %.2f s"%(name,opt_value,elapsed))
+            self.multistart_report.append({'start':name,'initial':start_params,
+                                           'value':opt_value,'params':params,
+                                           'time':elapsed})
+        best=min(range(len(results)),key=lambda idx:results[idx][0])
+        print("best start %s, value %g, total time %.2f s"\
+              %(starts[best][0],results[best][0],time.time()-t_start))
+        self._change_params_to_last_trafo_mat_(results[best][1])
+        self._set_transformation_to_all_axis_()
+
+    def _give_multistart_seeds_(self,objective,n_random,n_rotations,polygon,seed):
+        """
+        returns list of (name,params) initial matrices for multistart
+        """
+        starts=[('identity',array([1.0,0,0,0,1.0,0,0,0,1.0]))]
+        for idx in range(1,n_rotations):
+            angle=180.0*idx/n_rotations
+            starts.append(('rotate %g'%angle,array(self._calc_rotation_trafo_(angle))))
+        if polygon:
+            try:
+                params=array(self._calc_polygon_trafo_())
+                starts.append(('polygon',params/params[8]))
+            except (linalg.LinAlgError,UnboundLocalError):
+                print("polygon start skipped")
+        # perturbations scaled with the size of the layout
+        x,y=objective.give_points(starts[0][1])
+        size=max(nanmax(x)-nanmin(x),nanmax(y)-nanmin(y),1e-10)
+        scales=array([1.0,1.0,size,1.0,1.0,size,1.0/size,1.0/size,0.0])*0.3
+        random_state=random.RandomState(seed)
+        for idx in range(n_random):
+            params=starts[0][1]+random_state.normal(size=9)*scales
+            starts.append(('random %i'%idx,params))
+        return starts
+
+    def _prepare_fast_min_func_(self):
+        """
+        returns Layout_Objective for points of all axes transformed
+        by all but the last (optimized) matrix of trafo stack
+        """
+        prefix=self.trafo_stack.give_product(len(self.trafo_stack)-1)
+        points=[axis.polyline.points for axis in self.axes_list]
+        counts=array([len(axis_points) for axis_points in points])
+        all_points=concatenate(points)
+        homogeneous=vstack((all_points.T,ones(len(all_points))))
+        return Layout_Objective(dot(prefix,homogeneous),counts,self.paper_prop)
+
     def fit_to_paper(self):
         """
         makes tranformation to fit to paper
@@ -636,13 +892,8 @@ class Axes_Wrapper:
         """
         # find the left polygon
         x1,y1,x2,y2,x3,y3,x4,y4=self._find_polygon_horizontal_()
-        # define right polygon
-        x1d,y1d=x1,self.paper_height
-        x2d,y2d=x2,0.0
-        x3d,y3d=x3,self.paper_height
-        x4d,y4d=x4,0.0
-
-        c = canvas.canvas()
+        # debug canvas, texts are only collected, never typeset
+        c = canvas.canvas(textengine=Label_Cache(batch=True,persistent=False))
         self._plot_axes_(c)
         c.fill(path.circle(x1, y1, 0.02))
         c.text(x1+1, y1,'1')
@@ -657,14 +908,30 @@ class Axes_Wrapper:
         #print x1,y1,x2,y2,x3,y3,x4,y4
         # calculate transformation
         alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-        self._calc_transformation_matrix_(x1,y1,x2,y2,x3,y3,x4,y4,
-                                          x1d,y1d,x2d,y2d,x3d,y3d,x4d,y4d)
+        self._calc_polygon_trafo_(x1,y1,x2,y2,x3,y3,x4,y4)
         # apply transformation
         self._add_transformation_(alpha1,beta1,gamma1,alpha2,beta2,gamma2,
                                   alpha3, beta3, gamma3)
         self._set_transformation_to_all_axis_() # update axis
         self._trafo_to_paper_() # transforms to paper
 
+    def _calc_polygon_trafo_(self,x1=None,y1=None,x2=None,y2=None,
+                             x3=None,y3=None,x4=None,y4=None):
+        """
+        returns transformation of make_polygon_trafo without plotting.
+        Polygon is found if not given.
+        """
+        if x1 is None:
+            # find the left polygon
+            x1,y1,x2,y2,x3,y3,x4,y4=self._find_polygon_horizontal_()
+        # define right polygon
+        x1d,y1d=x1,self.paper_height
+        x2d,y2d=x2,0.0
+        x3d,y3d=x3,self.paper_height
+        x4d,y4d=x4,0.0
+        return self._calc_transformation_matrix_(x1,y1,x2,y2,x3,y3,x4,y4,
+                                                 x1d,y1d,x2d,y2d,x3d,y3d,x4d,y4d)
+
     def _add_transformation_(self,alpha1=1.0,beta1=0.0,gamma1=0.0,
                              alpha2=0.0,beta2=1.0,gamma2=0.0,
                              alpha3=0.0,beta3=0.0,gamma3=1.0):
@@ -683,11 +950,7 @@ class Axes_Wrapper:
         calculates total transformation matrix and
         master coeffs self.alpha1,self.beta1,...
         """
-        stack_copy=copy(self.trafo_stack)
-        stack_copy.reverse()
-        trafo_mat=stack_copy.pop()
-        for matrix in stack_copy:
-            trafo_mat=dot(trafo_mat,matrix) # matrix multiplication
+        trafo_mat=self.trafo_stack.matrix
         self.alpha1=trafo_mat[0][0]
         self.beta1=trafo_mat[0][1]
         self.gamma1=trafo_mat[0][2]
@@ -712,10 +975,10 @@ class Axes_Wrapper:
         alpha3=params[6]
         beta3=params[7]
         gamma3=params[8]
-        self.trafo_stack.pop()
-        self._add_transformation_(alpha1=alpha1,beta1=beta1,gamma1=gamma1,
-                                  alpha2=alpha2,beta2=beta2,gamma2=gamma2,
-                                  alpha3=alpha3,beta3=beta3,gamma3=gamma3)
+        self.trafo_stack.change_last([[alpha1,beta1,gamma1],
+                                      [alpha2,beta2,gamma2],
+                                      [alpha3,beta3,gamma3]])
+        self._calculate_total_trafo_mat_() # update coeffs
 
     def _add_params_trafo_stack_(self,params):
         """
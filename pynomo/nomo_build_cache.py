@@ -0,0 +1,354 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build cache for incremental rebuilds.
+
+Building blocks, aligning them and doing the layout transformations
+depends only on the geometric params of a nomogram. Build_Cache keeps the
+built blocks and wrapper keyed by a hash of the params where cosmetic
+values (titles, colors, isopleth values, filename, ...) are left out.
+Functions are hashed by their bytecode, constants, defaults, closures and
+the globals they use. Params with other objects than numbers, strings,
+arrays, containers, functions and PyX attributes are not cached. When only
+cosmetic params change, Nomographer takes blocks from the cache and only
+refreshes the cosmetic params of the atoms. Functions can't be saved, so
+the cache lives in memory of one process.
+"""
+import hashlib
+import types
+import collections
+import numpy
+
+# main params not affecting built blocks
+main_cosmetic_keys=set(['filename','title_str','title_x','title_y',
+                        'title_box_width','title_color','extra_texts',
+                        'isopleth_params','make_grid','draw_lines',
+                        'line_params','pre_func','post_func','debug',
+                        'draw_isopleths','label_backend','label_cache',
+                        'label_cache_dir','batch_typesetting','geometry_file',
+                        'build_cache'])
+# block params not affecting built blocks
+block_cosmetic_keys=set(['isopleth_values','debug'])
+# axis params not affecting built blocks
+axis_cosmetic_keys=set(['title','title_x_shift','title_y_shift',
+                        'title_draw_center','title_distance_center',
+                        'title_opposite_tick','extra_titles','text_color',
+                        'title_color','axis_color','debug'])
+
+class _Uncacheable_(Exception):
+    """
+    raised when params have a value that can't be hashed by its content
+    """
+    pass
+
+def give_build_key(params):
+    """
+    returns hash of params affecting built blocks, None if params can't
+    be cached
+    """
+    h=hashlib.sha256()
+    try:
+        _update_hash_(h,params,set(),main_cosmetic_keys,0)
+    except _Uncacheable_:
+        return None
+    return h.hexdigest()
+
+def _give_cosmetic_keys_(depth):
+    """
+    returns cosmetic keys of dict at depth (0=main params, 1=block params,
+    2 and more=axis params)
+    """
+    if depth==0:
+        return main_cosmetic_keys
+    if depth==1:
+        return block_cosmetic_keys
+    return axis_cosmetic_keys
+
+def _update_hash_(h,value,seen,cosmetic_keys=(),depth=0):
+    """
+    updates hash h with value. Items of dicts under cosmetic_keys are
+    left out. Raises _Uncacheable_ for objects that can't be hashed by
+    their content.
+    """
+    if value is None or isinstance(value,(bool,int,float,complex,str,bytes)):
+        h.update(('%s:%r;'%(type(value).__name__,value)).encode('utf-8'))
+    elif isinstance(value,numpy.ndarray):
+        h.update(('array:%s:%s;'%(value.dtype,value.shape)).encode('utf-8'))
+        h.update(numpy.ascontiguousarray(value).tobytes())
+    elif isinstance(value,numpy.generic):
+        h.update(('%s:%r;'%(type(value).__name__,value)).encode('utf-8'))
+    elif isinstance(value,(list,tuple,dict)) and id(value) in seen:
+        h.update(b'cycle;') # e.g. extra axis params refer to themselves
+    elif isinstance(value,(list,tuple)):
+        seen.add(id(value))
+        h.update(('%s:%i['%(type(value).__name__,len(value))).encode('utf-8'))
+        for v in value: # items of lists are at the same depth as lists
+            _update_hash_(h,v,seen,cosmetic_keys,depth)
+        seen.discard(id(value))
+        h.update(b']')
+    elif isinstance(value,dict):
+        seen.add(id(value))
+        keys=sorted((key for key in value if key not in cosmetic_keys),key=repr)
+        h.update(('dict:%i{'%len(keys)).encode('utf-8'))
+        for key in keys:
+            _update_hash_(h,key,seen)
+            _update_hash_(h,value[key],seen,_give_cosmetic_keys_(depth+1),depth+1)
+        seen.discard(id(value))
+        h.update(b'}')
+    elif isinstance(value,types.FunctionType):
+        _update_function_hash_(h,value,seen)
+    elif isinstance(value,types.MethodType):
+        h.update(b'method:')
+        _update_hash_(h,value.__func__,seen)
+        _update_hash_(h,value.__self__,seen)
+    elif isinstance(value,(types.BuiltinFunctionType,numpy.ufunc,type,types.ModuleType)):
+        h.update(('%s:%s.%s;'%(type(value).__name__,getattr(value,'__module__',''),
+                                getattr(value,'__qualname__',getattr(value,'__name__',''))))
+                 .encode('utf-8'))
+    elif type(value).__module__.split('.')[0]=='pyx' and hasattr(value,'__dict__'):
+        # PyX attributes are hashed by value
+        if id(value) in seen:
+            h.update(b'seen;')
+            return
+        seen.add(id(value))
+        h.update(('%s.%s:'%(type(value).__module__,type(value).__qualname__)).encode('utf-8'))
+        _update_hash_(h,vars(value),seen)
+    else:
+        # other objects may change without changing their identity
+        raise _Uncacheable_()
+
+def _update_function_hash_(h,func,seen):
+    """
+    updates hash h with function: code, defaults, closure values and used
+    globals
+    """
+    if id(func) in seen:
+        h.update(('function:%s:seen;'%func.__qualname__).encode('utf-8'))
+        return
+    seen.add(id(func))
+    h.update(b'function:')
+    _update_code_hash_(h,func.__code__)
+    _update_hash_(h,func.__defaults__,seen)
+    _update_hash_(h,func.__kwdefaults__,seen)
+    if func.__closure__ is not None:
+        for cell in func.__closure__:
+            try:
+                _update_hash_(h,cell.cell_contents,seen)
+            except ValueError: # empty cell
+                h.update(b'empty;')
+    for name in _give_code_names_(func.__code__):
+        if name in func.__globals__:
+            h.update(('global:%s='%name).encode('utf-8'))
+            _update_hash_(h,func.__globals__[name],seen)
+
+def _update_code_hash_(h,code):
+    """
+    updates hash h with code object and nested code objects
+    """
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode('utf-8'))
+    h.update(repr(code.co_freevars).encode('utf-8'))
+    for const in code.co_consts:
+        if isinstance(const,types.CodeType):
+            _update_code_hash_(h,const)
+        else:
+            h.update(('%s:%r;'%(type(const).__name__,const)).encode('utf-8'))
+
+def _give_code_names_(code):
+    """
+    returns names used by code and its nested code objects
+    """
+    names=list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const,types.CodeType):
+            names.extend(_give_code_names_(const))
+    return names
+
+def _give_dict_paths_(value,path=(),paths=None):
+    """
+    returns dict id -> (path,dict) of dicts nested in value
+    """
+    if paths is None:
+        paths={}
+    if isinstance(value,dict):
+        if id(value) in paths:
+            return paths
+        if len(path)>0:
+            paths[id(value)]=(path,value)
+        for key,v in value.items():
+            _give_dict_paths_(v,path+(key,),paths)
+    elif isinstance(value,(list,tuple)):
+        for idx,v in enumerate(value):
+            _give_dict_paths_(v,path+(idx,),paths)
+    return paths
+
+def _give_path_value_(value,path):
+    """
+    returns value at path, None if not found
+    """
+    for key in path:
+        try:
+            value=value[key]
+        except (KeyError,IndexError,TypeError):
+            return None
+    return value
+
+class Build_Cache(object):
+    """
+    keeps built blocks and wrappers of recent nomograms in memory.
+    Keeps statistics of its work in self.stats.
+    """
+    def __init__(self,max_entries=4):
+        self.max_entries=max_entries
+        self.entries=collections.OrderedDict() # key -> [params,wrapper,blocks]
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        zeroes statistics
+        """
+        self.stats={'hits':0, # builds taken from cache
+                    'misses':0, # builds not in cache
+                    'refused':0, # found but cosmetic params could not be refreshed
+                    'uncacheable':0, # params with values that can't be hashed
+                    }
+
+    def put(self,key,params,wrapper,blocks):
+        """
+        stores built wrapper and blocks of params, nothing if key is None
+        """
+        if key is None:
+            return
+        self.entries[key]=[params,wrapper,blocks]
+        self.entries.move_to_end(key)
+        while len(self.entries)>self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self,key,params):
+        """
+        returns (wrapper,blocks) with cosmetic params refreshed from
+        params, None if not found or key is None (params can't be cached)
+        """
+        if key is None:
+            self.stats['uncacheable']+=1
+            return None
+        if key not in self.entries:
+            self.stats['misses']+=1
+            return None
+        old_params,wrapper,blocks=self.entries[key]
+        if len(old_params['block_params'])!=len(params['block_params']):
+            self.stats['refused']+=1
+            return None
+        atom_updates=self._give_atom_updates_(old_params,params,blocks)
+        updates=self._give_updates_(old_params,params,atom_updates)
+        if updates is None:
+            self.stats['refused']+=1
+            return None
+        for target,source,defaults in updates:
+            for k in axis_cosmetic_keys:
+                if k in source:
+                    target[k]=source[k]
+                elif defaults is not None and k in defaults:
+                    target[k]=defaults[k]
+        for atom,new_given in atom_updates:
+            atom.given_params=new_given
+        wrapper.params.update(params)
+        wrapper.filename=params['filename']
+        for block,block_para in zip(blocks,params['block_params']):
+            block.ref_block_params=block_para
+        self.entries[key][0]=params
+        self.entries.move_to_end(key)
+        self.stats['hits']+=1
+        return wrapper,blocks
+
+    def _give_atom_updates_(self,old_params,params,blocks):
+        """
+        returns list of (atom,new given params) of atoms whose given params
+        are in old block params
+        """
+        result=[]
+        for block,old_para,new_para in zip(blocks,old_params['block_params'],
+                                           params['block_params']):
+            paths=_give_dict_paths_(old_para)
+            for atom in block.atom_stack:
+                given=getattr(atom,'given_params',None)
+                if id(given) in paths:
+                    path,dummy=paths[id(given)]
+                    new_given=_give_path_value_(new_para,path)
+                    if isinstance(new_given,dict):
+                        result.append((atom,new_given))
+        return result
+
+    def _give_updates_(self,old_params,params,atom_updates):
+        """
+        returns list of (target dict,source dict,defaults) to refresh
+        cosmetic axis params, None if some changed cosmetic params can't be
+        refreshed. Keys missing in source are taken from defaults.
+        """
+        updates=[]
+        covered=set() # ids of old dicts refreshed
+        for atom,new_given in atom_updates:
+            updates.append((atom.params,new_given,None))
+            covered.add(id(atom.given_params))
+            # extra axes take missing params from their atom
+            new_extras=new_given.get('extra_params',[])
+            for idx,extra in enumerate(atom.params.get('extra_params',[])):
+                if idx<len(new_extras) and isinstance(new_extras[idx],dict):
+                    updates.append((extra,new_extras[idx],atom.params))
+                    covered.add(id(extra))
+        for old_para,new_para in zip(old_params['block_params'],params['block_params']):
+            for path,old_dict in _give_dict_paths_(old_para).values():
+                if id(old_dict) in covered:
+                    continue
+                new_dict=_give_path_value_(new_para,path)
+                if not isinstance(new_dict,dict):
+                    continue # added when blocks were built
+                for k in axis_cosmetic_keys:
+                    if k in old_dict and not _is_same_(old_dict[k],new_dict.get(k)):
+                        return None
+        return updates
+
+def _is_same_(value1,value2):
+    """
+    returns True if values are equal
+    """
+    if value1 is value2:
+        return True
+    h1=hashlib.sha256()
+    h2=hashlib.sha256()
+    try:
+        _update_hash_(h1,value1,set())
+        _update_hash_(h2,value2,set())
+    except _Uncacheable_:
+        return False
+    return h1.digest()==h2.digest()
+
+default_build_cache=Build_Cache()
+
+def give_build_cache(build_cache):
+    """
+    returns Build_Cache of Nomographer param 'build_cache': False/None = no
+    cache, True = default cache, or a Build_Cache
+    """
+    if build_cache is True:
+        return default_build_cache
+    if isinstance(build_cache,Build_Cache):
+        return build_cache
+    return None
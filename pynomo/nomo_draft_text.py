@@ -0,0 +1,420 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+TeX-free draft labels.
+
+Draft_Text_Engine is a PyX text engine that draws labels with a built-in
+stroke font, without TeX or font files. TeX markup of labels is simplified:
+math shifts, font switches and braces are dropped, super- and subscripts
+are drawn smaller and shifted and common symbol commands are replaced by
+characters. Alignment, size, parbox, valign and vshift text attributes
+are followed approximately. Use it for fast drafts as
+
+    c=canvas.canvas()
+    c.settextengine(Draft_Text_Engine())
+"""
+import re
+from pyx import attr, box, canvas, path, style, text, trafo, unit
+
+# stroke font: glyph is 'width|polyline;polyline;...', polyline is 'x,y x,y ...'
+# in units where capital height is 6, baseline 0 and descender -2
+_glyph_defs_={
+    ' ':'3|',
+    '0':'4|0,1 0,5 1,6 3,6 4,5 4,1 3,0 1,0 0,1;0,1 4,5',
+    '1':'4|1,5 2,6 2,0;1,0 3,0',
+    '2':'4|0,5 1,6 3,6 4,5 4,4 0,0 4,0',
+    '3':'4|0,5 1,6 3,6 4,5 4,4 3,3 4,2 4,1 3,0 1,0 0,1;1,3 3,3',
+    '4':'4|3,0 3,6 0,2 4,2',
+    '5':'4|4,6 0,6 0,3 3,3 4,2 4,1 3,0 0,0',
+    '6':'4|4,5 3,6 1,6 0,5 0,1 1,0 3,0 4,1 4,2 3,3 0,3',
+    '7':'4|0,6 4,6 1,0',
+    '8':'4|1,3 0,4 0,5 1,6 3,6 4,5 4,4 3,3 1,3 0,2 0,1 1,0 3,0 4,1 4,2 3,3',
+    '9':'4|0,1 1,0 3,0 4,1 4,5 3,6 1,6 0,5 0,4 1,3 4,3',
+    'A':'4|0,0 0,4 2,6 4,4 4,0;0,3 4,3',
+    'B':'4|0,0 0,6 3,6 4,5 4,4 3,3 4,2 4,1 3,0 0,0;0,3 3,3',
+    'C':'4|4,5 3,6 1,6 0,5 0,1 1,0 3,0 4,1',
+    'D':'4|0,0 0,6 2,6 4,4 4,2 2,0 0,0',
+    'E':'4|4,6 0,6 0,0 4,0;0,3 3,3',
+    'F':'4|4,6 0,6 0,0;0,3 3,3',
+    'G':'4|4,5 3,6 1,6 0,5 0,1 1,0 3,0 4,1 4,3 2,3',
+    'H':'4|0,0 0,6;4,0 4,6;0,3 4,3',
+    'I':'2|0,6 2,6;1,6 1,0;0,0 2,0',
+    'J':'4|4,6 4,1 3,0 1,0 0,1',
+    'K':'4|0,0 0,6;4,6 0,2;1,3 4,0',
+    'L':'4|0,6 0,0 4,0',
+    'M':'5|0,0 0,6 2.5,3 5,6 5,0',
+    'N':'4|0,0 0,6 4,0 4,6',
+    'O':'4|1,0 0,1 0,5 1,6 3,6 4,5 4,1 3,0 1,0',
+    'P':'4|0,0 0,6 3,6 4,5 4,4 3,3 0,3',
+    'Q':'4|1,0 0,1 0,5 1,6 3,6 4,5 4,1 3,0 1,0;2,2 4,0',
+    'R':'4|0,0 0,6 3,6 4,5 4,4 3,3 0,3;2,3 4,0',
+    'S':'4|4,5 3,6 1,6 0,5 0,4 1,3 3,3 4,2 4,1 3,0 1,0 0,1',
+    'T':'4|0,6 4,6;2,6 2,0',
+    'U':'4|0,6 0,1 1,0 3,0 4,1 4,6',
+    'V':'4|0,6 2,0 4,6',
+    'W':'5|0,6 1,0 2.5,4 4,0 5,6',
+    'X':'4|0,0 4,6;0,6 4,0',
+    'Y':'4|0,6 2,3 4,6;2,3 2,0',
+    'Z':'4|0,6 4,6 0,0 4,0',
+    '.':'1|0.5,0 0.5,0.5',
+    ',':'1|0.5,0.5 0.5,0 0,-1',
+    ':':'1|0.5,0 0.5,0.5;0.5,3.5 0.5,4',
+    ';':'1|0.5,3.5 0.5,4;0.5,0.5 0.5,0 0,-1',
+    '-':'3|0,3 3,3',
+    '+':'4|0,3 4,3;2,1 2,5',
+    '=':'4|0,2 4,2;0,4 4,4',
+    '(':'2|2,7 1,6 0,4 0,2 1,0 2,-1',
+    ')':'2|0,7 1,6 2,4 2,2 1,0 0,-1',
+    '[':'2|2,7 0,7 0,-1 2,-1',
+    ']':'2|0,7 2,7 2,-1 0,-1',
+    '/':'3|0,-1 3,7',
+    '|':'1|0.5,-1 0.5,7',
+    '<':'4|4,5 0,3 4,1',
+    '>':'4|0,5 4,3 0,1',
+    '*':'4|2,1 2,5;0.5,2 3.5,4;0.5,4 3.5,2',
+    '%':'4|0,0 4,6;0,6 0,5 1,5 1,6 0,6;3,0 3,1 4,1 4,0 3,0',
+    "'":'1|0.5,6 0.5,4.5',
+    '!':'1|0.5,6 0.5,2;0.5,0 0.5,0.5',
+    '?':'4|0,5 1,6 3,6 4,5 4,4 2,3 2,2;2,0 2,0.5',
+    '·':'1|0.5,3 0.5,3.5',
+    '×':'4|0.5,1.5 3.5,4.5;0.5,4.5 3.5,1.5',
+    '°':'2|0,5 0,6 1,7 2,6 2,5 1,4 0,5',
+    '±':'4|0,3 4,3;2,1 2,5;0,0 4,0',
+    }
+
+def _parse_glyph_(definition):
+    """
+    returns (width,polylines) of glyph definition
+    """
+    width,lines=definition.split('|')
+    polylines=[[tuple(float(c) for c in point.split(','))
+                for point in line.split()]
+               for line in lines.split(';') if line.strip()]
+    return float(width),polylines
+
+_glyphs_=dict((char,_parse_glyph_(definition))
+              for char,definition in _glyph_defs_.items())
+_unknown_glyph_=_parse_glyph_('4|0,0 0,6 4,6 4,0 0,0')
+
+# TeX commands replaced by characters, None = dropped
+_commands_={'cdot':'·','times':'×','pm':'±','circ':'°',
+            'degree':'°','%':'%','$':'$','{':'(','}':')','_':'_',
+            '&':'&','#':'#',',':' ',';':' ',':':' ','!':'',' ':' ',
+            'quad':'  ','qquad':'    ','cdots':'...','ldots':'...',
+            'dots':'...','le':'<','leq':'<','ge':'>','geq':'>','ne':'/=',
+            'infty':'oo','to':'->','rightarrow':'->','leftarrow':'<-',
+            'prime':"'",'backslash':'/',
+            'left':'','right':'','displaystyle':'','textstyle':'',
+            'scriptstyle':'','limits':'','nolimits':'','mathstrut':'',
+            'noindent':'','centering':'','par':'\n','newline':'\n',
+            }
+# commands that change size of the rest of group, relative to normal size
+_size_commands_={'tiny':0.5,'scriptsize':0.7,'footnotesize':0.8,'small':0.9,
+                 'normalsize':1.0,'large':1.2,'Large':1.44,'LARGE':1.73,
+                 'huge':2.07,'Huge':2.49}
+# commands whose argument is dropped
+_skip_argument_commands_={'vspace','hspace','label','vskip','hskip','kern'}
+
+def give_draft_pieces(expr):
+    """
+    simplifies TeX expression to list of lines, each line a list of
+    (string,scale,shift) pieces. scale and shift are relative to font size.
+    """
+    lines=[[]]
+    _add_pieces_(expr,0,1.0,0.0,lines)
+    return lines
+
+def _give_group_(expr,i):
+    """
+    returns (group,next index) of argument starting at expr[i]
+    """
+    while i<len(expr) and expr[i]==' ':
+        i+=1
+    if i>=len(expr):
+        return '',i
+    if expr[i]!='{':
+        if expr[i]=='\\':
+            match=re.match(r'\\([A-Za-z]+|.)',expr[i:])
+            return match.group(0),i+len(match.group(0))
+        return expr[i],i+1
+    depth=0
+    for j in range(i,len(expr)):
+        if expr[j]=='{':
+            depth+=1
+        elif expr[j]=='}':
+            depth-=1
+            if depth==0:
+                return expr[i+1:j],j+1
+    return expr[i+1:],len(expr)
+
+def _append_(lines,string,scale,shift):
+    """
+    appends string to last line, joining pieces of same style
+    """
+    line=lines[-1]
+    if len(line)>0 and line[-1][1]==scale and line[-1][2]==shift:
+        line[-1]=(line[-1][0]+string,scale,shift)
+    else:
+        line.append((string,scale,shift))
+
+def _add_pieces_(expr,i,scale,shift,lines):
+    """
+    adds pieces of expr[i:] to lines
+    """
+    while i<len(expr):
+        char=expr[i]
+        if char=='\\':
+            if expr[i:i+2]=='\\\\':
+                lines.append([])
+                i+=2
+                continue
+            match=re.match(r'\\([A-Za-z]+|.)',expr[i:])
+            name=match.group(1)
+            i+=len(match.group(0))
+            if name.isalpha(): # TeX skips spaces after control words
+                while i<len(expr) and expr[i]==' ':
+                    i+=1
+            if name in _size_commands_:
+                scale=_size_commands_[name]
+            elif name=='frac':
+                numerator,i=_give_group_(expr,i)
+                denominator,i=_give_group_(expr,i)
+                if len(numerator)>1:
+                    numerator='('+numerator+')'
+                if len(denominator)>1:
+                    denominator='('+denominator+')'
+                _add_pieces_(numerator+'/'+denominator,0,scale,shift,lines)
+            elif name=='sqrt':
+                argument,i=_give_group_(expr,i)
+                _add_pieces_('sqrt('+argument+')',0,scale,shift,lines)
+            elif name in _skip_argument_commands_:
+                argument,i=_give_group_(expr,i)
+            elif name in _commands_:
+                if _commands_[name]=='\n':
+                    lines.append([])
+                elif len(_commands_[name])>0:
+                    _append_(lines,_commands_[name],scale,shift)
+            elif len(name)>2 and name not in ('rm','bf','it','sf','tt','em',
+                    'mathrm','mathbf','mathit','mathsf','mathtt','textrm',
+                    'textbf','textit','textsf','texttt','text','mbox','hbox',
+                    'emph','operatorname','mathcal','boldmath','unboldmath'):
+                # e.g. greek letters and functions: name as text
+                _append_(lines,name,scale,shift)
+        elif char=='^' or char=='_':
+            argument,i=_give_group_(expr,i+1)
+            if char=='^':
+                _add_pieces_(argument,0,scale*0.7,shift+0.45*scale,lines)
+            else:
+                _add_pieces_(argument,0,scale*0.7,shift-0.2*scale,lines)
+        elif char=='{':
+            group,i=_give_group_(expr,i)
+            _add_pieces_(group,0,scale,shift,lines)
+        elif char=='\n':
+            _append_(lines,' ',scale,shift)
+            i+=1
+        elif char in '$}~':
+            if char=='~':
+                _append_(lines,' ',scale,shift)
+            i+=1
+        else:
+            _append_(lines,char,scale,shift)
+            i+=1
+
+class Draft_Text_Box(text.textbox_pt):
+    """
+    text drawn with stroke font. Positioned as PyX TeX text boxes.
+    strokes is canvas of label at origin, shared by equal labels.
+    """
+    def __init__(self,x_pt,y_pt,strokes,left_pt,right_pt,height_pt,depth_pt,fillstyles):
+        self.left=left_pt*unit.x_pt
+        self.right=right_pt*unit.x_pt
+        self.width=self.left+self.right
+        self.height=height_pt*unit.x_pt
+        self.depth=depth_pt*unit.x_pt
+        self.canvas=strokes
+        self.fillstyles=fillstyles
+        self.texttrafo=trafo.scale(unit.scale["x"]).translated_pt(x_pt,y_pt)
+        box.rect_pt.__init__(self,x_pt-left_pt*unit.scale["x"],y_pt-depth_pt*unit.scale["x"],
+                             (left_pt+right_pt)*unit.scale["x"],
+                             (depth_pt+height_pt)*unit.scale["x"],
+                             abscenter_pt=(left_pt*unit.scale["x"],depth_pt*unit.scale["x"]))
+
+    def transform(self,*trafos,keep_anchor=False):
+        box.rect.transform(self,*trafos,keep_anchor=keep_anchor)
+        for t in trafos:
+            self.texttrafo=t*self.texttrafo
+
+    def bbox(self):
+        return box.rect.bbox(self)
+
+    def textpath(self):
+        p=path.path()
+        for item in self.canvas.items:
+            p+=item.path
+        return p.transformed(self.texttrafo)
+
+    def _give_canvas_(self):
+        """
+        returns positioned canvas
+        """
+        c=canvas.canvas([self.texttrafo]+self.fillstyles)
+        c.insert(self.canvas)
+        return c
+
+    def processPS(self,file,writer,context,registry,bbox):
+        self._give_canvas_().processPS(file,writer,context,registry,bbox)
+
+    def processPDF(self,file,writer,context,registry,bbox):
+        self._give_canvas_().processPDF(file,writer,context,registry,bbox)
+
+class Draft_Text_Engine(object):
+    """
+    PyX text engine drawing labels with built-in stroke font, without TeX.
+    size is normal font size in pt. Equal labels are drawn only once.
+    """
+    def __init__(self,size=10.0):
+        self.size=size
+        self.cap_height=0.68 # of size
+        self.linewidth=0.07 # of size
+        self.labels={} # (expr,textattrs) -> (strokes,left,right,height,depth)
+
+    def preamble(self,*args,**kwargs):
+        pass
+
+    def reset(self,*args,**kwargs):
+        pass
+
+    def _give_glyphs_(self,pieces):
+        """
+        returns list of (glyph scale,x,y,polylines) and width of line
+        of pieces, units pt
+        """
+        unit_pt=self.cap_height*self.size/6.0
+        glyphs=[]
+        x=0.0
+        for string,scale,shift in pieces:
+            y=shift*self.size
+            for char in string:
+                width,polylines=_glyphs_.get(char,None) or \
+                    _glyphs_.get(char.upper(),_unknown_glyph_)
+                # lower case letters are small capitals
+                s=unit_pt*scale*(0.75 if char.islower() else 1.0)
+                glyphs.append((s,x,y,polylines))
+                x+=s*(width+1.5)
+        if len(glyphs)>0:
+            x-=glyphs[-1][0]*1.5
+        return glyphs,x
+
+    def _give_scale_(self,textattrs):
+        """
+        returns size scale of size attributes
+        """
+        scale=1.0
+        for a in textattrs:
+            if isinstance(a,text.size) and a.size in _size_commands_:
+                scale=_size_commands_[a.size]
+        return scale
+
+    def _give_label_(self,expr,textattrs):
+        """
+        returns (strokes,left,right,height,depth) of label, units pt
+        """
+        key=(expr,tuple(textattrs))
+        try:
+            return self.labels[key]
+        except (KeyError,TypeError):
+            pass
+        scale=self._give_scale_(textattrs)
+        line_height=1.2*self.size*scale
+        lines=[]
+        for n,pieces in enumerate(give_draft_pieces(expr)):
+            pieces=[(string,s*scale,shift*scale) for string,s,shift in pieces]
+            glyphs,width=self._give_glyphs_(pieces)
+            lines.append((glyphs,width,-n*line_height))
+        width=max(line_width for glyphs,line_width,y0 in lines)
+        height=self.cap_height*self.size*scale
+        depth=(len(lines)-1)*line_height+0.2*self.size*scale
+        boxhalign=0.0
+        flushhalign=0.0
+        dy=0.0
+        for a in textattrs:
+            if isinstance(a,text.boxhalign):
+                boxhalign=a.boxhalign
+            if isinstance(a,text.flushhalign):
+                flushhalign=a.flushhalign
+            if isinstance(a,text.parbox_pt):
+                width=max(width,a.width*72/72.27)
+                if a.baseline==text.parbox_pt.middle:
+                    dy+=0.5*(depth-height)
+                elif a.baseline==text.parbox_pt.bottom:
+                    dy+=depth-0.2*self.size*scale
+            if isinstance(a,text.valign):
+                dy-=(1-a.valign)*height-a.valign*depth
+            if isinstance(a,text._vshiftmathaxis):
+                dy-=0.25*self.size*scale
+            elif isinstance(a,text.vshift):
+                dy-=a.lowerratio*height
+        # one path for each line width
+        line_paths={}
+        for glyphs,line_width,y0 in lines:
+            dx=flushhalign*(width-line_width)-boxhalign*width
+            for s,x,y,polylines in glyphs:
+                if s not in line_paths:
+                    line_paths[s]=[]
+                items=line_paths[s]
+                for polyline in polylines:
+                    px,py=polyline[0]
+                    items.append(path.moveto_pt(dx+x+s*px,dy+y0+y+s*py))
+                    for px,py in polyline[1:]:
+                        items.append(path.lineto_pt(dx+x+s*px,dy+y0+y+s*py))
+        strokes=canvas.canvas([style.linecap.round,style.linejoin.round])
+        for s in line_paths:
+            if len(line_paths[s])>0:
+                linewidth=s*6.0*self.linewidth/self.cap_height
+                strokes.stroke(path.path(*line_paths[s]),[style.linewidth(linewidth*unit.t_pt)])
+        label=(strokes,boxhalign*width,(1-boxhalign)*width,height+dy,depth-dy)
+        try:
+            self.labels[key]=label
+        except TypeError: # unhashable attribute
+            pass
+        return label
+
+    def text_pt(self,x_pt,y_pt,expr,textattrs=[],texmessages=[],fontmap=None,singlecharmode=False):
+        """
+        as PyX text_pt
+        """
+        textattrs=attr.mergeattrs(textattrs)
+        attr.checkattrs(textattrs,[text.textattr,trafo.trafo_pt,style.fillstyle])
+        trafos=attr.getattrs(textattrs,[trafo.trafo_pt])
+        fillstyles=attr.getattrs(textattrs,[style.fillstyle])
+        textattrs=attr.getattrs(textattrs,[text.textattr])
+        if isinstance(expr,text.MultiEngineText):
+            expr=expr.tex
+        strokes,left,right,height,depth=self._give_label_(expr,textattrs)
+        output=Draft_Text_Box(x_pt,y_pt,strokes,left,right,height,depth,fillstyles)
+        for t in trafos:
+            output.reltransform(t) # as in PyX SingleEngine.text_pt
+        return output
+
+    def text(self,x,y,*args,**kwargs):
+        """
+        as PyX text
+        """
+        return self.text_pt(unit.topt(x),unit.topt(y),*args,**kwargs)
@@ -0,0 +1,436 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Geometry model of a nomogram.
+
+Nomographer first draws the nomogram into a Geometry_Canvas that records
+every stroked and filled path, text and inserted item into a Geometry_Model.
+The model is then rendered to a PyX canvas. Drawing items are the PyX
+drawing calls in drawing order with a coarse role telling which phase
+drew them ('grid', 'lines', 'isopleths', 'block 0', 'title', ...).
+Paths are available as segment arrays, texts as anchors in pt, so the
+model can be used without PyX.
+
+Besides drawing items, the model has entity items that are not rendered:
+
+    'scale'      main line of an axis as polylines, title and range
+    'ticks'      ticks of one tick level of a scale as lines
+    'labels'     texts of one tick level of a scale with their anchors
+    'grid_line'  line of a grid (u or v constant) and its text anchors
+    'isopleth'   segments and solution points of a solved isopleth
+
+Ticks and labels refer to their scale by index 'scale'. Coordinates are
+numpy arrays in pt.
+
+A model can be saved to JSON or NPZ and loaded and rendered again without
+calculating the nomogram:
+
+    nomographer.geometry.save('nomo.npz')
+    ...
+    geometry=load_geometry('nomo.npz')
+    c=canvas.canvas()
+    geometry.render(c)
+    c.writePDFfile('nomo.pdf')
+
+PyX attributes are stored as plain data of their classes.
+"""
+import json
+import importlib
+import numpy
+from pyx import path, unit
+from pyx.normpath import normline_pt
+
+class Geometry_Model(object):
+    """
+    geometry of a nomogram. Items are dicts with 'kind' and 'role'. Drawing
+    items have kind 'stroke','fill','draw','text','insert' or 'marker',
+    entity items 'scale','ticks','labels','grid_line' or 'isopleth'.
+    """
+    version=2 # bump if saved format changes
+
+    def __init__(self):
+        self.items=[]
+        self.role='' # role of items added next
+        self.scale_number=0 # number of scales added
+
+    def add_path(self,kind,p,attrs=[]):
+        """
+        adds stroked ('stroke'), filled ('fill') or decorated ('draw') path
+        """
+        self.items.append({'kind':kind,'role':self.role,
+                           'path':p,'attrs':list(attrs)})
+
+    def add_text(self,x_pt,y_pt,text,attrs=[]):
+        """
+        adds text anchored at (x_pt,y_pt)
+        """
+        self.items.append({'kind':'text','role':self.role,'x_pt':x_pt,
+                           'y_pt':y_pt,'text':text,'attrs':list(attrs)})
+
+    def add_insert(self,item,attrs=[]):
+        """
+        adds inserted canvas item
+        """
+        self.items.append({'kind':'insert','role':self.role,'item':item,
+                           'attrs':list(attrs or [])})
+
+    def add_marker(self,name):
+        """
+        adds marker, e.g. place where to call pre_func in render
+        """
+        self.items.append({'kind':'marker','role':self.role,'name':name})
+
+    def add_scale(self,title,u_min,u_max,polylines,tick_rows,text_rows):
+        """
+        adds scale with main line polylines (arrays (n,2) in pt) and its
+        ticks and texts as items per tick level. tick_rows are
+        (level,u,x0,y0,x1,y1) and text_rows (level,u,text,x,y) in pt.
+        Returns index of scale.
+        """
+        scale=self.scale_number
+        self.scale_number+=1
+        self.items.append({'kind':'scale','role':self.role,'scale':scale,
+                           'title':title,'u_min':u_min,'u_max':u_max,
+                           'polylines':polylines})
+        for level in sorted(set(row[0] for row in tick_rows)):
+            rows=[row for row in tick_rows if row[0]==level]
+            self.items.append({'kind':'ticks','role':self.role,'scale':scale,
+                               'level':level,
+                               'u':numpy.array([row[1] for row in rows],dtype=float),
+                               'lines':numpy.array([row[2:] for row in rows],dtype=float)})
+        for level in sorted(set(row[0] for row in text_rows)):
+            rows=[row for row in text_rows if row[0]==level]
+            self.items.append({'kind':'labels','role':self.role,'scale':scale,
+                               'level':level,
+                               'u':numpy.array([row[1] for row in rows],dtype=float),
+                               'texts':[row[2] for row in rows],
+                               'anchors':numpy.array([row[3:] for row in rows],dtype=float)})
+        return scale
+
+    def add_grid_line(self,variable,value,title,points,anchors):
+        """
+        adds grid line of variable ('u' or 'v') that is constant value.
+        points (n,2) and text anchors (m,2) are in pt.
+        """
+        self.items.append({'kind':'grid_line','role':self.role,
+                           'variable':variable,'value':value,'title':title,
+                           'points':numpy.array(points,dtype=float).reshape(-1,2),
+                           'anchors':numpy.array(anchors,dtype=float).reshape(-1,2)})
+
+    def add_isopleth(self,index,values,segments,points):
+        """
+        adds isopleth index with values, segments (x1,y1,x2,y2) and
+        solution points (x,y) in pt
+        """
+        self.items.append({'kind':'isopleth','role':self.role,'index':index,
+                           'values':list(values),
+                           'segments':numpy.array(segments,dtype=float).reshape(-1,4),
+                           'points':numpy.array(points,dtype=float).reshape(-1,2)})
+
+    def give_items(self,kind=None,role=None,scale=None):
+        """
+        returns items of given kind, role and scale index (None = all)
+        """
+        return [item for item in self.items
+                if (kind is None or item['kind']==kind)
+                and (role is None or item['role']==role)
+                and (scale is None or item.get('scale')==scale)]
+
+    def give_segments(self,item):
+        """
+        returns list of (subpath segment array, closed) of path item.
+        Segment array has rows (x0,y0,x1,y1,x2,y2,x3,y3) in pt of cubic
+        Bezier curves. Lines have control points at their ends.
+        """
+        if 'segments' not in item:
+            item['segments']=_give_segments_(item['path'])
+        return item['segments']
+
+    def give_polylines(self,item):
+        """
+        returns list of point arrays (n,2) in pt of path item. Curves are
+        represented by their end points.
+        """
+        polylines=[]
+        for segments,closed in self.give_segments(item):
+            points=numpy.concatenate((segments[:1,0:2],segments[:,6:8]))
+            polylines.append(points)
+        return polylines
+
+    def _give_path_(self,item):
+        """
+        returns PyX path of path item
+        """
+        if item.get('path') is None:
+            item['path']=_give_path_(item['segments'])
+        return item['path']
+
+    def render(self,c,pre_func=None,post_func=None):
+        """
+        draws model to PyX canvas c. pre_func(c) and post_func(c) are
+        called at their markers.
+        """
+        funcs={'pre_func':pre_func,'post_func':post_func}
+        for item in self.items:
+            kind=item['kind']
+            if kind=='stroke':
+                c.stroke(self._give_path_(item),item['attrs'])
+            elif kind=='fill':
+                c.fill(self._give_path_(item),item['attrs'])
+            elif kind=='draw':
+                c.draw(self._give_path_(item),item['attrs'])
+            elif kind=='text':
+                c.text(item['x_pt']*unit.t_pt,item['y_pt']*unit.t_pt,
+                       item['text'],item['attrs'])
+            elif kind=='insert':
+                c.insert(item['item'],item['attrs'])
+            elif kind=='marker' and funcs.get(item['name']) is not None:
+                funcs[item['name']](c)
+
+    def _give_data_(self):
+        """
+        returns (JSON compatible data,list of arrays) of model
+        """
+        items=[]
+        arrays=[]
+        for item in self.items:
+            data={}
+            for key,value in item.items():
+                if item['kind'] in ('stroke','fill','draw') and key in ('path','segments'):
+                    continue
+                data[key]=_encode_(value,arrays)
+            if item['kind'] in ('stroke','fill','draw'):
+                data['subpaths']=[]
+                for segments,closed in self.give_segments(item):
+                    data['subpaths'].append((len(arrays),closed))
+                    arrays.append(segments)
+            items.append(data)
+        return {'version':self.version,'items':items},arrays
+
+    def save(self,filename):
+        """
+        saves model to JSON file or (if filename ends with .npz) to
+        numpy NPZ file
+        """
+        data,arrays=self._give_data_()
+        if filename.endswith('.npz'):
+            numpy.savez_compressed(filename,model=numpy.array(json.dumps(data)),
+                                   **dict(('a%i'%i,a) for i,a in enumerate(arrays)))
+        else:
+            data['arrays']=[(a.shape,a.ravel().tolist()) for a in arrays]
+            with open(filename,'w') as f:
+                json.dump(data,f)
+
+class Geometry_Canvas(object):
+    """
+    stands for PyX canvas in geometry phase and records all drawing
+    into Geometry_Model model
+    """
+    def __init__(self,model):
+        self.model=model
+
+    def set_role(self,role):
+        """
+        sets role of items drawn next
+        """
+        self.model.role=role
+
+    def stroke(self,p,attrs=[]):
+        self.model.add_path('stroke',p,attrs)
+
+    def fill(self,p,attrs=[]):
+        self.model.add_path('fill',p,attrs)
+
+    def draw(self,p,attrs=[]):
+        self.model.add_path('draw',p,attrs)
+
+    def text(self,x,y,text,attrs=[]):
+        self.model.add_text(unit.topt(x),unit.topt(y),text,attrs)
+
+    def text_pt(self,x_pt,y_pt,text,attrs=[]):
+        self.model.add_text(x_pt,y_pt,text,attrs)
+
+    def insert(self,item,attrs=None):
+        self.model.add_insert(item,attrs)
+        return item
+
+    def settextengine(self,textengine):
+        pass # text engine of render canvas is used
+
+    def add_scale(self,axis):
+        """
+        records scale entity of Nomo_Axis axis
+        """
+        to_pt=unit.topt(1.0)
+        polylines=[numpy.concatenate((segments[:1,0:2],segments[:,6:8]))
+                   for segments,closed in _give_segments_(axis.main_line)]
+        tick_rows=[(level,u,x0*to_pt,y0*to_pt,x1*to_pt,y1*to_pt)
+                   for level,u,x0,y0,x1,y1 in axis.tick_rows]
+        text_rows=[(level,u,text,x*to_pt,y*to_pt)
+                   for level,u,text,x,y in axis.text_rows]
+        return self.model.add_scale(axis.title,axis.start,axis.stop,polylines,
+                                    tick_rows,text_rows)
+
+    def add_grid_line(self,variable,value,title,x_values,y_values,anchors):
+        """
+        records grid line sampled to x_values,y_values and anchors (x,y)
+        of its texts
+        """
+        to_pt=unit.topt(1.0)
+        points=numpy.column_stack((x_values,y_values))*to_pt
+        self.model.add_grid_line(variable,value,title,points,
+                                 numpy.array(anchors,dtype=float)*to_pt)
+
+    def add_isopleth(self,index,values,segments,points):
+        """
+        records isopleth with segments (x1,y1,x2,y2) and points (x,y)
+        """
+        to_pt=unit.topt(1.0)
+        self.model.add_isopleth(index,values,
+                                numpy.array(segments,dtype=float)*to_pt,
+                                numpy.array(points,dtype=float)*to_pt)
+
+def load_geometry(filename):
+    """
+    returns Geometry_Model saved with Geometry_Model.save
+    """
+    if filename.endswith('.npz'):
+        with numpy.load(filename,allow_pickle=False) as f:
+            data=json.loads(str(f['model']))
+            arrays=[f['a%i'%i] for i in range(len(f.files)-1)]
+    else:
+        with open(filename) as f:
+            data=json.load(f)
+        arrays=[numpy.array(a,dtype=float).reshape(shape) for shape,a in data['arrays']]
+    if data['version']!=Geometry_Model.version:
+        raise ValueError("geometry file %s has version %s, expected %s"
+                         %(filename,data['version'],Geometry_Model.version))
+    model=Geometry_Model()
+    for data_item in data['items']:
+        item={}
+        for key,value in data_item.items():
+            if key=='subpaths':
+                item['segments']=[(arrays[i],closed) for i,closed in value]
+            else:
+                item[key]=_decode_(value,arrays)
+        model.items.append(item)
+    model.scale_number=len(model.give_items('scale'))
+    return model
+
+def _give_segments_(p):
+    """
+    returns list of (segment array,closed) of PyX path p
+    """
+    result=[]
+    for subpath in p.normpath().normsubpaths:
+        rows=[]
+        for s in subpath.normsubpathitems:
+            if isinstance(s,normline_pt):
+                rows.append((s.x0_pt,s.y0_pt,s.x0_pt,s.y0_pt,
+                             s.x1_pt,s.y1_pt,s.x1_pt,s.y1_pt))
+            else:
+                rows.append((s.x0_pt,s.y0_pt,s.x1_pt,s.y1_pt,
+                             s.x2_pt,s.y2_pt,s.x3_pt,s.y3_pt))
+        if len(rows)>0:
+            result.append((numpy.array(rows,dtype=float),bool(subpath.closed)))
+    return result
+
+def _give_path_(segments):
+    """
+    returns PyX path of list of (segment array,closed)
+    """
+    items=[]
+    for array,closed in segments:
+        items.append(path.moveto_pt(array[0,0],array[0,1]))
+        for x0,y0,x1,y1,x2,y2,x3,y3 in array.tolist():
+            if x1==x0 and y1==y0 and x2==x3 and y2==y3:
+                items.append(path.lineto_pt(x3,y3))
+            else:
+                items.append(path.curveto_pt(x1,y1,x2,y2,x3,y3))
+        if closed:
+            items.append(path.closepath())
+    return path.path(*items)
+
+def _encode_(value,arrays):
+    """
+    returns JSON compatible data of value made of PyX objects, classes,
+    lists, tuples, dicts, numbers and numpy arrays. Arrays are appended
+    to list arrays and referred by index.
+    """
+    if value is None or isinstance(value,(bool,str)):
+        return value
+    if isinstance(value,(int,float,numpy.number)):
+        return value.item() if isinstance(value,numpy.number) else value
+    if isinstance(value,numpy.ndarray):
+        arrays.append(value)
+        return {'array':len(arrays)-1}
+    if isinstance(value,list):
+        return [_encode_(v,arrays) for v in value]
+    if isinstance(value,tuple):
+        return {'tuple':[_encode_(v,arrays) for v in value]}
+    if isinstance(value,dict):
+        return {'dict':[[_encode_(k,arrays),_encode_(v,arrays)] for k,v in value.items()]}
+    if isinstance(value,type):
+        return {'class':_give_class_name_(value)}
+    if hasattr(value,'__dict__'):
+        return {'object':_give_class_name_(type(value)),
+                'state':dict((k,_encode_(v,arrays)) for k,v in vars(value).items())}
+    raise ValueError("cannot save %r to geometry file"%(value,))
+
+def _decode_(data,arrays):
+    """
+    returns value of data made by _encode_
+    """
+    if isinstance(data,list):
+        return [_decode_(v,arrays) for v in data]
+    if not isinstance(data,dict):
+        return data
+    if 'array' in data:
+        return arrays[data['array']]
+    if 'tuple' in data:
+        return tuple(_decode_(v,arrays) for v in data['tuple'])
+    if 'dict' in data:
+        return dict((_decode_(k,arrays),_decode_(v,arrays)) for k,v in data['dict'])
+    if 'class' in data:
+        return _give_class_(data['class'])
+    cls=_give_class_(data['object'])
+    value=cls.__new__(cls)
+    value.__dict__.update((k,_decode_(v,arrays)) for k,v in data['state'].items())
+    return value
+
+def _give_class_name_(cls):
+    """
+    returns 'module:class' name of PyX class
+    """
+    if not cls.__module__.split('.')[0]=='pyx':
+        raise ValueError("cannot save %s objects to geometry file"%cls.__name__)
+    return '%s:%s'%(cls.__module__,cls.__qualname__)
+
+def _give_class_(name):
+    """
+    returns PyX class of 'module:class' name
+    """
+    module_name,class_name=name.split(':')
+    if not module_name.split('.')[0]=='pyx':
+        raise ValueError("geometry file refers to non PyX class %s"%name)
+    cls=importlib.import_module(module_name)
+    for part in class_name.split('.'):
+        cls=getattr(cls,part)
+    return cls
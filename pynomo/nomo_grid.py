@@ -22,17 +22,19 @@ from math import *
 from scipy import *
 from numpy import *
 from .nomo_axis import *
-import random
+from .nomo_sampler import *
 import sys
 
 class Nomo_Grid:
     """
     class to make grids
     """
-    def __init__(self,func_f,func_g,canvas,data={}):
+    def __init__(self,func_f,func_g,canvas,data={},sampling_tolerance=None):
         self.f=func_f
         self.g=func_g
         self.canvas=canvas
+        # max error (cm) of adaptive lines, None = fixed number of sections
+        self.sampling_tolerance=sampling_tolerance
         data_default_values={'u_start':0.0,
                              'u_stop':1.0,
                              'v_start':0.0,
@@ -55,8 +57,9 @@ class Nomo_Grid:
                              'text_prefix_v':'', # for example r'$\beta$='
                              'text_format_u':"$%4.4g$",
                              'text_format_v':"$%4.4g$",
-                             'iterator_factor':1.001,
                              }
+        if 'iterator_factor' in data:
+            print("Nomo_Grid: 'iterator_factor' is not used, lines are sampled by nomo_sampler")
         self.grid_data=data_default_values
         self.grid_data.update(data)
         #print self.grid_data
@@ -80,11 +83,13 @@ class Nomo_Grid:
                 #print self.grid_data['text_prefix_v']
                 self._draw_line_(f_here,g_here,start,stop,
                                  r"%s%s"%(self.grid_data['text_prefix_v'],self.grid_data['text_format_v'])%v,line_color,
-                                 start_texts,stop_texts,self.grid_data['v_text_color'],line_width)
+                                 start_texts,stop_texts,self.grid_data['v_text_color'],line_width,
+                                 variable='v',value=v)
             else:
                 self._draw_line_(f_here,g_here,start,stop,
                                  self.grid_data['v_texts'][idx],line_color,
-                                 start_texts,stop_texts,self.grid_data['v_text_color'],line_width)
+                                 start_texts,stop_texts,self.grid_data['v_text_color'],line_width,
+                                 variable='v',value=v)
             #print "v=%f"%v
 
     def _draw_line_v_(self):
@@ -103,11 +108,13 @@ class Nomo_Grid:
             if 'u_texts' not in self.grid_data:
                 self._draw_line_(f_here,g_here,start,stop,
                                   r"%s%s"%(self.grid_data['text_prefix_u'],self.grid_data['text_format_u'])%u,line_color,
-                                 start_texts,stop_texts,self.grid_data['u_text_color'],line_width)
+                                 start_texts,stop_texts,self.grid_data['u_text_color'],line_width,
+                                 variable='u',value=u)
             else:
                 self._draw_line_(f_here,g_here,start,stop,
                                  self.grid_data['u_texts'][idx],line_color,
-                                 start_texts,stop_texts,self.grid_data['u_text_color'],line_width)
+                                 start_texts,stop_texts,self.grid_data['u_text_color'],line_width,
+                                 variable='u',value=u)
             #print "u=%f"%u
 
     def _make_u_funcs_(self,v_value):
@@ -129,75 +136,30 @@ class Nomo_Grid:
         return f,g
 
     def _draw_line_(self,f,g,start,stop,title,axis_color=color.rgb.red,
-                    start_texts=False,stop_texts=True,text_color=color.rgb.black, line_width=style.linewidth.normal):
+                    start_texts=False,stop_texts=True,text_color=color.rgb.black, line_width=style.linewidth.normal,
+                    variable=None,value=None):
         if start>0 and stop>0:
             du=(max(start,stop)-min(start,stop))*1e-10 # was 1e-10
             #print "start:%g stop:%g"%(start,stop)
             #print "testing du = %g"%du
         else:
             du=fabs(start-stop)*1e-5
-        # approximate line length is found
-        line_length_straigth=sqrt((f(start)-f(stop))**2+(g(start)-g(stop))**2)
-        random.seed(0.0) # so that mistakes always the same
-        for dummy in range(100):
-            first=random.uniform(start,stop)
-            second=random.uniform(start,stop)
-            temp=sqrt((f(first)-f(second))**2+(g(first)-g(second))**2)
-            if temp>line_length_straigth:
-                line_length_straigth=temp
-                #print "length: %f"%line_length_straigth
-        sections=350.0 # about number of sections
-        section_length=line_length_straigth/sections
-        line = path.path(path.moveto(f(start), g(start)))
-        line.append(path.lineto(f(start), g(start)))
-        u=start
-        laskuri=1
-        up_factor=self.grid_data['iterator_factor']
-        down_factor=1.0/up_factor
-        delta_u = du # initial
-        while True:
-            if (u+delta_u)<stop:
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=sqrt(dx**2+dy**2)
-                delta_u=du*section_length/dl
-                # let's calculate actual length
-                # and iterate until length is in factor 2 from target
-                while True:
-                    #u_delta_step = min(stop,u+delta_u) # in order to avoid going over range
-                    if (u+delta_u)>=stop: # stop if out of range
-                        break
-                    delta_x=f(u+delta_u)-f(u)
-                    delta_y=g(u+delta_u)-g(u)
-                    delta_l=sqrt(delta_x**2+delta_y**2)
-                    if delta_l>5.0*section_length:
-                        delta_u=delta_u*down_factor #0.999
-                        #print "delta_u pienenee:%f"%delta_u
-                    else:
-                        if delta_l<section_length/5.0:
-                            delta_u=delta_u*up_factor #1.001
-                            #print "delta_u kasvaa:%f"%delta_u
-                            #print "u+delta_u:%g, stop:%g"%(u+delta_u,stop)
-                    if delta_l<=5.0*section_length and delta_l>=0.2*section_length:
-                        #print "u:%g:x=%g, y=%g"%(u,f(u),g(u))
-                        break
-
-                u+=delta_u
-                #print u,stop
-                laskuri=laskuri+1
-                line.append(path.lineto(f(u), g(u)))
-            else:
-                line.append(path.lineto(f(stop), g(stop)))
-                #print laskuri
-                sys.stdout.write('.')
-                break
+        u_values,x_values,y_values=sample_curve(f,g,start,stop,sections=350.0,
+                                                tolerance=self.sampling_tolerance)
+        line = path.path(path.moveto(x_values[0], y_values[0]))
+        for x,y in zip(x_values.tolist(),y_values.tolist()):
+            line.append(path.lineto(x, y))
+        sys.stdout.write('.')
 
         self.canvas.stroke(line, [line_width, axis_color])
+        anchors=[] # of texts
         # start number
         if start_texts: # set texts to to start
-            self._set_text_to_grid_(f, g, start, du, title,axis_color,text_color)
+            anchors.append(self._set_text_to_grid_(f, g, start, du, title,axis_color,text_color))
         if stop_texts: # set texts to stop
-            self._set_text_to_grid_(f, g, stop, -du, title,axis_color,text_color)
+            anchors.append(self._set_text_to_grid_(f, g, stop, -du, title,axis_color,text_color))
+        if hasattr(self.canvas,'add_grid_line'): # geometry model records grid lines
+            self.canvas.add_grid_line(variable,value,title,x_values,y_values,anchors)
         if self.grid_data['circles']:
             self.canvas.fill(path.circle(f(start), g(start), 0.03),[axis_color])
             self.canvas.fill(path.circle(f(stop), g(stop), 0.03),[axis_color])
@@ -205,7 +167,7 @@ class Nomo_Grid:
 
     def _set_text_to_grid_(self,f,g,u,du,title,axis_color,text_color=color.rgb.black):
         """
-        draws text to the end of gridline
+        draws text to the end of gridline, returns its anchor (x,y)
         """
         dx=(f(u+du)-f(u))
         dy=(g(u+du)-g(u))
@@ -253,9 +215,9 @@ class Nomo_Grid:
         """
         text_distance=self.grid_data['text_distance']
         text_attr=text_attr+[text_color]
-        self.canvas.text(f(u)-text_distance*dx_unit,
-                         g(u)-text_distance*dy_unit,
-                         title,text_attr)
+        x,y=f(u)-text_distance*dx_unit,g(u)-text_distance*dy_unit
+        self.canvas.text(x,y,title,text_attr)
+        return x,y
         #self.canvas.fill(path.circle(f(u), g(u), 0.03),[axis_color])
 
 if __name__=='__main__':
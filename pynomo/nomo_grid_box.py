@@ -28,16 +28,19 @@ from scipy.optimize import *
 from numpy import *
 from .nomo_axis import *
 import time
+from .nomo_sampler import *
 
 
 class Nomo_Grid_Box(object):
     """
     class to calculate "grid boxes" according to (East)-German nomographic tradition
     """
-    def __init__(self,params={}):
+    def __init__(self,params={},sampling_tolerance=None):
         """
         params = definitions
         """
+        # max error (cm) of adaptive v lines, None = fixed number of sections
+        self.sampling_tolerance=sampling_tolerance
         params_default_values={'width':10.0,
                                'height':10.0,
                                'mirror_x':False,
@@ -204,11 +207,7 @@ class Nomo_Grid_Box(object):
         v_manual_axis_data = {}
         # let's go through all lines and find x-coordinate of top points.
         for idx1,v_line in enumerate(self.v_lines):
-            x_max,y_max = v_line[0]
-            for idx2,(x,y) in enumerate(v_line):
-                if y>y_max:
-                    x_max=x
-                    y_max=y
+            x_max=float(v_line[nanargmax(v_line[:,1]),0])
             v_value=self.params['v_values'][idx1]
             #v_manual_axis_data[v_value]='%f'%x_max
             v_manual_axis_data[x_max]='%3.2f'%v_value
@@ -361,10 +360,15 @@ class Nomo_Grid_Box(object):
                 y_new=y*y_factor
                 self.u_lines[idx1][idx2]=(x_new,y_new)
         for idx1,v_line in enumerate(self.v_lines):
-            for idx2,(x,y) in enumerate(v_line):
-                x_new=x*x_factor
-                y_new=y*y_factor
-                self.v_lines[idx1][idx2]=(x_new,y_new)
+            self.v_lines[idx1]=v_line*array([x_factor,y_factor])
+        # adaptive lines are taken after scaling when tolerance is in cm
+        tolerance=self.sampling_tolerance
+        if tolerance is not None:
+            scaling=array([[x_factor,0.0,0.0],[0.0,y_factor,0.0],[0.0,0.0,1.0]])
+            for idx1,geometry in enumerate(self.v_geometries):
+                u_values,x_values,y_values=\
+                    geometry.transformed(scaling).give_polyline(tolerance=tolerance)
+                self.v_lines[idx1]=column_stack((x_values,y_values))
         # scale functions
         self.u_func=lambda u:self.params['u_func'](u)*y_factor
         self.v_func=lambda x,v:self.params['v_func'](x/x_factor,v)*y_factor
@@ -410,10 +414,12 @@ class Nomo_Grid_Box(object):
         """
         self.v_lines=[]
         self.v_sections=[]
+        self.v_geometries=[] # sampled curves for adaptive lines
         for v in self.params['v_values']:
-            line,sections = self._build_v_line_(v_func=v_func,v=v)
+            line,sections,geometry = self._build_v_line_(v_func=v_func,v=v)
             self.v_lines.append(line)
             self.v_sections.append(sections)
+            self.v_geometries.append(geometry)
 
     def _build_v_line_(self,v_func,v=1.0):
         """
@@ -481,88 +487,22 @@ class Nomo_Grid_Box(object):
         #if self.params['manual_x_scale']==True:
         #    start=min(self.params['x_min'],self.params['x_max'])
         #    stop=max(self.params['x_min'],self.params['x_max'])
-        du=fabs(stop-start)*1e-12
-        # approximate line length is found
-        line_length_straigth=max_fu-min_fu
-        sections=200.0 # number of sections
-        section_length=line_length_straigth/sections
-        line = [(f(start), g(start))]
-        line.append((f(start), g(start)))
-        u=start
-        count=1
-        #print "v:%g"%v
-        while True:
-            if u<stop:
-                count = 1
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=sqrt(dx**2+dy**2)
-                if dl>0:
-                    delta_u=du*section_length/dl
-                else:
-                    delta_u=du
-                # let's calculate actual length
-                # and iterate until length is in factor 2 from target
-                while True:
-                    count=count+1
-                    delta_x=f(u+delta_u)-f(u)
-                    delta_y=g(u+delta_u)-g(u)
-                    delta_l=sqrt(delta_x**2+delta_y**2)
-                    if delta_l>2.0*section_length:
-                        delta_u=delta_u*0.999
-                        #print "v:%g, delta_x:%g delta_y:%g delta_l:%g, section_length:%g, delta_u pienenee:%g"%(v,delta_x,delta_y,delta_l,section_length,delta_u)
-                    else:
-                        if delta_l<section_length/2.0:
-                            delta_u=delta_u*1.001
-                            #print "v:%g, delta_x:%g delta_y:%g delta_l:%g, section_length:%g, delta_u kasvaa:%g"%(v,delta_x,delta_y,delta_l,section_length,delta_u)
-                    if delta_l<=2*section_length and delta_l>=0.5*section_length:
-                        #print "selvitty"
-                        break
-                    if count>1e3: # cancel if not solution
-                        print("Warning no solution found in contour")
-                        break
-
-                u+=delta_u
-                #print u,stop
-                if (u<stop and count<1e3):
-                    line.append((f(u), g(u)))
-                else:
-                    u=stop # stop looping of contour
-                #print "count %f"%count
-            else:
-                line.append((f(stop), g(stop)))
-                #print count
-                #print line
-                break
-        # calculate sections
-        sections=[]
-        for index,(x,y) in enumerate(line):
-            if index>1:
-                sections.append((x,y,prev_x,prev_y))
-            prev_x=x
-            prev_y=y
-        return line,sections
+        geometry=sample_geometry(f,g,start,stop,sections=200.0)
+        u_values,x_values,y_values=geometry.give_polyline(sections=200.0)
+        polyline=Polyline(x_values,y_values,u_values)
+        # line is N x 2 array of points, sections (N-1) x 4 array
+        return polyline.points,polyline.give_sections_array(),geometry
 
     def _calc_bound_box_ini_(self):
         """
         calculates bounding initial bounding box
         """
-        (x_0,y_0)=self.v_lines[0][0]
-        x_left=x_0
-        y_top=max(self.u_func(array(self.params['u_values'])))
-        x_right=x_0
-        y_bottom=min(self.u_func(array(self.params['u_values'])))
-        for line in self.v_lines:
-            for x,y in line:
-                if x<x_left:
-                    x_left=x
-                if x>x_right:
-                    x_right=x
-                if y<y_bottom:
-                    y_bottom=y
-                if y>y_top:
-                    y_top=y
-                    #print "y_top %f"%y_top
+        points=concatenate(self.v_lines)
+        u_values=self.u_func(array(self.params['u_values']))
+        x_left=float(nanmin(points[:,0]))
+        x_right=float(nanmax(points[:,0]))
+        y_bottom=float(nanmin(concatenate((points[:,1],u_values))))
+        y_top=float(nanmax(concatenate((points[:,1],u_values))))
         #print x_left,x_right,y_bottom,y_top
         if self.params['manual_x_scale']==True:
             self.x_left_ini=self.params['x_min']
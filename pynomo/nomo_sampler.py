@@ -0,0 +1,648 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Curve sampling shared by axes, grids and atoms.
+
+All curves (f(u),g(u)), u in [start,stop] are sampled to polylines with the
+same contract:
+    - about 'sections' sections of equal length (measured after optional
+      3x3 projective trafo)
+    - step in u is never larger than |stop-start|/min_u_sections
+    - polyline starts at u=start and ends at u=stop
+or, if a tolerance is given, as adaptive polylines that are within the
+tolerance (in paper centimetres) from the curve.
+Functions are evaluated with arrays of u if possible. Evaluated curves are
+kept in Curve_Geometry objects, so that transformed polylines can be taken
+from them without calling the functions again.
+"""
+import numpy
+import time
+from scipy.spatial import cKDTree
+
+class Curve_Sampler(object):
+    """
+    samples curves to polylines. Keeps statistics of its work in self.stats.
+    """
+    def __init__(self,dense_factor=8,min_u_sections=100):
+        self.dense_factor=dense_factor # dense evaluation points per section
+        self.min_u_sections=min_u_sections # maximum u-step is range/min_u_sections
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        zeroes statistics
+        """
+        self.stats={'curves':0, # number of sampled curves
+                    'evaluations':0, # number of f and g evaluations
+                    'scalar_evaluations':0, # of which evaluated one by one
+                    'time':0.0, # time used in seconds
+                    }
+
+    def evaluate(self,func,u_values):
+        """
+        evaluates func at u_values and updates statistics
+        """
+        return self._evaluate_(func,u_values)[0]
+
+    def _evaluate_(self,func,u_values,vectorized=None):
+        """
+        as evaluate, returns also True if func was vectorized.
+        See _evaluate_array_ for vectorized.
+        """
+        values,vectorized=_evaluate_array_(func,u_values,vectorized)
+        self.stats['evaluations']+=len(values)
+        if not vectorized:
+            self.stats['scalar_evaluations']+=len(values)
+        return values,vectorized
+
+    def sample_geometry(self,f,g,start,stop,sections=350.0):
+        """
+        evaluates curve (f(u),g(u)), u in [start,stop] densely enough to
+        give polylines of 'sections' sections. A coarse evaluation gives
+        the length along u and dense samples are put where the length is.
+        Returns Curve_Geometry.
+        """
+        time_start=time.time()
+        n_dense=max(int(sections),1)*self.dense_factor
+        # coarse pass: estimate of length along u
+        n_coarse=max(min(self.min_u_sections,n_dense),1)
+        u_coarse=numpy.linspace(start,stop,n_coarse+1)
+        x_coarse,f_vectorized=self._evaluate_(f,u_coarse)
+        y_coarse,g_vectorized=self._evaluate_(g,u_coarse)
+        # dense pass: coarse intervals are split by their share of length
+        counts=_allocate_samples_(x_coarse,y_coarse,n_dense)
+        interval=numpy.repeat(numpy.arange(n_coarse),counts)
+        offset=numpy.arange(len(interval))-numpy.repeat(numpy.cumsum(counts)-counts,counts)
+        u_dense=numpy.append(u_coarse[interval]+(u_coarse[interval+1]-u_coarse[interval])
+                             *offset/counts[interval],stop)
+        # coarse points are reused, functions are known to be vectorized or not
+        new=numpy.append(offset>0,False)
+        x_dense=numpy.empty(len(u_dense))
+        y_dense=numpy.empty(len(u_dense))
+        x_dense[~new]=x_coarse
+        y_dense[~new]=y_coarse
+        x_dense[new]=self._evaluate_(f,u_dense[new],f_vectorized)[0]
+        y_dense[new]=self._evaluate_(g,u_dense[new],g_vectorized)[0]
+        geometry=Curve_Geometry(f,g,start,stop,u_dense,x_dense,y_dense,
+                                min_u_sections=self.min_u_sections,sampler=self)
+        self.stats['curves']+=1
+        self.stats['time']+=time.time()-time_start
+        return geometry
+
+    def sample(self,f,g,start,stop,sections=350.0,trafo=None,tolerance=None):
+        """
+        samples curve (f(u),g(u)), u in [start,stop] to a polyline of about
+        'sections' sections of equal length (measured after trafo) or, if
+        tolerance is given, to an adaptive polyline (see
+        Curve_Geometry.give_adaptive_polyline). Returns arrays u,x,y.
+        """
+        geometry=self.sample_geometry(f,g,start,stop,sections)
+        return geometry.transformed(trafo).give_polyline(sections,tolerance)
+
+    def find_center_value(self,f,g,start,stop,sections=350.0,trafo=None):
+        """
+        finds value of u that is at half length of the curve
+        """
+        u_values,x_values,y_values=self.sample(f,g,start,stop,sections,trafo)
+        return center_value(u_values,x_values,y_values)
+
+class Curve_Geometry(object):
+    """
+    densely evaluated curve (f(u),g(u)). Raw samples are kept and
+    transformed views share them, so functions are not called again.
+    """
+    def __init__(self,f,g,start,stop,u_values,x_values,y_values,
+                 trafo=None,min_u_sections=100,sampler=None,samples=None):
+        self.f=f
+        self.g=g
+        self.start=start
+        self.stop=stop
+        if samples is None:
+            samples={'u':u_values,'x':x_values,'y':y_values}
+        self.samples=samples # shared with transformed views
+        self.trafo=trafo
+        self.min_u_sections=min_u_sections
+        self.sampler=sampler # for evaluations when refining
+
+    def is_for(self,f,g,start,stop):
+        """
+        True if geometry is for these functions and range
+        """
+        return self.f is f and self.g is g and self.start==start and self.stop==stop
+
+    def covers(self,start,stop):
+        """
+        True if geometry has the range [start,stop] (in either order)
+        """
+        return min(self.start,self.stop)==min(start,stop) and \
+               max(self.start,self.stop)==max(start,stop)
+
+    def transformed(self,trafo):
+        """
+        view of the same samples with 3x3 transformation trafo applied
+        """
+        return Curve_Geometry(self.f,self.g,self.start,self.stop,None,None,None,
+                              trafo=trafo,min_u_sections=self.min_u_sections,
+                              sampler=self.sampler,samples=self.samples)
+
+    def give_points(self):
+        """
+        all (transformed) samples as arrays u,x,y
+        """
+        x_values,y_values=apply_trafo(self.trafo,self.samples['x'],self.samples['y'])
+        return self.samples['u'],x_values,y_values
+
+    def give_polyline(self,sections=350.0,tolerance=None,parametric=False):
+        """
+        picks from samples a polyline of about 'sections' sections of
+        equal (transformed) length. If tolerance (paper units) is given,
+        sections is not used and polyline is the adaptive one of
+        give_adaptive_polyline. Returns arrays u,x,y.
+        """
+        if tolerance is not None:
+            return self.give_adaptive_polyline(tolerance,parametric)
+        u_values,x_values,y_values=self.give_points()
+        last=len(u_values)-1
+        # samples are not evenly spaced in u, so u-grid is searched
+        direction=1.0 if u_values[-1]>=u_values[0] else -1.0
+        u_grid=numpy.linspace(u_values[0],u_values[-1],min(self.min_u_sections,last)+1)
+        indices=numpy.searchsorted(direction*u_values,direction*u_grid).clip(0,last)
+        length=_cumulative_length_(x_values,y_values)
+        if length[-1]>0.0:
+            targets=numpy.linspace(0.0,length[-1],max(int(sections),1)+1)
+            indices=numpy.concatenate((indices,
+                                       numpy.searchsorted(length,targets).clip(0,last)))
+        indices=numpy.unique(indices)
+        return u_values[indices],x_values[indices],y_values[indices]
+
+    def give_adaptive_polyline(self,tolerance,parametric=False):
+        """
+        polyline whose distance from the (transformed) curve is at most
+        tolerance. Straight parts get few points, curved parts more.
+        If parametric, u is also interpolated linearly along sections
+        within tolerance, as needed when points are mapped back to u.
+        Returns arrays u,x,y.
+        """
+        self.refine(tolerance)
+        u_values,x_values,y_values=self.give_points()
+        indices=_simplify_(u_values,x_values,y_values,tolerance,parametric)
+        return u_values[indices],x_values[indices],y_values[indices]
+
+    def refine(self,tolerance,max_rounds=8,max_points=1000000):
+        """
+        adds samples to the middle of sample intervals where the curve
+        deviates more than tolerance from the interval chord
+        """
+        evaluate=evaluate_array if self.sampler is None else self.sampler.evaluate
+        for dummy in range(max_rounds):
+            u_values,x_values,y_values=self.give_points()
+            if len(u_values)<2 or len(u_values)>max_points:
+                break
+            u_mid=(u_values[1:]+u_values[:-1])/2.0
+            x_mid_chord=(x_values[1:]+x_values[:-1])/2.0
+            y_mid_chord=(y_values[1:]+y_values[:-1])/2.0
+            # only intervals that are long enough to matter are tested
+            with numpy.errstate(all='ignore'):
+                test=numpy.hypot(numpy.diff(x_values),numpy.diff(y_values))>tolerance
+            if not test.any():
+                break
+            u_test=u_mid[test]
+            f_mid,g_mid=evaluate(self.f,u_test),evaluate(self.g,u_test)
+            x_mid,y_mid=apply_trafo(self.trafo,f_mid,g_mid)
+            with numpy.errstate(all='ignore'):
+                error=numpy.hypot(x_mid-x_mid_chord[test],y_mid-y_mid_chord[test])
+            add=error>tolerance
+            if not add.any():
+                break
+            u_all=numpy.concatenate((self.samples['u'],u_test[add]))
+            order=numpy.argsort(u_all,kind='stable')
+            if self.start>self.stop:
+                order=order[::-1]
+            # samples dict is shared with views, so it is updated in place
+            self.samples['x']=numpy.concatenate((self.samples['x'],f_mid[add]))[order]
+            self.samples['y']=numpy.concatenate((self.samples['y'],g_mid[add]))[order]
+            self.samples['u']=u_all[order]
+
+    def give_center_value(self,sections=350.0):
+        """
+        value of u at half length of the (transformed) curve
+        """
+        return center_value(*self.give_polyline(sections))
+
+class Polyline(object):
+    """
+    polyline stored as N x 2 array of points and optional N-vector of
+    values u. The list forms (line, sections, section_values, value_list)
+    used earlier are made only when asked.
+    """
+    def __init__(self,x_values,y_values,u_values=None):
+        self.points=numpy.column_stack((numpy.asarray(x_values,dtype=float),
+                                        numpy.asarray(y_values,dtype=float)))
+        if u_values is not None:
+            u_values=numpy.asarray(u_values,dtype=float)
+        self.values=u_values
+        self._lists={} # made list views
+        self._section_index=None # made when asked, see give_section_index
+        self._projection=None # made when asked, see give_projection
+
+    def __len__(self):
+        return len(self.points)
+
+    def give_sections_array(self):
+        """
+        sections as (N-1) x 4 array of rows (x,y,prev_x,prev_y)
+        """
+        return numpy.hstack((self.points[1:],self.points[:-1]))
+
+    def give_section_values_array(self):
+        """
+        section values as (N-1) x 2 array of rows (u,prev_u)
+        """
+        return numpy.column_stack((self.values[1:],self.values[:-1]))
+
+    def give_line(self):
+        """
+        list of points (x,y)
+        """
+        if 'line' not in self._lists:
+            self._lists['line']=[tuple(point) for point in self.points.tolist()]
+        return self._lists['line']
+
+    def give_sections(self):
+        """
+        list of sections (x,y,prev_x,prev_y)
+        """
+        if 'sections' not in self._lists:
+            self._lists['sections']=[tuple(section) for section in
+                                     self.give_sections_array().tolist()]
+        return self._lists['sections']
+
+    def give_value_list(self):
+        """
+        list of values u corresponding to points
+        """
+        if 'value_list' not in self._lists:
+            self._lists['value_list']=self.values.tolist()
+        return self._lists['value_list']
+
+    def give_section_values(self):
+        """
+        list of section values [u,prev_u]
+        """
+        if 'section_values' not in self._lists:
+            self._lists['section_values']=self.give_section_values_array().tolist()
+        return self._lists['section_values']
+
+    def give_section_index(self):
+        """
+        Section_Index of sections
+        """
+        if self._section_index is None:
+            self._section_index=Section_Index(self.give_sections_array())
+        return self._section_index
+
+    def give_projection(self):
+        """
+        Polyline_Projection of points and values
+        """
+        if self._projection is None:
+            self._projection=Polyline_Projection(self.points,self.values)
+        return self._projection
+
+class Section_Index(object):
+    """
+    bounding boxes of runs of chunk_size consecutive sections (x,y,prev_x,
+    prev_y) for finding where lines cross the sections. Chunks that a line
+    passes by are skipped and crossings of the rest are calculated with
+    arrays.
+    """
+    def __init__(self,sections,chunk_size=32):
+        self.sections=numpy.asarray(sections,dtype=float).reshape(-1,4)
+        self.chunk_size=chunk_size
+        n_chunks=(len(self.sections)+chunk_size-1)//chunk_size
+        starts=numpy.arange(n_chunks)*chunk_size
+        if n_chunks>0:
+            x_pairs=self.sections[:,[0,2]]
+            y_pairs=self.sections[:,[1,3]]
+            x_min=numpy.minimum.reduceat(x_pairs.min(axis=1),starts)
+            x_max=numpy.maximum.reduceat(x_pairs.max(axis=1),starts)
+            y_min=numpy.minimum.reduceat(y_pairs.min(axis=1),starts)
+            y_max=numpy.maximum.reduceat(y_pairs.max(axis=1),starts)
+            # boxes are widened more than the crossing tolerance of sections
+            margin=1e-5*numpy.maximum.reduce([abs(x_min),abs(x_max),abs(y_min),abs(y_max)])+1e-12
+            self.boxes=numpy.column_stack((x_min-margin,y_min-margin,
+                                           x_max+margin,y_max+margin))
+        else:
+            self.boxes=numpy.zeros((0,4))
+
+    def give_candidates(self,x1,y1,x2,y2):
+        """
+        indices of sections in chunks whose box the line through (x1,y1)
+        and (x2,y2) passes through
+        """
+        dx,dy=x2-x1,y2-y1
+        x_min,y_min,x_max,y_max=self.boxes.T
+        # side of line of each box corner
+        sides=numpy.column_stack((dx*(y_min-y1)-dy*(x_min-x1),
+                                  dx*(y_max-y1)-dy*(x_min-x1),
+                                  dx*(y_min-y1)-dy*(x_max-x1),
+                                  dx*(y_max-y1)-dy*(x_max-x1)))
+        passed=~((sides>0).all(axis=1) | (sides<0).all(axis=1))
+        chunks=numpy.nonzero(passed)[0]
+        if len(chunks)==len(self.boxes):
+            return numpy.arange(len(self.sections))
+        indices=(chunks[:,None]*self.chunk_size+numpy.arange(self.chunk_size)).ravel()
+        return indices[indices<len(self.sections)]
+
+    def give_line_crossings(self,x1,y1,x2,y2):
+        """
+        crossings of line through (x1,y1) and (x2,y2) with sections, in
+        order of sections. Returns arrays (indices,x,y). A section is
+        crossed if crossing of the lines is in its bounding box widened
+        by relative tolerance 1e-12 (and 1e-6 of the other end if an end
+        is zero). Repeated crossings at ends shared by consecutive sections
+        are given once.
+        """
+        indices=self.give_candidates(x1,y1,x2,y2)
+        x1s,y1s,x2s,y2s=self.sections[indices].T
+        with numpy.errstate(all='ignore'):
+            det_s=x1s*y2s-x2s*y1s
+            det_l=x1*y2-x2*y1
+            den=(x1s-x2s)*(y1-y2)-(x1-x2)*(y1s-y2s)
+            x=(det_s*(x1-x2)-det_l*(x1s-x2s))/den
+            y=(det_s*(y1-y2)-det_l*(y1s-y2s))/den
+            inside=(_in_range_(x,x1s,x2s)&_in_range_(y,y1s,y2s))
+        indices,x,y=indices[inside],x[inside],y[inside]
+        if len(indices)>1:
+            repeated=numpy.zeros(len(indices),dtype=bool)
+            repeated[1:]=((numpy.diff(indices)==1)&
+                          (numpy.hypot(numpy.diff(x),numpy.diff(y))<=
+                           1e-9*(1.0+numpy.hypot(x[1:],y[1:]))))
+            indices,x,y=indices[~repeated],x[~repeated],y[~repeated]
+        return indices,x,y
+
+class Polyline_Projection(object):
+    """
+    finds values u of points projected to the nearest place of a polyline.
+    Points of the polyline are in a KD-tree. Only sections next to points
+    closer than the nearest point plus the longest section can have the
+    nearest place, so only they are projected to.
+    """
+    def __init__(self,points,values):
+        points=numpy.asarray(points,dtype=float).reshape(-1,2)
+        finite=numpy.isfinite(points).all(axis=1)
+        self.point_indices=numpy.nonzero(finite)[0] # indices of points in tree
+        self.points=points
+        self.values=numpy.asarray(values,dtype=float)
+        self.tree=cKDTree(points[finite]) if finite.any() else None
+        with numpy.errstate(all='ignore'):
+            lengths=numpy.hypot(numpy.diff(points[:,0]),numpy.diff(points[:,1]))
+        self.section_ok=numpy.isfinite(lengths) # sections with finite ends
+        self.max_length=lengths[self.section_ok].max() if self.section_ok.any() else 0.0
+
+    def give_values(self,x,y):
+        """
+        values u at places of polyline nearest to points (x,y). x and y are
+        numbers or arrays. Values are interpolated linearly in u along the
+        section of the nearest place.
+        """
+        u,distance=self.give_values_and_distances(x,y)
+        if numpy.ndim(x)==0 and numpy.ndim(y)==0:
+            return float(u[0])
+        return u
+
+    def give_values_and_distances(self,x,y):
+        """
+        arrays of values u and distances of points (x,y) from polyline
+        """
+        queries=numpy.column_stack(numpy.broadcast_arrays(numpy.ravel(x),numpy.ravel(y))).astype(float)
+        n_queries=len(queries)
+        finite=numpy.isfinite(queries).all(axis=1)
+        if self.tree is None or not finite.all():
+            u=numpy.full(n_queries,numpy.nan)
+            distance=numpy.full(n_queries,numpy.inf)
+            if self.tree is not None and finite.any():
+                u[finite],distance[finite]=self.give_values_and_distances(*queries[finite].T)
+            return u,distance
+        nearest_distances,nearest=self.tree.query(queries)
+        nearest=self.point_indices[nearest]
+        if not self.section_ok.any():
+            return self.values[nearest],nearest_distances
+        # points close enough to be ends of sections with nearest places
+        radii=nearest_distances+self.max_length*(1.0+1e-9)
+        near_lists=self.tree.query_ball_point(queries,radii)
+        counts=numpy.array([len(near) for near in near_lists])
+        near=self.point_indices[numpy.concatenate([numpy.asarray(near,dtype=int)
+                                                   for near in near_lists])]
+        query_idx=numpy.repeat(numpy.arange(n_queries),counts)
+        # sections (near-1,near) and (near,near+1)
+        sections=numpy.concatenate((near-1,near))
+        query_idx=numpy.concatenate((query_idx,query_idx))
+        ok=(sections>=0)&(sections<len(self.section_ok))
+        sections,query_idx=sections[ok],query_idx[ok]
+        ok=self.section_ok[sections]
+        sections,query_idx=sections[ok],query_idx[ok]
+        # projection to sections
+        p0=self.points[sections]
+        d=self.points[sections+1]-p0
+        q=queries[query_idx]-p0
+        length2=(d*d).sum(axis=1)
+        with numpy.errstate(all='ignore'):
+            t=numpy.where(length2>0,(q*d).sum(axis=1)/length2,0.0)
+        t=numpy.clip(t,0.0,1.0)
+        distances=numpy.hypot(q[:,0]-t*d[:,0],q[:,1]-t*d[:,1])
+        # nearest section of each query, first one if equally near
+        order=numpy.lexsort((sections,distances,query_idx))
+        first=numpy.ones(len(order),dtype=bool)
+        first[1:]=query_idx[order][1:]!=query_idx[order][:-1]
+        best=order[first]
+        u=numpy.array(self.values[nearest],dtype=float)
+        distance=numpy.array(nearest_distances,dtype=float)
+        best_query=query_idx[best]
+        best_sections=sections[best]
+        u0=self.values[best_sections]
+        u[best_query]=u0+t[best]*(self.values[best_sections+1]-u0)
+        distance[best_query]=distances[best]
+        return u,distance
+
+def _in_range_(values,ends_1,ends_2):
+    """
+    True where values are between ends widened by relative tolerance.
+    Zero ends are moved a little over zero.
+    """
+    f1=1.0-1e-12
+    f2=1.0+1e-12
+    f3=1e-6
+    v_min=numpy.minimum(ends_1,ends_2)
+    v_min=numpy.where(v_min>0,v_min*f1,v_min*f2)
+    v_max=numpy.maximum(ends_1,ends_2)
+    v_max=numpy.where(v_max>0,v_max*f2,v_max*f1)
+    v_min=numpy.where(v_min==0,-v_max*f3,v_min)
+    v_max=numpy.where(v_max==0,-v_min*f3,v_max)
+    return (v_min<=values)&(values<=v_max)
+
+default_sampler=Curve_Sampler()
+
+def sample_curve(f,g,start,stop,sections=350.0,trafo=None,tolerance=None):
+    """
+    samples curve with the default sampler, see Curve_Sampler.sample
+    """
+    return default_sampler.sample(f,g,start,stop,sections,trafo,tolerance)
+
+def sample_geometry(f,g,start,stop,sections=350.0):
+    """
+    evaluates curve with the default sampler, see Curve_Sampler.sample_geometry
+    """
+    return default_sampler.sample_geometry(f,g,start,stop,sections)
+
+def find_center_value(f,g,start,stop,sections=350.0,trafo=None):
+    """
+    finds center value with the default sampler
+    """
+    return default_sampler.find_center_value(f,g,start,stop,sections,trafo)
+
+def center_value(u_values,x_values,y_values):
+    """
+    value of u at half length of sampled polyline
+    """
+    length=_cumulative_length_(x_values,y_values)
+    if length[-1]<=0.0:
+        return u_values[0]
+    return numpy.interp(length[-1]/2.0,length,u_values)
+
+def _allocate_samples_(x_values,y_values,n_samples):
+    """
+    number of samples for each interval of coarse polyline x,y. Half of
+    the samples are spread evenly, half by the length of intervals.
+    Each interval gets at least one sample.
+    """
+    n_intervals=len(x_values)-1
+    with numpy.errstate(all='ignore'):
+        lengths=numpy.hypot(numpy.diff(x_values),numpy.diff(y_values))
+    lengths[~numpy.isfinite(lengths)]=0.0
+    weights=numpy.ones(n_intervals)/n_intervals
+    if lengths.sum()>0.0:
+        weights=0.5*weights+0.5*lengths/lengths.sum()
+    return numpy.maximum(numpy.rint(weights*n_samples),1).astype(int)
+
+def _simplify_(u_values,x_values,y_values,tolerance,parametric=False):
+    """
+    indices of points that approximate polyline within tolerance
+    (Douglas-Peucker). Error of a point is its distance from the chord of
+    the section or, if parametric, from its linear-in-u place on the chord.
+    """
+    last=len(u_values)-1
+    keep=numpy.zeros(last+1,dtype=bool)
+    keep[0]=keep[last]=True
+    stack=[(0,last)]
+    while stack:
+        first,second=stack.pop()
+        if second-first<2:
+            continue
+        x0,y0=x_values[first],y_values[first]
+        dx,dy=x_values[second]-x0,y_values[second]-y0
+        xs=x_values[first+1:second]-x0
+        ys=y_values[first+1:second]-y0
+        with numpy.errstate(all='ignore'):
+            if parametric:
+                t=(u_values[first+1:second]-u_values[first])/(u_values[second]-u_values[first])
+                error=numpy.hypot(xs-t*dx,ys-t*dy)
+            else:
+                length=numpy.hypot(dx,dy)
+                if length>0.0:
+                    error=numpy.abs(xs*dy-ys*dx)/length
+                else:
+                    error=numpy.hypot(xs,ys)
+        error[~numpy.isfinite(error)]=0.0
+        idx=int(numpy.argmax(error))
+        if error[idx]>tolerance:
+            middle=first+1+idx
+            keep[middle]=True
+            stack.append((first,middle))
+            stack.append((middle,second))
+    return numpy.nonzero(keep)[0]
+
+def sections_from_points(x_values,y_values):
+    """
+    sections (x,y,prev_x,prev_y) of polyline as (N-1) x 4 array
+    """
+    return Polyline(x_values,y_values).give_sections_array()
+
+def _cumulative_length_(x_values,y_values):
+    """
+    cumulative chord length of polyline, starts from 0.0
+    """
+    with numpy.errstate(all='ignore'):
+        chords=numpy.hypot(numpy.diff(x_values),numpy.diff(y_values))
+    chords[~numpy.isfinite(chords)]=0.0
+    return numpy.concatenate(([0.0],numpy.cumsum(chords)))
+
+def evaluate_array(func,u_values):
+    """
+    evaluates func at all u_values. Functions are first called with the whole
+    array. If function does not accept arrays (raises, returns wrong shape or
+    values that differ from scalar calls) it is called value by value.
+    """
+    return _evaluate_array_(func,u_values)[0]
+
+def _evaluate_array_(func,u_values,vectorized=None):
+    """
+    evaluates func at u_values, returns also True if it was vectorized.
+    If vectorized is True, array call is not checked against scalar calls,
+    if False, func is called value by value.
+    """
+    u_values=numpy.asarray(u_values,dtype=float)
+    if len(u_values)>0 and vectorized is not False:
+        try:
+            with numpy.errstate(all='ignore'):
+                values=numpy.asarray(func(u_values),dtype=float)
+            if values.shape==():
+                values=numpy.resize(values,u_values.shape)
+            if values.shape==u_values.shape and \
+               (vectorized or _check_against_scalar_(func,u_values,values)):
+                return values,True
+        except Exception:
+            pass
+    return numpy.array([func(u) for u in u_values],dtype=float),False
+
+def _check_against_scalar_(func,u_values,values):
+    """
+    compares a few array-evaluated values to scalar calls
+    """
+    for idx in set([0,len(u_values)//2,len(u_values)-1]):
+        try:
+            scalar_value=float(func(float(u_values[idx])))
+        except Exception:
+            return False
+        if not numpy.allclose(values[idx],scalar_value,rtol=1e-9,atol=1e-12,equal_nan=True):
+            return False
+    return True
+
+def apply_trafo(trafo,x,y):
+    """
+    applies 3x3 projective transformation matrix to point arrays x,y
+    """
+    if trafo is None:
+        return x,y
+    with numpy.errstate(all='ignore'):
+        denominator=trafo[2][0]*x+trafo[2][1]*y+trafo[2][2]
+        x_t=(trafo[0][0]*x+trafo[0][1]*y+trafo[0][2])/denominator
+        y_t=(trafo[1][0]*x+trafo[1][1]*y+trafo[1][2])/denominator
+    return x_t,y_t
@@ -0,0 +1,416 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of typeset TeX labels.
+
+Label_Cache is a PyX text engine that wraps the default TeX engine. Typeset
+labels are stored on disk keyed by the hash of the TeX engine setup and the
+TeX expression after all text attributes (size, alignment, parbox, ...) are
+applied. Positions, transformations and colors are not part of the key, so
+the same tick label string is typeset only once and reused across axes,
+processes and builds. Labels are saved as JSON data (metrics, glyphs of
+TeX fonts, rules, colors and trafos), labels with other output are kept
+only in memory. With batch=True, labels not found in the cache are
+only collected while the nomogram is built and typeset when the output is
+needed. Each distinct label is then sent once to the running TeX process,
+one label after another as PyX reads the metrics of each label back from
+TeX. Labels of canvases never written (e.g. helper axes) are never
+typeset. Use it as
+
+    c=canvas.canvas()
+    cache=Label_Cache()
+    c.settextengine(cache)
+    ... c.text(...) ...
+    c.writePDFfile(...)
+    cache.flush() # saves new labels after the output is written
+"""
+import os
+import json
+import hashlib
+import pyx
+from pyx import attr, canvas, color, deco, path, style, text, trafo, unit
+from pyx.baseclasses import canvasitem
+from pyx.dvi import texfont
+
+def default_cache_directory():
+    """
+    returns default cache directory: $PYNOMO_LABEL_CACHE or
+    ~/.cache/pynomo/labels
+    """
+    directory=os.environ.get('PYNOMO_LABEL_CACHE')
+    if directory:
+        return directory
+    return os.path.join(os.path.expanduser('~'),'.cache','pynomo','labels')
+
+class Label_Cache(object):
+    """
+    PyX text engine that reuses typeset labels from memory and disk.
+    Keeps statistics of its work in self.stats.
+    """
+    version=2 # bump if format of saved labels changes
+
+    def __init__(self,directory=None,engine=None,batch=False,persistent=True):
+        if directory is None:
+            directory=default_cache_directory()
+        self.directory=directory
+        self.persistent=persistent # if False, labels are kept only in memory
+        self.engine=engine # None = text.defaulttextengine at call time
+        self.labels={} # key -> (metrics,items,markers)
+        self.pending={} # key -> box typeset in this run, not yet saved
+        # if True, labels not in cache are collected and typeset when
+        # output is needed first time (or typeset() is called)
+        self.batch=batch
+        self.requests=[] # collected Deferred_Text objects
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        zeroes statistics
+        """
+        self.stats={'memory_hits':0, # labels found in memory
+                    'disk_hits':0, # labels read from disk
+                    'misses':0, # labels typeset by TeX
+                    'saved':0, # labels written to disk
+                    'unsaved':0, # labels with output that can't be saved
+                    'bypassed':0, # labels not cacheable
+                    'batches':0, # typeset() calls with collected labels
+                    }
+
+    def _give_engine_(self):
+        """
+        returns wrapped engine
+        """
+        if self.engine is None:
+            return text.defaulttextengine
+        return self.engine
+
+    def _give_engine_key_(self,engine):
+        """
+        returns string identifying TeX setup of engine, None if engine
+        is not cacheable
+        """
+        if not isinstance(engine,text.MultiEngine):
+            return None
+        if isinstance(engine.instance,text.UnicodeEngine):
+            return None
+        return repr((self.version,pyx.__version__,engine.cls.__name__,
+                     engine.args,sorted(engine.kwargs.items()),
+                     [expr for expr,texmessages in engine.preambles]))
+
+    def _give_key_(self,engine_key,expr,textattrs):
+        """
+        returns hash key, list of trafos and list of fillstyles. Text
+        attributes are handled as in PyX SingleEngine.text_pt.
+        """
+        textattrs=attr.mergeattrs(textattrs)
+        attr.checkattrs(textattrs,[text.textattr,trafo.trafo_pt,style.fillstyle])
+        trafos=attr.getattrs(textattrs,[trafo.trafo_pt])
+        fillstyles=attr.getattrs(textattrs,[style.fillstyle])
+        textattrs=attr.getattrs(textattrs,[text.textattr])
+        if isinstance(expr,text.MultiEngineText):
+            expr=expr.tex
+        for ta in textattrs[::-1]:
+            expr=ta.apply(expr)
+        key=hashlib.sha256((engine_key+'\n'+expr).encode('utf-8')).hexdigest()
+        return key,trafos,fillstyles
+
+    def _give_filename_(self,key):
+        """
+        returns filename of label
+        """
+        return os.path.join(self.directory,key[:2],key+'.json')
+
+    def _load_(self,key):
+        """
+        returns label from memory or disk, None if not found
+        """
+        if key in self.labels:
+            self.stats['memory_hits']+=1
+            return self.labels[key]
+        if not self.persistent:
+            return None
+        try:
+            with open(self._give_filename_(key)) as f:
+                label=_decode_label_(json.load(f))
+        except Exception:
+            return None
+        self.labels[key]=label
+        self.stats['disk_hits']+=1
+        return label
+
+    def text_pt(self,x_pt,y_pt,expr,textattrs=[],texmessages=[],fontmap=None,singlecharmode=False):
+        """
+        as PyX text_pt. Typesets expr only if not in cache.
+        """
+        engine=self._give_engine_()
+        engine_key=self._give_engine_key_(engine)
+        if engine_key is None or len(texmessages)>0 or fontmap is not None:
+            self.stats['bypassed']+=1
+            return engine.text_pt(x_pt,y_pt,expr,textattrs,texmessages,fontmap,singlecharmode)
+        key,trafos,fillstyles=self._give_key_(engine_key+repr(singlecharmode),
+                                              expr,textattrs)
+        label=self._load_(key)
+        if label is None and self.batch:
+            request=Deferred_Text(self,(x_pt,y_pt,expr,textattrs,fontmap,singlecharmode),
+                                  key,trafos,fillstyles)
+            self.requests.append(request)
+            return request
+        if label is None:
+            return self._typeset_(x_pt,y_pt,expr,textattrs,fontmap,singlecharmode,
+                                  key,trafos,fillstyles)
+        metrics,items,markers=label
+        box=self._make_box_(x_pt,y_pt,metrics,trafos,fontmap,singlecharmode,fillstyles)
+        self._set_page_(box,items,markers)
+        return box
+
+    def _typeset_(self,x_pt,y_pt,expr,textattrs,fontmap,singlecharmode,key,trafos,fillstyles):
+        """
+        typesets label not in cache. Labels already typeset in this run
+        take their output from the first box.
+        """
+        if key in self.pending:
+            first=self.pending[key]
+            self.stats['memory_hits']+=1
+            box=self._make_box_(x_pt,y_pt,self._give_metrics_(first),trafos,
+                                fontmap,singlecharmode,fillstyles)
+            box.do_finish=lambda:self._set_page_(box,first.dvicanvas.items,
+                                                 first.dvicanvas.markers)
+            return box
+        self.stats['misses']+=1
+        box=self._give_engine_().text_pt(x_pt,y_pt,expr,textattrs,[],fontmap,singlecharmode)
+        self.pending[key]=box
+        return box
+
+    def typeset(self):
+        """
+        typesets collected labels, each distinct label once, one after
+        another in the running TeX process
+        """
+        requests=self.requests
+        self.requests=[]
+        for request in requests:
+            request.box=self._typeset_(*request.args,key=request.key,
+                                       trafos=request.trafos,
+                                       fillstyles=request.fillstyles)
+        if len(requests)>0:
+            self.stats['batches']+=1
+
+    def _make_box_(self,x_pt,y_pt,metrics,trafos,fontmap,singlecharmode,fillstyles):
+        """
+        returns text box without output
+        """
+        left_pt,right_pt,height_pt,depth_pt=metrics
+        box=text.textextbox_pt(x_pt,y_pt,left_pt,right_pt,height_pt,depth_pt,
+                               None,fontmap,singlecharmode,fillstyles)
+        for t in trafos:
+            box.reltransform(t) # as in PyX SingleEngine.text_pt
+        return box
+
+    def _set_page_(self,box,items,markers):
+        """
+        sets output of box from typeset items and markers
+        """
+        page=canvas.canvas([box.texttrafo]+box.fillstyles)
+        page.items=list(items)
+        page.markers=dict(markers)
+        box._dvicanvas=page
+
+    def _give_metrics_(self,box):
+        """
+        returns unscaled (left,right,height,depth) in pt of box
+        """
+        scale=unit.scale['x']
+        return (unit.topt(box.left)/scale,unit.topt(box.right)/scale,
+                unit.topt(box.height)/scale,unit.topt(box.depth)/scale)
+
+    def text(self,x,y,*args,**kwargs):
+        """
+        as PyX text
+        """
+        return self.text_pt(unit.topt(x),unit.topt(y),*args,**kwargs)
+
+    def flush(self):
+        """
+        saves labels whose output has been read from TeX. Labels not yet
+        output (no file written) are kept pending.
+        """
+        self.typeset()
+        still_pending={}
+        for key,box in self.pending.items():
+            if box._dvicanvas is None:
+                still_pending[key]=box
+                continue
+            label=(self._give_metrics_(box),
+                   list(box._dvicanvas.items),
+                   dict(box._dvicanvas.markers))
+            self.labels[key]=label
+            if self.persistent:
+                self._save_(key,label)
+        self.pending=still_pending
+
+    def _save_(self,key,label):
+        """
+        writes label atomically to disk
+        """
+        filename=self._give_filename_(key)
+        if os.path.exists(filename):
+            return
+        try:
+            data=_encode_label_(label)
+        except ValueError:
+            self.stats['unsaved']+=1
+            return
+        tmp_filename='%s.%i.tmp'%(filename,os.getpid())
+        try:
+            os.makedirs(os.path.dirname(filename),exist_ok=True)
+            with open(tmp_filename,'w') as f:
+                json.dump(data,f)
+            os.replace(tmp_filename,filename)
+            self.stats['saved']+=1
+        except Exception as e:
+            print("Label_Cache: could not save label to %s (%s)"%(filename,e))
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+# color classes of TeX color specials and their attributes
+_color_attributes={'gray':('g',),'rgb':('r','g','b'),
+                   'hsb':('h','s','b'),'cmyk':('c','m','y','k')}
+_texfonts={} # TeX fonts of loaded labels by (name,checksum,q,d,tfmconv,pyxconv)
+
+def _encode_label_(label):
+    """
+    returns JSON compatible data of label (metrics,items,markers). Raises
+    ValueError if items have output other than glyphs of TeX fonts, rules,
+    colors and trafos.
+    """
+    metrics,items,markers=label
+    return {'version':Label_Cache.version,
+            'metrics':list(metrics),
+            'items':[_encode_item_(item) for item in items],
+            'markers':[[name,unit.topt(x),unit.topt(y)]
+                       for name,(x,y) in markers.items()]}
+
+def _decode_label_(data):
+    """
+    returns label (metrics,items,markers) of data made by _encode_label_
+    """
+    if data['version']!=Label_Cache.version:
+        raise ValueError("label has version %s"%data['version'])
+    markers=dict((name,(x*unit.t_pt,y*unit.t_pt)) for name,x,y in data['markers'])
+    return (tuple(data['metrics']),[_decode_item_(d) for d in data['items']],markers)
+
+def _encode_item_(item):
+    """
+    returns JSON compatible data of item of typeset page
+    """
+    if type(item) is texfont.TeXtext_pt:
+        font=item.font
+        if type(font) is not texfont.TeXfont or item.fontmap is not None:
+            raise ValueError("cannot save text of %r"%font)
+        return {'text':[font.name,font.TFMfile.checksum,font.q,font.d,
+                        font.tfmconv,font.pyxconv,
+                        item.x_pt,item.y_pt,list(item.charcodes)]}
+    if type(item) is deco.decoratedpath:
+        # rule of TeX: filled rectangle without styles
+        p=item.path
+        if (type(p) is not path.rect_pt or item.styles or item.fillstyles!=[]
+            or item.strokestyles is not None or len(item.ornaments.items)>0):
+            raise ValueError("cannot save path %r"%p)
+        return {'rule':[p.pathitems[0].x_pt,p.pathitems[0].y_pt,
+                        p.pathitems[2].x_pt,p.pathitems[2].y_pt]}
+    if type(item) is canvas.canvas:
+        # color, rotation or scaling of TeX specials
+        if item.clip is not None or len(item.layers)>0:
+            raise ValueError("cannot save clipped canvas")
+        styles=[]
+        for s in item.styles:
+            name=type(s).__name__
+            if type(s) is not getattr(color,name,None) or name not in _color_attributes:
+                raise ValueError("cannot save style %r"%s)
+            styles.append([name,[getattr(s,a) for a in _color_attributes[name]]])
+        matrix,vector=item.trafo.matrix,item.trafo.vector
+        return {'canvas':{'trafo':[matrix[0][0],matrix[0][1],matrix[1][0],
+                                   matrix[1][1],vector[0],vector[1]],
+                          'styles':styles,
+                          'items':[_encode_item_(i) for i in item.items]}}
+    raise ValueError("cannot save %r"%item)
+
+def _decode_item_(data):
+    """
+    returns item of typeset page of data made by _encode_item_
+    """
+    if 'text' in data:
+        font_args=tuple(data['text'][:6])
+        x_pt,y_pt,charcodes=data['text'][6:]
+        if font_args not in _texfonts:
+            _texfonts[font_args]=texfont.TeXfont(*font_args)
+        return _texfonts[font_args].text_pt(x_pt,y_pt,charcodes)
+    if 'rule' in data:
+        x0,y0,x1,y1=data['rule']
+        page=canvas.canvas()
+        page.fill(path.rect_pt(x0,y0,x1-x0,y1-y0))
+        return page.items[0]
+    m00,m01,m10,m11,v0,v1=data['canvas']['trafo']
+    attrs=[trafo.trafo_pt(((m00,m01),(m10,m11)),(v0,v1))]
+    for name,values in data['canvas']['styles']:
+        if name not in _color_attributes:
+            raise ValueError("unknown color %s"%name)
+        attrs.append(getattr(color,name)(*values))
+    page=canvas.canvas(attrs)
+    page.items=[_decode_item_(d) for d in data['canvas']['items']]
+    return page
+
+class Deferred_Text(canvasitem):
+    """
+    text collected by Label_Cache in batch mode. Typesets all collected
+    texts when first used, after that acts as the typeset text box.
+    """
+    def __init__(self,cache,args,key,trafos,fillstyles):
+        self.cache=cache
+        self.args=args # (x_pt,y_pt,expr,textattrs,fontmap,singlecharmode)
+        self.key=key
+        self.trafos=trafos
+        self.fillstyles=fillstyles
+        self.box=None
+
+    def _give_box_(self):
+        """
+        returns typeset text box
+        """
+        if self.box is None:
+            self.cache.typeset()
+        return self.box
+
+    def __getattr__(self,name):
+        if name=='box': # not yet set in __init__ (e.g. unpickling)
+            raise AttributeError(name)
+        return getattr(self._give_box_(),name)
+
+    def bbox(self):
+        return self._give_box_().bbox()
+
+    def requiretextregion(self):
+        return self._give_box_().requiretextregion()
+
+    def processPS(self,file,writer,context,registry,bbox):
+        self._give_box_().processPS(file,writer,context,registry,bbox)
+
+    def processPDF(self,file,writer,context,registry,bbox):
+        self._give_box_().processPDF(file,writer,context,registry,bbox)
@@ -23,11 +23,32 @@ from .nomo_grid_box import *
 from .nomo_grid import *
 from .nomograph3 import *
 from .math_utilities import *
+from .nomo_sampler import *
+from .nomo_text_cache import *
+from .nomo_draft_text import *
+from .nomo_geometry import *
 from numpy import *
 import scipy
 from pyx import *
 #from copy import copy
-import copy, re, pprint,random
+import copy, re, pprint
+
+def write_canvas(canvas,filename):
+    """
+    writes canvas to filename or list of filenames. Names ending with .eps
+    are written as EPS, others as PDF.
+    """
+    if isinstance(filename,list):
+        for filename_this in filename:
+            if not re.compile(".eps$").search(filename_this, 1)==None:
+                canvas.writeEPSfile(filename_this)
+            else:
+                canvas.writePDFfile(filename_this)
+    else:
+        if not re.compile(".eps$").search(filename, 1)==None:
+            canvas.writeEPSfile(filename)
+        else:
+            canvas.writePDFfile(filename)
 
 class Nomo_Wrapper:
     """
@@ -163,17 +184,21 @@ class Nomo_Wrapper:
                     else:
                         self.axes_wrapper.add_axis(Axis_Wrapper(atom.give_x,atom.give_y,
                                                                 atom.params['u_min'],
-                                                                atom.params['u_max']))
+                                                                atom.params['u_max'],
+                                                                geometry=atom.give_trafo_geometry()))
                         # add extra axes to the list to find correct transformation
                         for extra_axis in atom.params['extra_params']:
                             self.axes_wrapper.add_axis(Axis_Wrapper(atom.give_x,atom.give_y,
                                                                     extra_axis['u_min'],
-                                                                    extra_axis['u_max']))
+                                                                    extra_axis['u_max'],
+                                                                    geometry=atom.give_trafo_geometry(extra_axis['u_min'],
+                                                                                                      extra_axis['u_max'])))
 
                 else: # this atom is reference axis
                     self.axes_wrapper.add_axis(Axis_Wrapper(atom.give_x_ref,atom.give_y_ref,
                                                             atom.u_min_ref,
-                                                            atom.u_max_ref))
+                                                            atom.u_max_ref,
+                                                            geometry=atom.give_trafo_geometry(reference=True)))
 
 
     def do_transformation(self,method='scale paper',params=None):
@@ -183,6 +208,7 @@ class Nomo_Wrapper:
         try:
             {'scale paper': self._do_scale_to_canvas_trafo_,
              'optimize':self._do_optimize_trafo_,
+             'optimize multistart':self._do_optimize_multistart_trafo_,
              'polygon':self._do_polygon_trafo_,
              'rotate': self._do_rotate_trafo_,
              'matrix': self._do_explicite_matrix_}[method](params)
@@ -203,11 +229,25 @@ class Nomo_Wrapper:
 
     def _do_optimize_trafo_(self,params):
         """
-        Finds "optimal" transformation
+        Finds "optimal" transformation. params may be a dict with keys
+        'method', 'maxiter' and 'max_time', see
+        Axes_Wrapper.optimize_transformation
         """
-        self.axes_wrapper.optimize_transformation()
+        if params is None:
+            params={}
+        self.axes_wrapper.optimize_transformation(**params)
         #self.axes_wrapper._print_result_pdf_("dummy1_optimize.pdf")
 
+    def _do_optimize_multistart_trafo_(self,params):
+        """
+        Finds "optimal" transformation from many initial matrices in
+        parallel. params may be a dict of arguments of
+        Axes_Wrapper.optimize_transformation_multistart
+        """
+        if params is None:
+            params={}
+        self.axes_wrapper.optimize_transformation_multistart(**params)
+
     def _do_polygon_trafo_(self,params):
         """
         Finds "polygon" transformation
@@ -233,23 +273,27 @@ class Nomo_Wrapper:
         draws the nomogram = draws blocks, titles, etc.
         post_func is a function(canvas) to be draws after all
         """
-        for block in self.block_stack:
+        self.draw_geometry(canvas)
+        if post_func is not None:
+            post_func(canvas)
+        write_canvas(canvas,self.filename)
+
+    def draw_geometry(self,canvas):
+        """
+        draws blocks, title and extra texts. Sets roles of items if
+        canvas is a Geometry_Canvas.
+        """
+        geometry=isinstance(canvas,Geometry_Canvas)
+        for idx,block in enumerate(self.block_stack):
+            if geometry:
+                canvas.set_role('block %i'%idx)
             block.draw(canvas)
+        if geometry:
+            canvas.set_role('title')
         self._draw_title_(canvas)
+        if geometry:
+            canvas.set_role('extra_texts')
         self._draw_extra_texts_(canvas)
-        if post_func is not None:
-            post_func(canvas)
-        if isinstance(self.filename,list):
-            for filename_this in self.filename:
-                if not re.compile(".eps$").search(filename_this, 1)==None:
-                    canvas.writeEPSfile(filename_this)
-                else:
-                    canvas.writePDFfile(filename_this)
-        else:
-            if not re.compile(".eps$").search(self.filename, 1)==None:
-                canvas.writeEPSfile(self.filename)
-            else:
-                canvas.writePDFfile(self.filename)
 
     def _draw_title_(self,c):
         """
@@ -363,85 +407,96 @@ class Nomo_Wrapper:
     def align_blocks(self):
         """
         aligns blocks w.r.t. each other according to 'tag' fields
-        in Atom params dictionary
-        """
-#        # translate all blocks initially
-#        for block in self.block_stack:
-#            alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-#            self._return_initial_shift_()
-#            block.add_transformation(alpha1,beta1,gamma1,
-#                                     alpha2,beta2,gamma2,
-#                                     alpha3,beta3,gamma3)
-
-        for idx1,block1 in enumerate(self.block_stack):
-            for idx2,block2 in enumerate(self.block_stack):
-                if idx2>idx1:
-                    for atom1 in block1.atom_stack:
-                        for atom2 in block2.atom_stack:
-                            if atom1.params['tag']==atom2.params['tag']\
-                            and not atom1.params['tag']=='none'\
-                            and block2.aligned==False: # align only once
-                                # let's see if need for double align
-                                double_aligned=False
-                                for atom2d in block2.atom_stack:
-                                    for idx3,dblock3 in enumerate(self.block_stack): # other blocks with potential dtags
-                                        for atom3d in dblock3.atom_stack:
-                                            if atom3d.params['dtag']==atom2d.params['dtag']\
-                                            and not atom3d.params['dtag']=='none'\
-                                            and idx3<=idx1\
-                                            and not idx3==idx2\
-                                            and double_aligned==False: # make sure not block1 or block2 are checked agains block1 dtag
-                                            #and not atom1d.params['tag']==atom1.params['tag']:
-                                            #and not atom2d.params['aligned']: # align only once
-                                                # do first pre-alignment
-    #                                            alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-    #                                            self._find_trafo_2_atoms_(atom1,atom2)
-    #                                            block2.add_transformation(alpha1,beta1,gamma1,
-    #                                                                      alpha2,beta2,gamma2,
-    #                                                                      alpha3,beta3,gamma3)
-                                                # double alignment
-                                                print("Double aligning with tags %s %s"%(atom1.params['tag'],atom3d.params['dtag']))
-    #                                            alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-    #                                            self._find_trafo_4_atoms_3_points_(atom1,atom1d,atom2,atom2d)
-    #                                            block2.add_transformation(alpha1,beta1,gamma1,
-    #                                                                      alpha2,beta2,gamma2,
-    #                                                                      alpha3,beta3,gamma3)
-                                                alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-                                                self._find_trafo_4_atoms_(atom1,atom3d,atom2,atom2d)
-                                                block2.add_transformation(alpha1,beta1,gamma1,
-                                                                          alpha2,beta2,gamma2,
-                                                                          alpha3,beta3,gamma3)
-                                                double_aligned=True
-                                                block2.aligned=True
-    #                                            # DEBUG
-    #                                            u_start_1=min(atom1.params['u_min'],atom1.params['u_max'])
-    #                                            u_stop_1=max(atom1.params['u_min'],atom1.params['u_max'])
-    #                                            u_start_1d=min(atom1d.params['u_min'],atom2.params['u_max'])
-    #                                            u_stop_1d=max(atom1d.params['u_min'],atom2.params['u_max'])
-    #                                            print "test if same:"
-    #                                            print atom1.give_x(u_start_1)
-    #                                            print atom1d.give_x(u_start_1d)
-    #                                            print atom1.give_y(u_start_1)
-    #                                            print atom1d.give_y(u_start_1d)
-    #                                            print atom2.give_x(u_start_1)
-    #                                            print atom2d.give_x(u_start_1d)
-    #                                            print atom2.give_y(u_start_1)
-    #                                            print atom2d.give_y(u_start_1d)
-                                    #print idx2
-                                    #print idx2
-                                if not double_aligned:
-                                    print("Aligning with tag %s"%atom1.params['tag'])
-                                    alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
-                                    self._find_trafo_2_atoms_(atom1,atom2)
-                                    block2.add_transformation(alpha1,beta1,gamma1,
-                                                               alpha2,beta2,gamma2,
-                                                               alpha3,beta3,gamma3)
-                                #atom2.params['aligned']=True # align only once
-                                block2.aligned=True # align only once
+        in Atom params dictionary. Alignments are done as planned by
+        give_alignment_plan, plan is saved to self.alignment_plan.
+        Steps are printed if param 'debug' is True.
+        """
+        self.alignment_plan=self.give_alignment_plan()
+        debug=self.params.get('debug',False)
+        for step in self.alignment_plan:
+            block2=self.block_stack[step['block']]
+            atom2=block2.atom_stack[step['atom']]
+            atom1=self.block_stack[step['to_block']].atom_stack[step['to_atom']]
+            if step['dtag'] is None:
+                if debug:
+                    print("Aligning with tag %s"%step['tag'])
+                alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
+                self._find_trafo_2_atoms_(atom1,atom2)
+            else:
+                # double alignment
+                if debug:
+                    print("Double aligning with tags %s %s"%(step['tag'],step['dtag']))
+                atom2d=block2.atom_stack[step['d_atom']]
+                atom3d=self.block_stack[step['d_to_block']].atom_stack[step['d_to_atom']]
+                alpha1,beta1,gamma1,alpha2,beta2,gamma2,alpha3,beta3,gamma3=\
+                self._find_trafo_4_atoms_(atom1,atom3d,atom2,atom2d)
+            block2.add_transformation(alpha1,beta1,gamma1,
+                                      alpha2,beta2,gamma2,
+                                      alpha3,beta3,gamma3)
+            block2.aligned=True # align only once
         # let's make identity matrix that will be changed when optimized
         for block in self.block_stack:
             block.add_transformation()
 
+    def _give_tag_index_(self,key):
+        """
+        returns dict tag -> list of (block index,atom index) of atoms
+        with params[key] (key is 'tag' or 'dtag') in stacking order
+        """
+        index={}
+        for block_idx,block in enumerate(self.block_stack):
+            for atom_idx,atom in enumerate(block.atom_stack):
+                tag=atom.params[key]
+                if not tag=='none':
+                    index.setdefault(tag,[]).append((block_idx,atom_idx))
+        return index
+
+    def give_alignment_plan(self):
+        """
+        returns list of alignments in the order they are done. Each is a
+        dict: block 'block' is aligned with its atom 'atom' to atom
+        'to_atom' of block 'to_block' having the same 'tag'. If 'dtag' is
+        not None, alignment is double: also atom 'd_atom' is aligned to
+        atom 'd_to_atom' of block 'd_to_block' having the same dtag.
+        A block is aligned to the first earlier block sharing a tag with
+        it, double alignment uses the first atom with dtag found in the
+        same or an earlier block.
+        """
+        tag_index=self._give_tag_index_('tag')
+        dtag_index=self._give_tag_index_('dtag')
+        plan=[]
+        for block_idx,block in enumerate(self.block_stack):
+            if block.aligned:
+                continue
+            # first (block,atom) of earlier blocks with tag of this block
+            best=None
+            for atom_idx,atom in enumerate(block.atom_stack):
+                tag=atom.params['tag']
+                for to_block,to_atom in tag_index.get(tag,[]):
+                    if to_block>=block_idx:
+                        break
+                    if best is None or (to_block,to_atom)<best[:2]:
+                        best=(to_block,to_atom,atom_idx,tag)
+                    break
+            if best is None:
+                continue
+            to_block,to_atom,atom_idx,tag=best
+            step={'block':block_idx,'atom':atom_idx,'to_block':to_block,
+                  'to_atom':to_atom,'tag':tag,'dtag':None}
+            # double alignment with dtag of block in or before to_block
+            for d_atom,atom in enumerate(block.atom_stack):
+                dtag=atom.params['dtag']
+                found=[(d_block,d_to_atom) for d_block,d_to_atom in dtag_index.get(dtag,[])
+                       if d_block<=to_block]
+                if len(found)>0:
+                    step.update({'dtag':dtag,'d_atom':d_atom,'d_to_block':found[0][0],
+                                 'd_to_atom':found[0][1]})
+                    break
+            plan.append(step)
+        # done in order of earlier blocks as blocks are aligned to them
+        plan.sort(key=lambda step:(step['to_block'],step['block']))
+        return plan
+
     def _find_trafo_4_atoms_3_points_(self,atom1a,atom1b,atom2a,atom2b):
         """
         transforms two points from one atom (scale) and one point from other atom (scale)
@@ -648,10 +703,12 @@ class Nomo_Block(object):
     class to hold separate nomograph blocks connected by a single line in
     order to build the whole nomograph consisting of multiple blocks
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
         """
-        if mirror=True the transformation wrt to other blocks is mirrored
+        if mirror=True the transformation wrt to other blocks is mirrored.
+        sampling_tolerance (cm) is given to atoms for adaptive lines
         """
+        self.sampling_tolerance=sampling_tolerance
         #self.super.__init__()
         if mirror_x==True: # if make mirror w.r.t x-axis
             self.x_mirror=-1.0
@@ -669,7 +726,7 @@ class Nomo_Block(object):
         """
         # initial transformation
         self.atom_stack=[] # atoms
-        self.trafo_stack=[] # stack for transformation matrices for block
+        self.trafo_stack=Trafo_Stack() # stack for transformation matrices for block
         self.axis_wrapper_stack=[] # stack of Axis_Wrapper objects in order to calculate
                                    # general block parameters like highest point, etc.
         self.ref_block_texts=[] # handle for additional texts in block
@@ -684,6 +741,8 @@ class Nomo_Block(object):
         adds atom to the block
         """
         self.atom_stack.append(atom)
+        atom.share_trafo(self.trafo_stack.matrix)
+        atom.sampling_tolerance=self.sampling_tolerance
 
     def add_transformation(self,alpha1=1.0,beta1=0.0,gamma1=0.0,
                              alpha2=0.0,beta2=1.0,gamma2=0.0,
@@ -708,8 +767,7 @@ class Nomo_Block(object):
         trafo_mat = array([[alpha1,beta1,gamma1],
                           [alpha2,beta2,gamma2],
                           [alpha3,beta3,gamma3]])
-        self.trafo_stack.pop() # last away
-        self.trafo_stack.append(trafo_mat)
+        self.trafo_stack.change_last(trafo_mat) # only tail is recomposed
         self._calculate_total_trafo_mat_() # update coeffs (also in atoms)
 
     def _give_trafo_x_(self,x,y):
@@ -731,11 +789,7 @@ class Nomo_Block(object):
         calculates total transformation matrix and
         master coeffs self.alpha1,self.beta1,...
         """
-        stack_copy=copy.copy(self.trafo_stack)
-        stack_copy.reverse()
-        trafo_mat=stack_copy.pop()
-        for matrix in stack_copy:
-            trafo_mat=dot(trafo_mat,matrix) # matrix multiplication
+        trafo_mat=self.trafo_stack.matrix
         self.alpha1=trafo_mat[0][0]
         self.beta1=trafo_mat[0][1]
         self.gamma1=trafo_mat[0][2]
@@ -749,12 +803,12 @@ class Nomo_Block(object):
 
     def _set_trafo_to_atoms(self):
         """
-        sets overall transformation to all atoms
+        sets overall transformation to all atoms. Atoms share the
+        total matrix of trafo_stack, so this only relinks them.
         """
         for atom in self.atom_stack:
-            atom.set_trafo(alpha1=self.alpha1,beta1=self.beta1,gamma1=self.gamma1,
-                           alpha2=self.alpha2,beta2=self.beta2,gamma2=self.gamma2,
-                           alpha3=self.alpha3,beta3=self.beta3,gamma3=self.gamma3)
+            if atom.trafo_matrix is not self.trafo_stack.matrix:
+                atom.share_trafo(self.trafo_stack.matrix)
 
     def draw(self,canvas):
         """
@@ -815,11 +869,13 @@ class Nomo_Block(object):
             if not atom.params['reference']==True:
                 self.axes_wrapper.add_axis(Axis_Wrapper(atom.give_x,atom.give_y,
                                                         atom.params['u_min'],
-                                                        atom.params['u_max']))
+                                                        atom.params['u_max'],
+                                                        geometry=atom.give_trafo_geometry()))
             else: # this atom is reference axis = pivot line
                 self.axes_wrapper.add_axis(Axis_Wrapper(atom.give_x_ref,atom.give_y_ref,
                                                         atom.u_min_ref,
-                                                        atom.u_max_ref))
+                                                        atom.u_max_ref,
+                                                        geometry=atom.give_trafo_geometry(reference=True)))
     def _scale_to_box_(self):
         """
         adds transformation to scale to box. To be used to scale to paper
@@ -836,8 +892,9 @@ class Nomo_Block_Type_1(Nomo_Block):
     """
     type F1+F2+F3=0
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_1,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_1,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
 
     def define_F1(self,params):
@@ -934,16 +991,19 @@ class Nomo_Block_Type_1(Nomo_Block):
 
         self.F1_axis=Axis_Wrapper(f=self.atom_F1.f,g=self.atom_F1.g,
                              start=self.atom_F1.params['u_min'],
-                             stop=self.atom_F1.params['u_max'])
+                             stop=self.atom_F1.params['u_max'],
+                             geometry=self.atom_F1.give_geometry())
         self.axis_wrapper_stack.append(self.F1_axis)
         self.F2_axis=Axis_Wrapper(f=self.atom_F2.f,g=self.atom_F2.g,
                              start=self.atom_F2.params['u_min'],
-                             stop=self.atom_F2.params['u_max'])
+                             stop=self.atom_F2.params['u_max'],
+                             geometry=self.atom_F2.give_geometry())
         self.axis_wrapper_stack.append(self.F2_axis)
 
         self.F3_axis=Axis_Wrapper(f=self.atom_F3.f,g=self.atom_F3.g,
                              start=self.atom_F3.params['u_min'],
-                             stop=self.atom_F3.params['u_max'])
+                             stop=self.atom_F3.params['u_max'],
+                             geometry=self.atom_F3.give_geometry())
         self.axis_wrapper_stack.append(self.F3_axis)
         self.set_reference_axes()
 
@@ -952,8 +1012,9 @@ class Nomo_Block_Type_2(Nomo_Block):
     """
     type F1=F2*F3
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_2,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_2,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_F1(self,params):
         """
@@ -1070,8 +1131,9 @@ class Nomo_Block_Type_3(Nomo_Block):
     """
     type F1+F2+...+FN=0 parallel line nomogram
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_3,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_3,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
         self.F_stack=[] # stack of function definitions
         self.shift_stack=[]
         self.N=0 # number of lines
@@ -1107,7 +1169,8 @@ class Nomo_Block_Type_3(Nomo_Block):
             self.add_atom(temp_atom)
             temp_axis=Axis_Wrapper(f=temp_atom.f,g=temp_atom.g,
                              start=temp_atom.params['u_min'],
-                             stop=temp_atom.params['u_max'])
+                             stop=temp_atom.params['u_max'],
+                             geometry=temp_atom.give_geometry())
             self.axis_wrapper_stack.append(temp_axis)
         # let's make reference axis atoms
         for ref_para in self.ref_params:
@@ -1266,8 +1329,9 @@ class Nomo_Block_Type_4(Nomo_Block):
     """
     type F1/F2=F3/F4
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_4,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_4,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_F1(self,params):
         """
@@ -1414,15 +1478,17 @@ class Nomo_Block_Type_5(Nomo_Block):
 
     Constructing this needs paper and pencil...
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_5,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_5,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_block(self,params):
         """
         defines the block. Dict params has all the definitions
         """
         self.params=params
-        self.grid_box=Nomo_Grid_Box(params=params)
+        self.grid_box=Nomo_Grid_Box(params=params,
+                                    sampling_tolerance=self.sampling_tolerance)
 
     def set_block(self):
         """
@@ -1740,8 +1806,9 @@ class Nomo_Block_Type_6(Nomo_Block):
     """
     type F1 <-> F2 Ladder
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_6,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_6,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define(self,params1,params2):
         """
@@ -1810,11 +1877,13 @@ class Nomo_Block_Type_6(Nomo_Block):
 
         self.F1_axis=Axis_Wrapper(f=self.atom_F1.f,g=self.atom_F1.g,
                              start=self.atom_F1.params['u_min'],
-                             stop=self.atom_F1.params['u_max'])
+                             stop=self.atom_F1.params['u_max'],
+                             geometry=self.atom_F1.give_geometry())
         self.axis_wrapper_stack.append(self.F1_axis)
         self.F2_axis=Axis_Wrapper(f=self.atom_F2.f,g=self.atom_F2.g,
                              start=self.atom_F2.params['u_min'],
-                             stop=self.atom_F2.params['u_max'])
+                             stop=self.atom_F2.params['u_max'],
+                             geometry=self.atom_F2.give_geometry())
         self.axis_wrapper_stack.append(self.F2_axis)
         self.set_reference_axes()
 
@@ -1844,6 +1913,9 @@ class Nomo_Block_Type_6(Nomo_Block):
         stop=self.atom_F1.params['u_max']
         side1=self.atom_F1.params['tick_side']
         side2=self.atom_F2.params['tick_side']
+        # positions and directions of both scales are evaluated once
+        layout_1=Tick_Layout(f1,g1,start,stop)
+        layout_2=Tick_Layout(f2,g2,start,stop)
 
         # Linear
         if self.atom_F1.params['scale_type']=='linear':
@@ -1851,21 +1923,23 @@ class Nomo_Block_Type_6(Nomo_Block):
             find_linear_ticks(start,stop)
 
             dx_units_0_1,dy_units_0_1,angles_0_1=\
-            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_0_list,side1)
 
             dx_units_0_2,dy_units_0_2,angles_0_2=\
-            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_0_list,side2)
 
             dx_units_1_1,dy_units_1_1,angles_1_1=\
-            find_tick_directions(tick_1_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_1_list,side1)
 
             dx_units_1_2,dy_units_1_2,angles_1_2=\
-            find_tick_directions(tick_1_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_1_list,side2)
 
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
             self._draw_ladder_lines_(dx_units_1_1,dy_units_1_1,dx_units_1_2,dy_units_1_2,
-                                     tick_1_list,f1,g1,f2,g2,canvas_given,style.linestyle.dotted)
+                                     tick_1_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.dotted)
 
         # Linear smart
         if self.atom_F1.params['scale_type']=='linear smart':
@@ -1875,36 +1949,40 @@ class Nomo_Block_Type_6(Nomo_Block):
                                     base_start=self.atom_F1.params['base_start'],
                                     base_stop=self.atom_F1.params['base_stop'],
                                     scale_max_0=self.atom_F1.params['scale_max'],
-                                    distance_limit=self.atom_F1.params['tick_distance_smart'])
+                                    distance_limit=self.atom_F1.params['tick_distance_smart'],
+                                    layout=layout_1)
 
 #            tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list,start_ax,stop_ax=\
 #            find_linear_ticks(start,stop)
 
-            dx_units_0_1,dy_units_0_1,angles_0_1=find_tick_directions(tick_0_list,f1,g1,side1,start,stop,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
+            dx_units_0_1,dy_units_0_1,angles_0_1=layout_1.give_directions(tick_0_list,side1,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
 #            dx_units_0_1,dy_units_0_1,angles_0_1=\
 #            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
 
-            dx_units_0_2,dy_units_0_2,angles_0_2=find_tick_directions(tick_0_list,f2,g2,side2,start,stop,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
+            dx_units_0_2,dy_units_0_2,angles_0_2=layout_2.give_directions(tick_0_list,side2,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
 #            dx_units_0_2,dy_units_0_2,angles_0_2=\
 #            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
 #
-            dx_units_1_1,dy_units_1_1,angles_1_1=find_tick_directions(tick_1_list,f1,g1,side1,start,stop,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
+            dx_units_1_1,dy_units_1_1,angles_1_1=layout_1.give_directions(tick_1_list,side1,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
 
 #            dx_units_1_1,dy_units_1_1,angles_1_1=\
 #            find_tick_directions(tick_1_list,f1,g1,side1,start,stop)
 #
-            dx_units_1_2,dy_units_1_2,angles_1_2=find_tick_directions(tick_1_list,f2,g2,side2,start,stop,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
+            dx_units_1_2,dy_units_1_2,angles_1_2=layout_2.give_directions(tick_1_list,side2,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
 #            dx_units_1_2,dy_units_1_2,angles_1_2=\
 #            find_tick_directions(tick_1_list,f2,g2,side2,start,stop)
 
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
             self._draw_ladder_lines_(dx_units_1_1,dy_units_1_1,dx_units_1_2,dy_units_1_2,
-                                     tick_1_list,f1,g1,f2,g2,canvas_given,style.linestyle.dotted)
+                                     tick_1_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.dotted)
 
         # log smart
         if self.atom_F1.params['scale_type']=='log smart':
-            c=canvas.canvas()
+            # texts of dummy axis are only collected, never typeset
+            c=canvas.canvas(textengine=Label_Cache(batch=True,persistent=False))
             dummy_axis=Nomo_Axis(f1,g1,start,stop,turn=1,title='',canvas=c,type='log smart',
                  text_style='normal',title_x_shift=0,title_y_shift=0.25,
                  tick_levels=4,tick_text_levels=3,
@@ -1912,42 +1990,42 @@ class Nomo_Block_Type_6(Nomo_Block):
                  manual_axis_data={},
                  axis_appear=self.atom_F1.params,side=self.atom_F1.params['tick_side'],
                  base_start=self.atom_F1.params['base_start'],
-                 base_stop=self.atom_F1.params['base_stop'])
+                 base_stop=self.atom_F1.params['base_stop'],
+                 sampling_tolerance=self.sampling_tolerance)
             tick_0_list=dummy_axis.tick_0_list
             tick_1_list=dummy_axis.tick_1_list
             tick_2_list=dummy_axis.tick_2_list
             tick_3_list=dummy_axis.tick_3_list
             tick_4_list=dummy_axis.tick_4_list
-            find_linear_ticks_smart(start,stop,f1,g1,turn=1,
-                                    base_start=self.atom_F1.params['base_start'],
-                                    base_stop=self.atom_F1.params['base_stop'],
-                                    scale_max_0=self.atom_F1.params['scale_max'],
-                                    distance_limit=self.atom_F1.params['tick_distance_smart'])
+            if start<=stop: # same orientation as in dummy_axis
+                layout_1=dummy_axis.tick_layout
 
 #            tick_0_list,tick_1_list,tick_2_list,tick_3_list,tick_4_list,start_ax,stop_ax=\
 #            find_linear_ticks(start,stop)
 
-            dx_units_0_1,dy_units_0_1,angles_0_1=find_tick_directions(tick_0_list,f1,g1,side1,start,stop,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
+            dx_units_0_1,dy_units_0_1,angles_0_1=layout_1.give_directions(tick_0_list,side1,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
 #            dx_units_0_1,dy_units_0_1,angles_0_1=\
 #            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
 
-            dx_units_0_2,dy_units_0_2,angles_0_2=find_tick_directions(tick_0_list,f2,g2,side2,start,stop,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
+            dx_units_0_2,dy_units_0_2,angles_0_2=layout_2.give_directions(tick_0_list,side2,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
 #            dx_units_0_2,dy_units_0_2,angles_0_2=\
 #            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
 #
-            dx_units_1_1,dy_units_1_1,angles_1_1=find_tick_directions(tick_1_list,f1,g1,side1,start,stop,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
+            dx_units_1_1,dy_units_1_1,angles_1_1=layout_1.give_directions(tick_1_list,side1,full_angle=self.atom_F1.params['full_angle'],extra_angle=self.atom_F1.params['extra_angle'],turn_relative=self.atom_F1.params['turn_relative'])
 
 #            dx_units_1_1,dy_units_1_1,angles_1_1=\
 #            find_tick_directions(tick_1_list,f1,g1,side1,start,stop)
 #
-            dx_units_1_2,dy_units_1_2,angles_1_2=find_tick_directions(tick_1_list,f2,g2,side2,start,stop,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
+            dx_units_1_2,dy_units_1_2,angles_1_2=layout_2.give_directions(tick_1_list,side2,full_angle=self.atom_F2.params['full_angle'],extra_angle=self.atom_F2.params['extra_angle'],turn_relative=self.atom_F2.params['turn_relative'])
 #            dx_units_1_2,dy_units_1_2,angles_1_2=\
 #            find_tick_directions(tick_1_list,f2,g2,side2,start,stop)
 
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
             self._draw_ladder_lines_(dx_units_1_1,dy_units_1_1,dx_units_1_2,dy_units_1_2,
-                                     tick_1_list,f1,g1,f2,g2,canvas_given,style.linestyle.dotted)
+                                     tick_1_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.dotted)
 
         # log
         if self.atom_F1.params['scale_type']=='log':
@@ -1955,20 +2033,22 @@ class Nomo_Block_Type_6(Nomo_Block):
             find_log_ticks(start,stop)
 
             dx_units_0_1,dy_units_0_1,angles_0_1=\
-            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_0_list,side1)
 
             dx_units_0_2,dy_units_0_2,angles_0_2=\
-            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_0_list,side2)
 
             dx_units_1_1,dy_units_1_1,angles_1_1=\
-            find_tick_directions(tick_1_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_1_list,side1)
 
             dx_units_1_2,dy_units_1_2,angles_1_2=\
-            find_tick_directions(tick_1_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_1_list,side2)
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
             self._draw_ladder_lines_(dx_units_1_1,dy_units_1_1,dx_units_1_2,dy_units_1_2,
-                                     tick_1_list,f1,g1,f2,g2,canvas_given,style.linestyle.dotted)
+                                     tick_1_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.dotted)
 
         # manual point or manual arrow
         if self.atom_F1.params['scale_type']=='manual point' or\
@@ -1977,13 +2057,14 @@ class Nomo_Block_Type_6(Nomo_Block):
             tick_0_list.sort()
 
             dx_units_0_1,dy_units_0_1,angles_0_1=\
-            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_0_list,side1)
 
             dx_units_0_2,dy_units_0_2,angles_0_2=\
-            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_0_list,side2)
 
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
 
         # manual line
         if self.atom_F1.params['scale_type']=='manual line':
@@ -1991,13 +2072,14 @@ class Nomo_Block_Type_6(Nomo_Block):
             tick_0_list.sort()
 
             dx_units_0_1,dy_units_0_1,angles_0_1=\
-            find_tick_directions(tick_0_list,f1,g1,side1,start,stop)
+            layout_1.give_directions(tick_0_list,side1)
 
             dx_units_0_2,dy_units_0_2,angles_0_2=\
-            find_tick_directions(tick_0_list,f2,g2,side2,start,stop)
+            layout_2.give_directions(tick_0_list,side2)
 
             self._draw_ladder_lines_(dx_units_0_1,dy_units_0_1,dx_units_0_2,dy_units_0_2,
-                                     tick_0_list,f1,g1,f2,g2,canvas_given,style.linestyle.solid)
+                                     tick_0_list,layout_1.give_x,layout_1.give_y,
+                                     layout_2.give_x,layout_2.give_y,canvas_given,style.linestyle.solid)
 
     def _draw_ladder_lines_(self,dx_units_1,dy_units_1,dx_units_2,dy_units_2,
                             tick_list,f1,g1,f2,g2,canvas,line_style):
@@ -2024,8 +2106,9 @@ class Nomo_Block_Type_7(Nomo_Block):
     """
     type 1/f1+1/f2=1/f3 angle nomogram
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_7,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_7,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_F1(self,params):
         """
@@ -2109,8 +2192,9 @@ class Nomo_Block_Type_8(Nomo_Block):
     """
     type F single
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_8,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_8,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
 
     def define_F(self,params):
@@ -2144,8 +2228,9 @@ class Nomo_Block_Type_9_old(Nomo_Block):
     """
     type determinant and 3 line axes (no grid)
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_9_old,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_9_old,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_determinant(self,params1,params2,params3,transform_ini=False):
         """
@@ -2280,16 +2365,19 @@ class Nomo_Block_Type_9_old(Nomo_Block):
         # save axes for reference calculations
         self.F1_axis=Axis_Wrapper(f=self.atom_F1.f,g=self.atom_F1.g,
                              start=self.atom_F1.params['u_min'],
-                             stop=self.atom_F1.params['u_max'])
+                             stop=self.atom_F1.params['u_max'],
+                             geometry=self.atom_F1.give_geometry())
         self.axis_wrapper_stack.append(self.F1_axis)
         self.F2_axis=Axis_Wrapper(f=self.atom_F2.f,g=self.atom_F2.g,
                              start=self.atom_F2.params['u_min'],
-                             stop=self.atom_F2.params['u_max'])
+                             stop=self.atom_F2.params['u_max'],
+                             geometry=self.atom_F2.give_geometry())
         self.axis_wrapper_stack.append(self.F2_axis)
 
         self.F3_axis=Axis_Wrapper(f=self.atom_F3.f,g=self.atom_F3.g,
                              start=self.atom_F3.params['u_min'],
-                             stop=self.atom_F3.params['u_max'])
+                             stop=self.atom_F3.params['u_max'],
+                             geometry=self.atom_F3.give_geometry())
         self.axis_wrapper_stack.append(self.F3_axis)
         self.set_reference_axes()
 
@@ -2298,8 +2386,9 @@ class Nomo_Block_Type_9(Nomo_Block):
     type determinant and 3 line axes or grids
     to override type 9
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_9,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_9,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_determinant(self,params1,params2,params3,transform_ini=False):
         """
@@ -2550,17 +2639,20 @@ class Nomo_Block_Type_9(Nomo_Block):
         if self.params1['grid']==False:
             self.F1_axis=Axis_Wrapper(f=self.atom_F1.f,g=self.atom_F1.g,
                                  start=self.atom_F1.params['u_min'],
-                                 stop=self.atom_F1.params['u_max'])
+                                 stop=self.atom_F1.params['u_max'],
+                                 geometry=self.atom_F1.give_geometry())
             self.axis_wrapper_stack.append(self.F1_axis)
         if self.params2['grid']==False:
             self.F2_axis=Axis_Wrapper(f=self.atom_F2.f,g=self.atom_F2.g,
                                  start=self.atom_F2.params['u_min'],
-                                 stop=self.atom_F2.params['u_max'])
+                                 stop=self.atom_F2.params['u_max'],
+                                 geometry=self.atom_F2.give_geometry())
             self.axis_wrapper_stack.append(self.F2_axis)
         if self.params3['grid']==False:
             self.F3_axis=Axis_Wrapper(f=self.atom_F3.f,g=self.atom_F3.g,
                                  start=self.atom_F3.params['u_min'],
-                                 stop=self.atom_F3.params['u_max'])
+                                 stop=self.atom_F3.params['u_max'],
+                                 geometry=self.atom_F3.give_geometry())
             self.axis_wrapper_stack.append(self.F3_axis)
         self.set_reference_axes()
 
@@ -2569,8 +2661,9 @@ class Nomo_Block_Type_10(Nomo_Block):
     type F1(u)+F2(v)*F3(w)+F4(w)=0
     Levens: Chapter 10
     """
-    def __init__(self,mirror_x=False,mirror_y=False):
-        super(Nomo_Block_Type_10,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y)
+    def __init__(self,mirror_x=False,mirror_y=False,sampling_tolerance=None):
+        super(Nomo_Block_Type_10,self).__init__(mirror_x=mirror_x,mirror_y=mirror_y,
+                                 sampling_tolerance=sampling_tolerance)
 
     def define_F1(self,params):
         """
@@ -2691,6 +2784,7 @@ class Nomo_Atom:
             }
         self.params=self.params_default
         self.params.update(params)
+        self.given_params=params # for refreshing params from build cache
         # let's make default values for extra params
         for idx,iter_params in enumerate(self.params['extra_params']):
             for key in self.params_default:
@@ -2701,125 +2795,131 @@ class Nomo_Atom:
         self.g = self.params['G'] # y-coord func
         self.f_ref = self.params['F'] # x-coord func for reflection axis
         self.g_ref = self.params['G'] # y-coord func for reflection axis
+        self.geometry_cache={} # sampled raw curves by (start,stop,reference)
+        self.sampling_tolerance=None # max error (cm) of lines, set by block
 
     def calc_line_and_sections(self):
         """
         calculates line and sections
         """
-        self.line=[]
-        self.value_list=[] # list of values corresponding to points
-        if self.params['reference']==False:
-            start=self.params['u_min']
-            stop=self.params['u_max']
-            f=self.give_x
-            g=self.give_y
+        # transformation is applied to cached samples of F and G
+        geometry=self.give_geometry(reference=self.params['reference'])
+        u_values,x_values,y_values=\
+            geometry.transformed(self.give_trafo_mat()).give_polyline(sections=1000.0,
+                                                                      tolerance=self.sampling_tolerance,
+                                                                      parametric=True)
+        if u_values[0]>u_values[-1]:
+            u_values,x_values,y_values=u_values[::-1],x_values[::-1],y_values[::-1]
+        # arrays of points and values, lists are made only if asked
+        self.polyline=Polyline(x_values,y_values,u_values)
+
+    # list views of the polyline calculated by calc_line_and_sections
+    line=property(lambda self:self.polyline.give_line(),
+                  doc="list of points (x,y)")
+    value_list=property(lambda self:self.polyline.give_value_list(),
+                        doc="list of values corresponding to points")
+    sections=property(lambda self:self.polyline.give_sections(),
+                      doc="list of sections (x,y,prev_x,prev_y)")
+    section_values=property(lambda self:self.polyline.give_section_values(),
+                            doc="list of section values [u,prev_u]")
+
+    def give_geometry(self,start=None,stop=None,reference=False):
+        """
+        gives Curve_Geometry of raw (untransformed) F and G (f_ref and g_ref
+        if reference). Curves are evaluated once and cached while functions
+        stay the same.
+        """
+        if reference:
+            f,g=self.f_ref,self.g_ref
+            if start is None:
+                start,stop=self.u_min_ref,self.u_max_ref
         else:
-            start=self.u_min_ref
-            stop=self.u_max_ref
-            f=self.give_x_ref
-            g=self.give_y_ref
-        if start>stop:
-            start,stop=stop,start
-        du=math.fabs(stop-start)*1e-6
-        # approximate line length is found
-        line_length_straigth=math.sqrt((f(start)-f(stop))**2+(g(start)-g(stop))**2)
-        random.seed(0.0) # so that mistakes always the same
-        for dummy in range(100): # for case if start = stop
-            first=random.uniform(start,stop)
-            second=random.uniform(start,stop)
-            temp=math.sqrt((f(first)-f(second))**2+(g(first)-g(second))**2)
-            if temp>line_length_straigth:
-                line_length_straigth=temp
-                #print "length: %f"%line_length_straigth
-        sections=1000.0 # about number of sections
-        section_length=line_length_straigth/sections
-        u=start
-        laskuri=1
-        self.line.append((f(start), g(start)))
-        self.value_list.append(start)
-        #print "start: %g"%(start)
-        #print "stop: %g"%(stop)
-        #print "du: %g"%(du)
-        while True:
-            if u<stop:
-                self.line.append((f(u), g(u)))
-                self.value_list.append(u)
-                dx=(f(u+du)-f(u))
-                dy=(g(u+du)-g(u))
-                dl=math.sqrt(dx**2+dy**2)
-                if dl>0:
-                    delta_u=du*section_length/dl
-                else:
-                    delta_u=du
-                # in order to avoid too slow derivatives
-                if math.fabs(stop-start)<(delta_u*100.0):
-                    delta_u=math.fabs(stop-start)/500.0
-                u+=delta_u
+            f,g=self.f,self.g
+            if start is None:
+                start,stop=self.params['u_min'],self.params['u_max']
+        key=(start,stop,reference)
+        geometry=self.geometry_cache.get(key)
+        if geometry is None or not geometry.is_for(f,g,start,stop):
+            geometry=sample_geometry(f,g,start,stop,sections=1000.0)
+            self.geometry_cache[key]=geometry
+        return geometry
 
-            else:
-                self.line.append((f(stop), g(stop)))
-                self.value_list.append(stop)
-                break
-        # calculate sections
-        sections=[]
-        section_values=[]
-        for index,(x,y) in enumerate(self.line):
-            if index>0:
-                sections.append((x,y,prev_x,prev_y))
-                section_values.append([self.value_list[index],
-                                       self.value_list[index-1]])
-            prev_x=x
-            prev_y=y
-        self.sections=sections
-        self.section_values=section_values
+    def give_trafo_geometry(self,start=None,stop=None,reference=False):
+        """
+        gives Curve_Geometry with current transformation applied
+        """
+        return self.give_geometry(start,stop,reference).transformed(self.give_trafo_mat())
 
     def set_trafo(self,alpha1=1.0,beta1=0.0,gamma1=0.0,
                            alpha2=0.0,beta2=1.0,gamma2=0.0,
                            alpha3=0.0,beta3=0.0,gamma3=1.0):
         """
-        sets the transformation for x,y points to be applied
+        sets the transformation for x,y points to be applied. Atom gets
+        its own matrix, see share_trafo.
+        """
+        self.trafo_matrix=array([[alpha1,beta1,gamma1],
+                                 [alpha2,beta2,gamma2],
+                                 [alpha3,beta3,gamma3]],dtype=float)
+
+    def share_trafo(self,trafo_matrix):
+        """
+        uses 3x3 array trafo_matrix (updated in place by the owner, e.g.
+        Trafo_Stack of block) as transformation
+        """
+        self.trafo_matrix=trafo_matrix
+
+    # transformation coeffs are read from the (shared) matrix
+    alpha1=property(lambda self:self.trafo_matrix[0,0])
+    beta1=property(lambda self:self.trafo_matrix[0,1])
+    gamma1=property(lambda self:self.trafo_matrix[0,2])
+    alpha2=property(lambda self:self.trafo_matrix[1,0])
+    beta2=property(lambda self:self.trafo_matrix[1,1])
+    gamma2=property(lambda self:self.trafo_matrix[1,2])
+    alpha3=property(lambda self:self.trafo_matrix[2,0])
+    beta3=property(lambda self:self.trafo_matrix[2,1])
+    gamma3=property(lambda self:self.trafo_matrix[2,2])
+
+    def give_trafo_mat(self):
+        """
+        returns the transformation as 3x3 matrix (copy)
         """
-        self.alpha1=alpha1
-        self.beta1=beta1
-        self.gamma1=gamma1
-        self.alpha2=alpha2
-        self.beta2=beta2
-        self.gamma2=gamma2
-        self.alpha3=alpha3
-        self.beta3=beta3
-        self.gamma3=gamma3
+        return self.trafo_matrix.copy()
 
     def give_x(self,u):
         """
         x-function
         """
-        value=(self.alpha1*self.f(u)+self.beta1*self.g(u)+self.gamma1)/\
-        (self.alpha3*self.f(u)+self.beta3*self.g(u)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u)
+        y=self.g(u)
+        return (m[0,0]*x+m[0,1]*y+m[0,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_y(self,u):
         """
         y-function
         """
-        value=(self.alpha2*self.f(u)+self.beta2*self.g(u)+self.gamma2)/\
-        (self.alpha3*self.f(u)+self.beta3*self.g(u)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u)
+        y=self.g(u)
+        return (m[1,0]*x+m[1,1]*y+m[1,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_x_ref(self,u):
         """
         x-function for reflection axis
         """
-        value=(self.alpha1*self.f_ref(u)+self.beta1*self.g_ref(u)+self.gamma1)/\
-        (self.alpha3*self.f_ref(u)+self.beta3*self.g_ref(u)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f_ref(u)
+        y=self.g_ref(u)
+        return (m[0,0]*x+m[0,1]*y+m[0,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_y_ref(self,u):
         """
         y-function for reflection axis
         """
-        value=(self.alpha2*self.f_ref(u)+self.beta2*self.g_ref(u)+self.gamma2)/\
-        (self.alpha3*self.f_ref(u)+self.beta3*self.g_ref(u)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f_ref(u)
+        y=self.g_ref(u)
+        return (m[1,0]*x+m[1,1]*y+m[1,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
 
     def draw(self,canvas):
@@ -2848,7 +2948,9 @@ class Nomo_Atom:
                       tick_levels=p['tick_levels'],tick_text_levels=p['tick_text_levels'],
                       side=p['tick_side'],manual_axis_data=p['manual_axis_data'],
                       title_x_shift=p['title_x_shift'],title_y_shift=p['title_y_shift'],
-                      axis_appear=p,base_start=base_start,base_stop=base_stop)
+                      axis_appear=p,base_start=base_start,base_stop=base_stop,
+                      geometry=self.give_trafo_geometry(),
+                      sampling_tolerance=self.sampling_tolerance)
             for pp in p['extra_params']:
                 if pp['base_start'] is None:
                     base_start_pp=base_start
@@ -2864,7 +2966,9 @@ class Nomo_Atom:
                   tick_levels=pp['tick_levels'],tick_text_levels=pp['tick_text_levels'],
                   side=pp['tick_side'],manual_axis_data=pp['manual_axis_data'],
                   title_x_shift=pp['title_x_shift'],title_y_shift=pp['title_y_shift'],
-                  axis_appear=pp,base_start=base_start_pp,base_stop=base_stop_pp)
+                  axis_appear=pp,base_start=base_start_pp,base_stop=base_stop_pp,
+                  geometry=self.give_trafo_geometry(pp['u_min'],pp['u_max']),
+                  sampling_tolerance=self.sampling_tolerance)
         else: # reference axis
             #print "u_min_ref"
             #print self.u_min_ref
@@ -2874,7 +2978,9 @@ class Nomo_Atom:
             start=self.u_min_ref,stop=self.u_max_ref,
             turn=-1,title=p['title'],canvas=canvas,type=p['scale_type'],
             tick_levels=0,tick_text_levels=0,
-            side=p['tick_side'],axis_appear=p)
+            side=p['tick_side'],axis_appear=p,
+            geometry=self.give_trafo_geometry(reference=True),
+            sampling_tolerance=self.sampling_tolerance)
         if p['debug']:
             print("##### SINGLE AXIS PARAMS #######")
             pprint.pprint(p)
@@ -2920,6 +3026,7 @@ class Nomo_Atom_Grid(Nomo_Atom):
             }
         self.params=self.params_default
         self.params.update(params)
+        self.given_params=params # for refreshing params from build cache
         self.params['u_min']=self.params['u_start']
         self.params['u_max']=self.params['u_stop']
         for idx,iter_params in enumerate(self.params['extra_params']):
@@ -2929,6 +3036,7 @@ class Nomo_Atom_Grid(Nomo_Atom):
         self.set_trafo() # initialize
         self.f=self.params['F_grid']
         self.g=self.params['G_grid']
+        self.sampling_tolerance=None # max error (cm) of lines, set by block
 
     def calc_line_and_sections(self):
         """
@@ -2942,9 +3050,10 @@ class Nomo_Atom_Grid(Nomo_Atom):
         with an axis.
         """
         v0=self.params['v_start'] # value for reference line
-        value=(self.alpha1*self.f(u,v0)+self.beta1*self.g(u,v0)+self.gamma1)/\
-        (self.alpha3*self.f(u,v0)+self.beta3*self.g(u,v0)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u,v0)
+        y=self.g(u,v0)
+        return (m[0,0]*x+m[0,1]*y+m[0,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_y(self,u):
         """
@@ -2952,25 +3061,28 @@ class Nomo_Atom_Grid(Nomo_Atom):
         with an axis.
         """
         v0=self.params['v_start'] # value for reference line
-        value=(self.alpha2*self.f(u,v0)+self.beta2*self.g(u,v0)+self.gamma2)/\
-        (self.alpha3*self.f(u,v0)+self.beta3*self.g(u,v0)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u,v0)
+        y=self.g(u,v0)
+        return (m[1,0]*x+m[1,1]*y+m[1,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_x_grid(self,u,v):
         """
         gives x of grid.
         """
-        value=(self.alpha1*self.f(u,v)+self.beta1*self.g(u,v)+self.gamma1)/\
-        (self.alpha3*self.f(u,v)+self.beta3*self.g(u,v)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u,v)
+        y=self.g(u,v)
+        return (m[0,0]*x+m[0,1]*y+m[0,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def give_y_grid(self,u,v):
         """
         gives y of grid.
         """
-        value=(self.alpha2*self.f(u,v)+self.beta2*self.g(u,v)+self.gamma2)/\
-        (self.alpha3*self.f(u,v)+self.beta3*self.g(u,v)+self.gamma3)
-        return value
+        m=self.trafo_matrix
+        x=self.f(u,v)
+        y=self.g(u,v)
+        return (m[1,0]*x+m[1,1]*y+m[1,2])/(m[2,0]*x+m[2,1]*y+m[2,2])
 
     def draw(self,canvas):
         """
@@ -2978,10 +3090,12 @@ class Nomo_Atom_Grid(Nomo_Atom):
         """
         for pp in self.params['extra_params']:
             Nomo_Grid(func_f=self.give_x_grid,func_g=self.give_y_grid,
-                        canvas=canvas,data=pp)
+                        canvas=canvas,data=pp,
+                        sampling_tolerance=self.sampling_tolerance)
         # main nomogram
         self.grid_ref=Nomo_Grid(func_f=self.give_x_grid,func_g=self.give_y_grid,
-                        canvas=canvas,data=self.params)
+                        canvas=canvas,data=self.params,
+                        sampling_tolerance=self.sampling_tolerance)
         if self.params['debug']:
             print("##### SINGLE AXIS PARAMS #######")
             pprint.pprint(self.params)
@@ -15,6 +15,32 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from .nomo_wrapper import *
 from .isopleth import *
+from .nomo_build_cache import *
+
+def render_nomogram(geometry,params):
+    """
+    renders Geometry_Model geometry to a canvas and writes it to
+    params['filename']. Uses Nomographer params 'filename', 'pre_func',
+    'post_func', 'label_backend', 'label_cache', 'label_cache_dir' and
+    'batch_typesetting' (defaults as in Nomographer).
+    Returns canvas and label cache (None if not used).
+    """
+    label_backend=params.get('label_backend','tex')
+    use_cache=params.get('label_cache',False)
+    batch=params.get('batch_typesetting',False)
+    c=canvas.canvas()
+    label_cache=None
+    if label_backend=='draft':
+        c.settextengine(Draft_Text_Engine())
+    elif use_cache or batch:
+        label_cache=Label_Cache(directory=params.get('label_cache_dir'),
+                                batch=batch,persistent=use_cache)
+        c.settextengine(label_cache)
+    geometry.render(c,params.get('pre_func'),params.get('post_func'))
+    write_canvas(c,params.get('filename','pynomo_default.pdf'))
+    if label_cache is not None:
+        label_cache.flush() # labels are read from TeX when file is written
+    return c,label_cache
 
 class Nomographer:
     """
@@ -25,21 +51,80 @@ class Nomographer:
         params hold all information to build the nomograph
         """
         self._check_params_(params) # sets default values for missing keys
+        for block_para in params['block_params']:
+            self._check_block_params_(block_para)
+        build_cache=give_build_cache(params['build_cache'])
+        built=None
+        if build_cache is not None:
+            build_key=give_build_key(params)
+            built=build_cache.get(build_key,params)
+        if built is None:
+            wrapper,blocks,isopleths=self._build_(params)
+            if build_cache is not None:
+                build_cache.put(build_key,params,wrapper,blocks)
+        else: # only cosmetic params changed, built blocks are reused
+            wrapper,blocks=built
+            isopleths=Isopleth_Wrapper(params)
+            for block,block_para in zip(blocks,params['block_params']):
+                isopleths.add_isopleth_block(block,block_para)
+        # geometry phase: everything is drawn into geometry model
+        geometry=Geometry_Model()
+        g=Geometry_Canvas(geometry)
+        if params['make_grid']:
+            g.set_role('grid')
+            self._make_grid_(params,g)
+        geometry.add_marker('pre_func')
+        if params['draw_lines']:
+            g.set_role('lines')
+            self._draw_lines_(params,g)
+        if params['draw_isopleths']:
+            # draw isopleths
+            g.set_role('isopleths')
+            isopleths.draw(g)
+        else: # calculate points
+            for block in blocks:
+                for atom in block.atom_stack:
+                    # calculates lines (list of coordinates)
+                    atom.calc_line_and_sections()
+                    #pass
+        # draw the nomogram
+        wrapper.draw_geometry(g)
+        geometry.add_marker('post_func')
+        if params['geometry_file'] is not None:
+            geometry.save(params['geometry_file'])
+        self.geometry=geometry
+        # render phase
+        c,label_cache=render_nomogram(geometry,params)
+        self.label_cache=label_cache
+        self.blocks=blocks  # save for debugging
+        for block in params['block_params']:
+            if block['debug']:
+                print("##### SINGLE BLOCK PARAMS #######")
+                pprint.pprint(block)
+        if params['debug']:
+            print("##### MAIN PARAMS #######")
+            pprint.pprint(params)
+        self.wrapper=wrapper
+        self.canvas=c
+
+    def _build_(self,params):
+        """
+        builds blocks, aligns them and does transformations.
+        Returns wrapper, blocks and isopleths.
+        """
         wrapper=Nomo_Wrapper(params=params,
                              paper_width=params['paper_width'],
                              paper_height=params['paper_height'],
                              filename=params['filename'])
         blocks=[]
         isopleths=Isopleth_Wrapper(params)
+        sampling_tolerance=params['sampling_tolerance'] # max error (cm) of atom lines
         for block_para in params['block_params']:
             # TYPE 1
             if block_para['block_type']=='type_1':
-                self._check_block_type_1_params_(block_para)
                 blocks.append(Nomo_Block_Type_1(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F1(block_para['f1_params'])
                 blocks[-1].define_F2(block_para['f2_params'])
                 blocks[-1].define_F3(block_para['f3_params'])
@@ -50,12 +135,9 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 2
             if block_para['block_type']=='type_2':
-                self._check_block_type_2_params_(block_para)
                 blocks.append(Nomo_Block_Type_2(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F1(block_para['f1_params'])
                 blocks[-1].define_F2(block_para['f2_params'])
                 blocks[-1].define_F3(block_para['f3_params'])
@@ -65,11 +147,10 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 3
             if block_para['block_type']=='type_3':
-                self._check_block_type_3_params_(block_para)
                 blocks.append(Nomo_Block_Type_3(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 for axis_params in block_para['f_params']:
-                    self._check_axis_params_(axis_params)
                     blocks[-1].add_F(axis_params)
                 blocks[-1].set_block(width=block_para['width'],
                                      height=block_para['height'],
@@ -80,13 +161,9 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 4
             if block_para['block_type']=='type_4':
-                self._check_block_type_4_params_(block_para)
                 blocks.append(Nomo_Block_Type_4(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
-                self._check_axis_params_(block_para['f4_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F1(block_para['f1_params'])
                 blocks[-1].define_F2(block_para['f2_params'])
                 blocks[-1].define_F3(block_para['f3_params'])
@@ -100,18 +177,18 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 5
             if block_para['block_type']=='type_5':
-                self._check_block_type_5_params_(block_para)
                 blocks.append(Nomo_Block_Type_5(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_block(block_para)
                 blocks[-1].set_block()
                 wrapper.add_block(blocks[-1])
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 6
             if block_para['block_type']=='type_6':
-                self._check_block_type_6_params_(block_para)
                 blocks.append(Nomo_Block_Type_6(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define(params1=block_para['f1_params'],
                                   params2=block_para['f2_params'])
                 blocks[-1].set_block(width=block_para['width'],
@@ -125,12 +202,9 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 7
             if block_para['block_type']=='type_7':
-                self._check_block_type_7_params_(block_para)
                 blocks.append(Nomo_Block_Type_7(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F1(block_para['f1_params'])
                 blocks[-1].define_F2(block_para['f2_params'])
                 blocks[-1].define_F3(block_para['f3_params'])
@@ -141,22 +215,18 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 8
             if block_para['block_type']=='type_8':
-                self._check_block_type_8_params_(block_para)
                 blocks.append(Nomo_Block_Type_8(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F(block_para['f_params'])
                 blocks[-1].set_block(length=block_para['length'])
                 wrapper.add_block(blocks[-1])
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 9
             if block_para['block_type']=='type_9':
-                self._check_block_type_9_params_(block_para)
                 blocks.append(Nomo_Block_Type_9(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_determinant(block_para['f1_params'],
                                               block_para['f2_params'],
                                               block_para['f3_params'],
@@ -169,12 +239,9 @@ class Nomographer:
                 isopleths.add_isopleth_block(blocks[-1],block_para)
             # TYPE 10
             if block_para['block_type']=='type_10':
-                self._check_block_type_10_params_(block_para)
                 blocks.append(Nomo_Block_Type_10(mirror_x=block_para['mirror_x'],
-                                                mirror_y=block_para['mirror_y']))
-                self._check_axis_params_(block_para['f1_params'])
-                self._check_axis_params_(block_para['f2_params'])
-                self._check_axis_params_(block_para['f3_params'])
+                                                mirror_y=block_para['mirror_y'],
+                                                sampling_tolerance=sampling_tolerance))
                 blocks[-1].define_F1(block_para['f1_params'])
                 blocks[-1].define_F2(block_para['f2_params'])
                 blocks[-1].define_F3(block_para['f3_params'])
@@ -193,34 +260,41 @@ class Nomographer:
             else:
                 wrapper.do_transformation(method=trafo[0])
         # transformations done
-        c=canvas.canvas()
-        if params['make_grid']:
-            self._make_grid_(params,c)
-        if params['pre_func'] is not None:
-            params['pre_func'](c)
-        if params['draw_lines']:
-            self._draw_lines_(params,c)
-        if params['draw_isopleths']:
-            # draw isopleths
-            isopleths.draw(c)
-        else: # calculate points
-            for block in blocks:
-                for atom in block.atom_stack:
-                    # calculates lines (list of coordinates)
-                    atom.calc_line_and_sections()
-                    #pass
-        # draw the nomogram
-        wrapper.draw_nomogram(c,params['post_func'])
-        self.blocks=blocks  # save for debugging
-        for block in params['block_params']:
-            if block['debug']:
-                print("##### SINGLE BLOCK PARAMS #######")
-                pprint.pprint(block)
-        if params['debug']:
-            print("##### MAIN PARAMS #######")
-            pprint.pprint(params)
-        self.wrapper=wrapper
-        self.canvas=c
+        return wrapper,blocks,isopleths
+
+    def _check_block_params_(self,block_para):
+        """
+        checks params of block and its axes and adds default values
+        """
+        if block_para['block_type']=='type_1':
+            self._check_block_type_1_params_(block_para)
+        if block_para['block_type']=='type_2':
+            self._check_block_type_2_params_(block_para)
+        if block_para['block_type']=='type_3':
+            self._check_block_type_3_params_(block_para)
+            for axis_params in block_para['f_params']:
+                self._check_axis_params_(axis_params)
+        if block_para['block_type']=='type_4':
+            self._check_block_type_4_params_(block_para)
+            self._check_axis_params_(block_para['f4_params'])
+        if block_para['block_type']=='type_5':
+            self._check_block_type_5_params_(block_para)
+        if block_para['block_type']=='type_6':
+            self._check_block_type_6_params_(block_para)
+        if block_para['block_type']=='type_7':
+            self._check_block_type_7_params_(block_para)
+        if block_para['block_type']=='type_8':
+            self._check_block_type_8_params_(block_para)
+            self._check_axis_params_(block_para['f_params'])
+        if block_para['block_type']=='type_9':
+            self._check_block_type_9_params_(block_para)
+        if block_para['block_type']=='type_10':
+            self._check_block_type_10_params_(block_para)
+        if block_para['block_type'] in ['type_1','type_2','type_4','type_7',
+                                        'type_9','type_10']:
+            self._check_axis_params_(block_para['f1_params'])
+            self._check_axis_params_(block_para['f2_params'])
+            self._check_axis_params_(block_para['f3_params'])
 
     def _make_grid_(self,params,c):
         """
@@ -234,28 +308,32 @@ class Nomographer:
                   tick_levels=3,tick_text_levels=2,
                   canvas=c,type='linear',side='right',axis_appear={'turn_relative':True,
                                                                    'axis_color':axis_color,
-                                                                   'text_color':axis_color})
+                                                                   'text_color':axis_color},
+                  sampling_tolerance=params['sampling_tolerance'])
         Nomo_Axis(func_f=lambda u:u,
                   func_g=lambda u:params['paper_height']+axis_offset+u*1e-5,
                   start=-axis_offset,stop=params['paper_width']+axis_offset,turn=-1,title='',
                   tick_levels=3,tick_text_levels=2,
                   canvas=c,type='linear',side='left',axis_appear={'turn_relative':True,
                                                                    'axis_color':axis_color,
-                                                                   'text_color':axis_color})
+                                                                   'text_color':axis_color},
+                  sampling_tolerance=params['sampling_tolerance'])
         Nomo_Axis(func_f=lambda u:0.0-axis_offset+u*1e-5,
                   func_g=lambda u:u,
                   start=-axis_offset,stop=params['paper_height']+axis_offset,turn=-1,title='',
                   tick_levels=3,tick_text_levels=2,
                   canvas=c,type='linear',side='left',axis_appear={'turn_relative':True,
                                                                    'axis_color':axis_color,
-                                                                   'text_color':axis_color})
+                                                                   'text_color':axis_color},
+                  sampling_tolerance=params['sampling_tolerance'])
         Nomo_Axis(func_f=lambda u:params['paper_width']+axis_offset+u*1e-5,
                   func_g=lambda u:u,
                   start=-axis_offset,stop=params['paper_height']+axis_offset,turn=-1,title='',
                   tick_levels=3,tick_text_levels=2,
                   canvas=c,type='linear',side='right',axis_appear={'turn_relative':True,
                                                                    'axis_color':axis_color,
-                                                                   'text_color':axis_color})
+                                                                   'text_color':axis_color},
+                  sampling_tolerance=params['sampling_tolerance'])
         tick_0_list_v,tick_1_list_v,tick_2_list_v,tick_3_list_v,tick_4_list_v,\
             start_ax,stop_ax=find_linear_ticks(-axis_offset,params['paper_height']+axis_offset)
         tick_0_list_h,tick_1_list_h,tick_2_list_h,tick_3_list_h,tick_4_list_h,\
@@ -335,6 +413,13 @@ class Nomographer:
                       'post_func':None, #  function(canvas) to draw last
                       'debug':False,
                       'draw_isopleths':True, # draws isopleths
+                      'sampling_tolerance':None, # max error (cm) of drawn lines, None = fixed sections
+                      'label_backend':'tex', # 'tex' or 'draft' (fast labels without TeX)
+                      'label_cache':False, # if True, reuse typeset labels from disk cache
+                      'label_cache_dir':None, # None = $PYNOMO_LABEL_CACHE or ~/.cache/pynomo/labels
+                      'batch_typesetting':False, # if True, collect labels, typeset distinct ones when writing
+                      'geometry_file':None, # if given, geometry model is saved (.json or .npz)
+                      'build_cache':False, # True or Build_Cache: reuse built blocks if only cosmetic params change
                       'isopleth_params':[{'color':'Black',
                                           'linestyle':'Dashed',
                                           'lineweight':'thick',
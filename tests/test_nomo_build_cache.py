@@ -0,0 +1,248 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of hashing rules and hits/misses of nomo_build_cache.
+"""
+import copy
+import types
+import unittest
+import numpy
+from pyx import color
+from pynomo.nomo_build_cache import give_build_key, Build_Cache
+
+scale=2.0 # global used by scaled_function
+
+def scaled_function(u):
+    return scale*u
+
+def make_params():
+    """
+    returns params of a type 1 nomogram
+    """
+    return {'filename':'test.pdf',
+            'paper_height':10.0,
+            'paper_width':10.0,
+            'block_params':[{'block_type':'type_1',
+                             'width':10.0,
+                             'f1_params':{'u_min':1.0,'u_max':10.0,
+                                          'function':lambda u:u,
+                                          'title':'u'},
+                             'f2_params':{'u_min':1.0,'u_max':10.0,
+                                          'function':lambda u:u*u,
+                                          'title':'v'},
+                             'f3_params':{'u_min':1.0,'u_max':10.0,
+                                          'function':numpy.log10,
+                                          'title':'w'},
+                             }],
+            'transformations':[('rotate',0.01),('scale paper',)],
+            }
+
+def make_closure(value):
+    return lambda u:value*u
+
+class Test_Cosmetic_Keys(unittest.TestCase):
+    def test_changed_cosmetic_values(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['filename']='other.pdf'
+        params['block_params'][0]['f1_params']['title']='other'
+        params['block_params'][0]['f1_params']['text_color']=color.rgb.red
+        self.assertEqual(give_build_key(params),key)
+
+    def test_added_cosmetic_keys(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['title_str']='title'
+        params['isopleth_params']=[{'color':'Red'}]
+        params['block_params'][0]['isopleth_values']=[[2.0,3.0,'x']]
+        params['block_params'][0]['f2_params']['title_x_shift']=0.5
+        self.assertEqual(give_build_key(params),key)
+
+    def test_cosmetic_key_only_at_its_level(self):
+        # 'title' is cosmetic for axes, 'filename' only for main params
+        params=make_params()
+        key=give_build_key(params)
+        params['block_params'][0]['f1_params']['filename']='other.pdf'
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_geometric_values(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['block_params'][0]['f1_params']['u_max']=20.0
+        self.assertNotEqual(give_build_key(params),key)
+        params=make_params()
+        params['block_params'][0]['width']=12.0
+        self.assertNotEqual(give_build_key(params),key)
+        params=make_params()
+        params['transformations']=[('scale paper',)]
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_added_geometric_key(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['block_params'][0]['height']=10.0
+        self.assertNotEqual(give_build_key(params),key)
+
+class Test_Functions(unittest.TestCase):
+    def test_same_code_same_key(self):
+        # new lambdas with same code give same key
+        self.assertEqual(give_build_key(make_params()),give_build_key(make_params()))
+
+    def test_changed_code(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['block_params'][0]['f2_params']['function']=lambda u:u*u*u
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_closures(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['function']=make_closure(2.0)
+        key=give_build_key(params)
+        params['block_params'][0]['f1_params']['function']=make_closure(2.0)
+        self.assertEqual(give_build_key(params),key)
+        params['block_params'][0]['f1_params']['function']=make_closure(3.0)
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_globals(self):
+        global scale
+        params=make_params()
+        params['block_params'][0]['f1_params']['function']=scaled_function
+        key=give_build_key(params)
+        try:
+            scale=3.0
+            self.assertNotEqual(give_build_key(params),key)
+        finally:
+            scale=2.0
+        self.assertEqual(give_build_key(params),key)
+
+    def test_defaults(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['function']=lambda u,a=1.0:a*u
+        key=give_build_key(params)
+        params['block_params'][0]['f1_params']['function']=lambda u,a=2.0:a*u
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_recursive_function(self):
+        def f(u):
+            return u if u<1.0 else f(u/2.0)
+        params=make_params()
+        params['block_params'][0]['f1_params']['function']=f
+        self.assertIsNotNone(give_build_key(params))
+
+class Test_Values(unittest.TestCase):
+    def test_arrays(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['manual_axis_data']=numpy.arange(5.0)
+        key=give_build_key(params)
+        params['block_params'][0]['f1_params']['manual_axis_data']=numpy.arange(5.0)
+        self.assertEqual(give_build_key(params),key)
+        params['block_params'][0]['f1_params']['manual_axis_data'][2]=7.0
+        self.assertNotEqual(give_build_key(params),key)
+
+    def test_cycles(self):
+        params=make_params()
+        f1_params=params['block_params'][0]['f1_params']
+        f1_params['extra_params']=[f1_params] # refers to itself
+        key=give_build_key(params)
+        self.assertIsNotNone(key)
+        self.assertEqual(give_build_key(copy.deepcopy(params)),key)
+
+    def test_unknown_objects(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['scale_max']=object()
+        self.assertIsNone(give_build_key(params))
+
+    def test_unknown_objects_in_cosmetic_values(self):
+        params=make_params()
+        key=give_build_key(params)
+        params['pre_func']=object()
+        params['block_params'][0]['f1_params']['title']=object()
+        self.assertEqual(give_build_key(params),key)
+
+    def test_bound_methods(self):
+        class Scaler(object):
+            def __init__(self,factor):
+                self.factor=factor
+            def scale(self,u):
+                return self.factor*u
+        params=make_params()
+        params['block_params'][0]['f1_params']['function']=Scaler(2.0).scale
+        self.assertIsNone(give_build_key(params))
+
+    def test_pyx_attributes(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['axis_color']=color.rgb.red
+        params['block_params'][0]['reference_color']=color.rgb.red
+        key=give_build_key(params)
+        params['block_params'][0]['reference_color']=color.rgb(1,0,0)
+        self.assertEqual(give_build_key(params),key)
+        params['block_params'][0]['reference_color']=color.rgb.blue
+        self.assertNotEqual(give_build_key(params),key)
+
+class Test_Build_Cache(unittest.TestCase):
+    def setUp(self):
+        self.cache=Build_Cache(max_entries=2)
+        self.params=make_params()
+        self.wrapper=types.SimpleNamespace(params=dict(self.params),filename='test.pdf')
+        self.blocks=[]
+        self.key=give_build_key(self.params)
+        self.cache.put(self.key,self.params,self.wrapper,self.blocks)
+
+    def test_hit(self):
+        params=make_params()
+        params['filename']='other.pdf'
+        wrapper,blocks=self.cache.get(give_build_key(params),params)
+        self.assertIs(wrapper,self.wrapper)
+        self.assertIs(blocks,self.blocks)
+        self.assertEqual(wrapper.filename,'other.pdf')
+        self.assertEqual(self.cache.stats['hits'],1)
+
+    def test_miss(self):
+        params=make_params()
+        params['paper_height']=20.0
+        self.assertIsNone(self.cache.get(give_build_key(params),params))
+        self.assertEqual(self.cache.stats['misses'],1)
+
+    def test_uncacheable(self):
+        params=make_params()
+        params['block_params'][0]['f1_params']['scale_max']=object()
+        key=give_build_key(params)
+        self.cache.put(key,params,self.wrapper,self.blocks)
+        self.assertIsNone(self.cache.get(key,params))
+        self.assertEqual(self.cache.stats['uncacheable'],1)
+        self.assertEqual(len(self.cache.entries),1)
+
+    def test_refused(self):
+        # cosmetic params of dicts that are not atom params can't be refreshed
+        params=make_params()
+        params['block_params'][0]['f1_params']['title']='other'
+        self.assertIsNone(self.cache.get(give_build_key(params),params))
+        self.assertEqual(self.cache.stats['refused'],1)
+
+    def test_max_entries(self):
+        for height in [20.0,30.0]:
+            params=make_params()
+            params['paper_height']=height
+            self.cache.put(give_build_key(params),params,self.wrapper,self.blocks)
+        self.assertEqual(len(self.cache.entries),2)
+        self.assertIsNone(self.cache.get(self.key,self.params))
+
+if __name__=='__main__':
+    unittest.main()
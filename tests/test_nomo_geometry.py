@@ -0,0 +1,114 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Tests of entity items of nomo_geometry. Drawing into Geometry_Canvas
+needs no TeX.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from pyx import unit
+from pynomo.nomo_axis import Nomo_Axis
+from pynomo.nomo_grid import Nomo_Grid
+from pynomo.nomo_geometry import Geometry_Model, Geometry_Canvas, load_geometry
+
+def draw_axis(model):
+    """
+    draws vertical linear axis u=0..10 at x=1 into model
+    """
+    return Nomo_Axis(func_f=lambda u:1.0,func_g=lambda u:u,start=0.0,stop=10.0,
+                     turn=-1,title='u',canvas=Geometry_Canvas(model),
+                     type='linear',tick_levels=3,tick_text_levels=2)
+
+class Test_Scale(unittest.TestCase):
+    def setUp(self):
+        self.model=Geometry_Model()
+        self.axis=draw_axis(self.model)
+
+    def test_ticks_per_level(self):
+        to_pt=unit.topt(1.0)
+        scale=self.model.give_items('scale')[0]
+        self.assertEqual(scale['title'],'u')
+        ticks=self.model.give_items('ticks',scale=scale['scale'])
+        self.assertEqual([item['level'] for item in ticks],[0,1,2])
+        self.assertEqual(ticks[0]['u'].tolist(),[0.0,1.0,2.0,3.0,4.0,5.0,
+                                                 6.0,7.0,8.0,9.0,10.0])
+        # ticks start at scale
+        numpy.testing.assert_allclose(ticks[0]['lines'][:,0],to_pt)
+        numpy.testing.assert_allclose(ticks[0]['lines'][:,1],ticks[0]['u']*to_pt)
+        self.assertEqual(sum(len(item['u']) for item in ticks),len(self.axis.tick_rows))
+
+    def test_labels_per_level(self):
+        labels=self.model.give_items('labels')
+        self.assertEqual([item['level'] for item in labels],[0,1])
+        self.assertEqual(len(labels[0]['texts']),len(labels[0]['anchors']))
+        self.assertEqual(labels[0]['texts'][0],self.axis._put_text_(0.0))
+
+    def test_main_line(self):
+        polyline=self.model.give_items('scale')[0]['polylines'][0]
+        numpy.testing.assert_allclose(polyline[[0,-1],1],[0.0,10.0*unit.topt(1.0)],
+                                      atol=1e-9)
+
+    def test_not_rendered(self):
+        # entities add no drawing
+        drawn=[item for item in self.model.items
+               if item['kind'] in ('stroke','fill','draw','text','insert')]
+        self.assertEqual(len(drawn),3+len(self.axis.texts)+1) # ticks, main line, title
+
+class Test_Grid(unittest.TestCase):
+    def test_grid_lines(self):
+        model=Geometry_Model()
+        Nomo_Grid(lambda u,v:u+v,lambda u,v:u-v,Geometry_Canvas(model),
+                  data={'u_values':[0.0,0.5,1.0],'v_values':[0.0,1.0]})
+        lines=model.give_items('grid_line')
+        self.assertEqual([(item['variable'],item['value']) for item in lines],
+                         [('v',0.0),('v',1.0),('u',0.0),('u',0.5),('u',1.0)])
+        self.assertEqual(lines[0]['anchors'].shape,(1,2))
+
+class Test_Save(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        model=Geometry_Model()
+        draw_axis(model)
+        model.add_isopleth(0,[1.0,'x'],[(0.0,0.0,1.0,1.0)],[(0.0,0.0),(1.0,1.0)])
+        for name in ('g.json','g.npz'):
+            filename=os.path.join(self.directory,name)
+            model.save(filename)
+            loaded=load_geometry(filename)
+            self.assertEqual(loaded.scale_number,1)
+            for kind in ('scale','ticks','labels','isopleth'):
+                for item,loaded_item in zip(model.give_items(kind),loaded.give_items(kind)):
+                    self.assertEqual(sorted(item),sorted(loaded_item))
+                    for key,value in item.items():
+                        if isinstance(value,numpy.ndarray):
+                            numpy.testing.assert_array_equal(loaded_item[key],value)
+                            self.assertEqual(loaded_item[key].shape,value.shape)
+            self.assertEqual(loaded.give_items('isopleth')[0]['values'],[1.0,'x'])
+
+if __name__=='__main__':
+    unittest.main()
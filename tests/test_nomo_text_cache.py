@@ -0,0 +1,189 @@
+#
+#    This file is part of PyNomo -
+#    a program to create nomographs with Python (http://pynomo.sourceforge.net/)
+#
+#    Copyright (C) 2007-2010  Leif Roschier  <lefakkomies@users.sourceforge.net>
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of nomo_text_cache without TeX. A fake engine gives rules as
+output of labels and a fake TeX font (no TFM file) gives glyph runs.
+"""
+import json
+import shutil
+import tempfile
+import types
+import unittest
+from pyx import canvas, color, path, text, trafo, unit
+from pyx.dvi import texfont
+import pynomo.nomo_text_cache as nomo_text_cache
+from pynomo.nomo_text_cache import Label_Cache, Deferred_Text
+
+class Fake_Engine(object):
+    """
+    stands for PyX TeX engine, output of each label is a rule as wide
+    as the expression is long
+    """
+    def __init__(self):
+        self.exprs=[] # typeset expressions
+
+    def text_pt(self,x_pt,y_pt,expr,textattrs=[],texmessages=[],fontmap=None,
+                singlecharmode=False):
+        self.exprs.append(expr)
+        width=float(len(expr))
+        box=text.textextbox_pt(x_pt,y_pt,0.0,width,1.0,0.0,None,fontmap,
+                               singlecharmode,[])
+        def do_finish():
+            page=canvas.canvas([box.texttrafo])
+            page.markers={}
+            page.fill(path.rect_pt(0.0,0.0,width,1.0))
+            box._dvicanvas=page
+        box.do_finish=do_finish
+        return box
+
+class Fake_Label_Cache(Label_Cache):
+    """
+    Label_Cache that caches labels of Fake_Engine
+    """
+    def _give_engine_key_(self,engine):
+        return 'fake'
+
+def make_fake_font():
+    """
+    returns TeX font with metrics of all chars set without TFM file and
+    registers it as loaded
+    """
+    font=texfont.TeXfont.__new__(texfont.TeXfont)
+    font.name='cmr10'
+    font.q=font.d=10485760
+    font.tfmconv=1.0
+    font.pyxconv=0.5
+    char_info=types.SimpleNamespace(width_index=1,height_index=1,
+                                    depth_index=0,italic_index=0)
+    font.TFMfile=types.SimpleNamespace(checksum=1234,char_info=[char_info]*128,
+                                       width=[0,300000],height=[0,400000],
+                                       depth=[0,0],italic=[0,0])
+    nomo_text_cache._texfonts[(font.name,1234,font.q,font.d,font.tfmconv,
+                               font.pyxconv)]=font
+    return font
+
+class Test_Deferred_Text(unittest.TestCase):
+    def setUp(self):
+        self.engine=Fake_Engine()
+        self.cache=Fake_Label_Cache(engine=self.engine,batch=True,persistent=False)
+        self.canvas=canvas.canvas(textengine=self.cache)
+
+    def test_collected_until_used(self):
+        label=self.canvas.text(0,0,'10')
+        self.assertIsInstance(label,Deferred_Text)
+        self.assertEqual(self.engine.exprs,[])
+        self.assertEqual(len(self.cache.requests),1)
+
+    def test_resolved_when_used(self):
+        label_1=self.canvas.text(0,0,'10')
+        label_2=self.canvas.text(1,0,'200')
+        label_1.bbox() # typesets all collected labels
+        self.assertEqual(self.engine.exprs,['10','200'])
+        self.assertEqual(self.cache.requests,[])
+        self.assertEqual(self.cache.stats['batches'],1)
+        self.assertAlmostEqual(unit.topt(label_2.width),3.0*unit.scale['x'])
+
+    def test_pending_dedup(self):
+        labels=[self.canvas.text(x,0,'10') for x in range(3)]
+        self.cache.typeset()
+        self.assertEqual(self.engine.exprs,['10'])
+        self.assertEqual(self.cache.stats['misses'],1)
+        self.assertEqual(self.cache.stats['memory_hits'],2)
+        # output of later labels is taken from the first one
+        first_items=labels[0].dvicanvas.items
+        for label in labels[1:]:
+            self.assertIs(label.dvicanvas.items[0],first_items[0])
+
+    def test_flush_keeps_output_labels(self):
+        label_1=self.canvas.text(0,0,'10')
+        self.canvas.text(0,0,'20')
+        self.cache.typeset()
+        label_1.dvicanvas # output of first label only
+        self.cache.flush()
+        self.assertEqual(len(self.cache.labels),1)
+        self.assertEqual(len(self.cache.pending),1)
+
+class Test_Persistent(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_labels_from_disk(self):
+        engine=Fake_Engine()
+        cache=Fake_Label_Cache(directory=self.directory,engine=engine)
+        c=canvas.canvas(textengine=cache)
+        c.text(0,0,'10').dvicanvas
+        cache.flush()
+        self.assertEqual(cache.stats['saved'],1)
+        engine=Fake_Engine()
+        cache=Fake_Label_Cache(directory=self.directory,engine=engine)
+        label=canvas.canvas(textengine=cache).text(2,0,'10')
+        self.assertEqual(engine.exprs,[])
+        self.assertEqual(cache.stats['disk_hits'],1)
+        self.assertEqual(len(label.dvicanvas.items),1)
+
+    def test_unsaved_output(self):
+        engine=Fake_Engine()
+        cache=Fake_Label_Cache(directory=self.directory,engine=engine)
+        page=canvas.canvas()
+        page.stroke(path.line_pt(0,0,1,1))
+        cache._save_('ab'*32,((0.0,1.0,1.0,0.0),page.items,{}))
+        self.assertEqual(cache.stats['unsaved'],1)
+        self.assertIsNone(Fake_Label_Cache(directory=self.directory)._load_('ab'*32))
+
+class Test_Label_Format(unittest.TestCase):
+    def test_round_trip(self):
+        font=make_fake_font()
+        page=canvas.canvas()
+        page.markers={'m':(1*unit.t_pt,2*unit.t_pt)}
+        page.insert(font.text_pt(1.0,2.0,[49,50]))
+        page.fill(path.rect_pt(0.0,0.0,3.0,0.4))
+        colored=canvas.canvas([color.rgb(1,0,0)])
+        colored.insert(font.text_pt(5.0,2.0,[51]))
+        page.insert(colored)
+        rotated=canvas.canvas([trafo.rotate_pt(30,1,1)])
+        rotated.insert(font.text_pt(6.0,2.0,[52]))
+        page.insert(rotated)
+        label=((0.0,10.0,7.0,0.0),page.items,page.markers)
+        data=nomo_text_cache._encode_label_(label)
+        loaded=nomo_text_cache._decode_label_(json.loads(json.dumps(data)))
+        self.assertEqual(nomo_text_cache._encode_label_(loaded),data)
+        metrics,items,markers=loaded
+        self.assertEqual(metrics,(0.0,10.0,7.0,0.0))
+        self.assertIs(items[0].font,font)
+        self.assertEqual(items[0].charcodes,[49,50])
+        self.assertEqual(unit.topt(markers['m'][1]),2.0)
+
+    def test_other_output(self):
+        page=canvas.canvas()
+        page.stroke(path.line_pt(0,0,1,1))
+        with self.assertRaises(ValueError):
+            nomo_text_cache._encode_label_(((0.0,0.0,0.0,0.0),page.items,{}))
+
+    def test_version(self):
+        data=nomo_text_cache._encode_label_(((0.0,0.0,0.0,0.0),[],{}))
+        data['version']=1
+        with self.assertRaises(ValueError):
+            nomo_text_cache._decode_label_(data)
+
+if __name__=='__main__':
+    unittest.main()